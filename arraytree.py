@@ -0,0 +1,539 @@
+import logging
+import numpy as np
+from kernels import INDEX_DTYPE, build_children, bfs_levels, reverse_sweep, forward_sweep, \
+    place_bands, place_coords
+from ingest import StreamingConstructors
+from errors import InvalidArgument
+from layoutfile import write_layout
+from instrument import instrumented
+
+
+"""
+Make a property reading and writing one element of an array attribute of the tree.
+
+:param str name: the name of the array attribute of ArrayTree
+:param type cast: the Python type of the element returned
+:returns: return the property
+"""
+
+
+def _column(name, cast):
+    def fget(self):
+        return cast(getattr(self.tree, name)[self.index])
+
+    def fset(self, value):
+        getattr(self.tree, name)[self.index] = value
+    return property(fget, fset)
+
+
+"""
+A read and write view of one node of an ArrayTree, it provides the same attributes as node.Node
+so the code written for Tree keeps working, e.g. tree.nodes[node_id].radius. The values are not
+copied, every attribute reads from and writes to the arrays of the tree, except the children, a
+tuple read from the CSR arrays, so an attempt to change them in place fails loudly.
+"""
+
+
+class NodeProxy(object):
+
+    """
+    The node view constructor.
+
+    :param ArrayTree tree: the tree storing the node
+    :param int index: the dense index of the node in the tree arrays
+    """
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    depth = _column("depth", int)
+    tree_size = _column("tree_size", int)
+    radius = _column("radius", float)
+    area = _column("area", float)
+    band = _column("band", int)
+    theta = _column("theta", float)
+    phi = _column("phi", float)
+
+    @property
+    def node_id(self):
+        return self.tree.ids[self.index].item()
+
+    @property
+    def parent(self):
+        p = self.tree.parent[self.index]
+        return None if p < 0 else self.tree.ids[p].item()
+
+    @property
+    def children(self):
+        a, b = self.tree.child_offsets[self.index], self.tree.child_offsets[self.index + 1]
+        return tuple(self.tree.ids[self.tree.child_index[a:b]].tolist())
+
+    @property
+    def coord(self):
+        return CoordProxy(self.tree, self.index)
+
+
+"""
+A read and write view of the 3D coordinate of one node of an ArrayTree, with the same attributes
+as h3math.Point4d.
+"""
+
+
+class CoordProxy(object):
+
+    """
+    The coordinate view constructor.
+
+    :param ArrayTree tree: the tree storing the node
+    :param int index: the dense index of the node in the tree arrays
+    """
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    x = _column("x", float)
+    y = _column("y", float)
+    z = _column("z", float)
+    w = _column("w", float)
+
+
+"""
+The node lookup table of an ArrayTree, a mapping from node id to NodeProxy which behaves like the
+dict Tree.nodes for reading.
+"""
+
+
+class NodeView(object):
+
+    """
+    The node lookup table constructor.
+
+    :param ArrayTree tree: the tree storing the nodes
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __getitem__(self, node_id):
+        return NodeProxy(self.tree, self.tree.index_of(node_id))
+
+    def __contains__(self, node_id):
+        try:
+            self.tree.index_of(node_id)
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.tree.ids)
+
+    def __iter__(self):
+        return iter(self.tree.ids.tolist())
+
+    def get(self, node_id, default=None):
+        return self[node_id] if node_id in self else default
+
+    def keys(self):
+        return self.tree.ids.tolist()
+
+    def values(self):
+        return [NodeProxy(self.tree, i) for i in range(len(self.tree.ids))]
+
+    def items(self):
+        return list(zip(self.keys(), self.values()))
+
+
+"""
+An array-backed alternative to tree.Tree. Instead of a node.Node object per node, every node
+attribute is a NumPy array indexed by a dense node index, and the children are kept in compressed
+sparse row (CSR) form: the children of node i are child_index[child_offsets[i]:child_offsets[i + 1]].
+The dense indices follow the sorted node ids, the node id of index i is ids[i].
+"""
+
+
+class ArrayTree(StreamingConstructors):
+
+    """
+    This is the constructor for the array-backed tree class.
+
+    :param int root: the root id of the tree, default None and the root is the only node without a parent
+    :param (int, int) edges: a tuple for a tree edge as (child, parent), default None
+    """
+
+    def __init__(self, root=None, edges=None):
+        edges = np.array(list(edges) if edges is not None else [])
+        if edges.size == 0:
+            edges = np.zeros((0, 2), dtype=np.int64)
+        self._build(root, edges[:, 0], edges[:, 1])
+
+    """
+    Build a tree straight from the two columns of the edge list, without going through a list
+    of tuples.
+
+    :param int root: the root id of the tree, None for the only node without a parent
+    :param numpy.ndarray child: the child id of each edge
+    :param numpy.ndarray parent: the parent id of each edge
+    :returns: return the ArrayTree
+    """
+
+    @classmethod
+    def from_arrays(cls, root, child, parent):
+        tree = cls.__new__(cls)
+        tree._build(root, np.asarray(child), np.asarray(parent))
+        return tree
+
+    """
+    Build the tree from chunks of edges, used by the streaming constructors of
+    ingest.StreamingConstructors. Only the arrays of each chunk are kept until the tree is built.
+
+    :param int root: the root id of the tree
+    :param chunks: an iterable of (child, parent) array pairs
+    :returns: return the ArrayTree
+    """
+
+    @classmethod
+    def _from_chunks(cls, root, chunks):
+        children, parents = [], []
+        for child, parent in chunks:
+            children.append(np.asarray(child))
+            parents.append(np.asarray(parent))
+        if not children:
+            return cls(root, [])
+        return cls.from_arrays(root, np.concatenate(children), np.concatenate(parents))
+
+    """
+    Build a laid out tree straight from a layout file written by export_layout(path, attributes=True),
+    e.g. a hit of cache.LayoutCache, instead of building it from the edges and applying the layout.
+    The columns are copied into the arrays of the tree and the children ordered by their rank.
+
+    :param layoutfile.LayoutFile layout: the layout file
+    :returns: return the ArrayTree
+    """
+
+    @classmethod
+    def from_layout(cls, layout):
+        tree = cls.__new__(cls)
+        tree.ids = np.array(layout.ids)
+        tree.parent = np.array(layout.parent, dtype=INDEX_DTYPE)
+        n = len(tree.ids)
+        nonroot = np.flatnonzero(tree.parent >= 0)
+        nonroot = nonroot[np.lexsort((layout.column("rank")[nonroot], tree.parent[nonroot]))]
+        tree.child_offsets, tree.child_index = build_children(nonroot, tree.parent[nonroot], n)
+        tree.root_index = int(np.flatnonzero(tree.parent < 0)[0])
+        tree.root = tree.ids[tree.root_index].item()
+        tree.depth = np.array(layout.depth, dtype=INDEX_DTYPE)
+        tree.height = int(tree.depth.max())
+        tree.tree_size = np.array(layout.column("tree_size"), dtype=np.int64)
+        tree.radius = np.array(layout.column("radius"), dtype=np.float64)
+        tree.area = np.array(layout.column("area"), dtype=np.float64)
+        tree.band = np.array(layout.column("band"), dtype=INDEX_DTYPE)
+        tree.theta = np.array(layout.column("theta"), dtype=np.float64)
+        tree.phi = np.array(layout.column("phi"), dtype=np.float64)
+        tree.x = np.array(layout.x, dtype=np.float64)
+        tree.y = np.array(layout.y, dtype=np.float64)
+        tree.z = np.array(layout.z, dtype=np.float64)
+        tree.w = np.ones(n)
+        tree.nodes = NodeView(tree)
+        tree.instrumentation = None
+        return tree
+
+    def _build(self, root, child, parent):
+        num_edges = len(child)
+        keys = np.concatenate([child, parent] if root is None else [child, parent, [root]])
+        self.ids, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.astype(INDEX_DTYPE)
+        c, p = inverse[:num_edges], inverse[num_edges:2 * num_edges]
+        n = len(self.ids)
+        if np.any(np.bincount(c, minlength=n) > 1):
+            logging.error("You attempted to give a node more than one parent \n")
+            raise InvalidArgument("You attempted to give a node more than one parent \n")
+        self.parent = np.full(n, -1, dtype=INDEX_DTYPE)
+        self.parent[c] = p
+        roots = np.flatnonzero(self.parent < 0)
+        if root is not None and self.parent[inverse[-1]] >= 0:
+            logging.error("You attempted to introduce a cycle back to the root \n")
+            raise InvalidArgument("You attempted to introduce a cycle back to the root \n")
+        if len(roots) != 1:
+            logging.error("You attempted to introduce a duplicate root \n")
+            raise InvalidArgument("You attempted to introduce a duplicate root \n")
+        self.root_index = int(roots[0])
+        self.root = self.ids[self.root_index].item()
+        self.child_offsets, self.child_index = build_children(c, p, n)
+        if len(self._levels()[0]) != n:
+            logging.error("You attempted to introduce a cycle \n")
+            raise InvalidArgument("You attempted to introduce a cycle \n")
+        self.height = 0
+        self.depth = np.zeros(n, dtype=INDEX_DTYPE)
+        self.tree_size = np.ones(n, dtype=np.int64)
+        self.radius = np.zeros(n)
+        self.area = np.zeros(n)
+        self.band = np.full(n, -1, dtype=INDEX_DTYPE)
+        self.theta = np.zeros(n)
+        self.phi = np.zeros(n)
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.z = np.zeros(n)
+        self.w = np.ones(n)
+        self.nodes = NodeView(self)
+        self.instrumentation = None
+
+    """
+    Look up the dense index of a node id.
+
+    :param int node_id: the node id
+    :returns: return the dense index of the node, a KeyError is raised for an unknown id
+    """
+
+    def index_of(self, node_id):
+        i = int(np.searchsorted(self.ids, node_id))
+        if i == len(self.ids) or self.ids[i] != node_id:
+            raise KeyError(node_id)
+        return i
+
+    def _levels(self):
+        return bfs_levels(self.child_offsets, self.child_index, [self.root_index])
+
+    """
+    Get all the nodes in breath-first-search order, grouped by generation, as Tree.get_level_order.
+
+    :returns: the pair (order, level_bounds), the array of node ids in BFS order and the offsets of
+              each generation in it, so generation d is order[level_bounds[d]:level_bounds[d + 1]]
+    """
+
+    def get_level_order(self):
+        order, level_bounds = self._levels()
+        return self.ids[order], level_bounds
+
+    """
+    Get all the leaf nodes in a set. The edges are not needed as the tree knows its leaves, the
+    argument is kept for compatibility with Tree.
+
+    :returns: the set of all leaf nodes
+    """
+
+    def get_leaf_nodes(self, edges=None):
+        return set(self.ids[np.diff(self.child_offsets) == 0].tolist())
+
+    """
+    Print the tree sorted by depth to log, with the same columns as Tree.print_tree.
+    """
+
+    def print_tree(self):
+        order, _ = self._levels()
+        num_children = np.diff(self.child_offsets)
+        for i in order.tolist():
+            node = self.nodes[self.ids[i].item()]
+            logging.info(
+                "{0}, parent: {1}, depth: {2}, #children: {3}, size: {4}, radius: {5}, area: {6}"
+                .format(node.node_id, node.parent, node.depth, num_children[i],
+                        node.tree_size, node.radius, node.area))
+
+    """
+    Set the depth in the tree for each node.
+
+    :param int depth: the initial depth value for the root, default 0
+    """
+
+    @instrumented
+    def set_node_depth(self, depth=0):
+        order, level_bounds = self._levels()
+        num_levels = len(level_bounds) - 1
+        self.depth[order] = depth + np.repeat(np.arange(num_levels), np.diff(level_bounds))
+        self.height = depth + num_levels - 1
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(order))
+
+    """
+    Set the node's hemisphere radius and also its distance from its children, see
+    Tree.set_subtree_radius. The tree is traced one generation at a time from the last generation
+    to the root, each generation in a few vectorized calls.
+
+    :param edges: not needed, kept for compatibility with Tree
+    """
+
+    @instrumented
+    def set_subtree_radius(self, edges=None):
+        order, level_bounds = self._levels()
+        _, radius, area = reverse_sweep(np.diff(self.child_offsets)[order], level_bounds)
+        self.radius[order] = radius
+        self.area[order] = area
+        if self.instrumentation is not None:
+            self.instrumentation.observe(self.ids[order], radius=radius, depth=self.depth[order])
+
+    """
+    Set the subtree size by the number of nodes in its subtree, one generation at a time from the
+    last generation to the root.
+
+    :param edges: not needed, kept for compatibility with Tree
+    """
+
+    @instrumented
+    def set_subtree_size(self, edges=None):
+        order, level_bounds = self._levels()
+        self.tree_size[:] = 1
+        for d in range(len(level_bounds) - 2, 0, -1):
+            generation = order[level_bounds[d]:level_bounds[d + 1]]
+            np.add.at(self.tree_size, self.parent[generation], self.tree_size[generation])
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(order))
+
+    def _sort_children(self, key):
+        siblings = np.repeat(np.arange(len(self.ids)), np.diff(self.child_offsets))
+        self.child_index = self.child_index[np.lexsort((-key[self.child_index], siblings))]
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.ids))
+
+    """
+    Sort the children of every node in decreasing order by their radii, siblings with the same
+    radius keep their order.
+    """
+
+    @instrumented
+    def sort_children_by_radius(self):
+        self._sort_children(self.radius)
+
+    """
+    Sort the children of every node in decreasing order by their number of nodes in subtree,
+    siblings with the same size keep their order.
+    """
+
+    @instrumented
+    def sort_children_by_tree_size(self):
+        self._sort_children(self.tree_size)
+
+    """
+    Placing the hemispheres on the root hemisphere generation by generation, see Tree.set_placement
+    for the placement rules.
+    """
+
+    @instrumented
+    def set_placement(self):
+        order, level_bounds = self._levels()
+        for d in range(1, len(level_bounds) - 1):
+            nodes = order[level_bounds[d]:level_bounds[d + 1]]
+            p = self.parent[nodes]
+            self.band[nodes], self.theta[nodes], self.phi[nodes] = \
+                place_bands(self.radius[nodes], self.radius[p], p)
+            parents, group = np.unique(p, return_inverse=True)
+            coords = place_coords(self.theta[nodes], self.phi[nodes], group, self.radius[parents],
+                                  self.theta[parents], self.phi[parents],
+                                  np.column_stack([self.x[parents], self.y[parents], self.z[parents]]), d == 1)
+            self.x[nodes], self.y[nodes], self.z[nodes] = coords.T
+            if self.instrumentation is not None:
+                self.instrumentation.observe(self.ids[nodes], parent=p, depth=d, band=self.band[nodes],
+                                             radius=self.radius[nodes], theta=self.theta[nodes], phi=self.phi[nodes])
+
+    """
+    Run the whole layout on one breath-first-search order instead of the five passes of get_layout:
+    the depth, subtree size and hemisphere radius are set in one sweep from the last generation to
+    the root, then the children are sorted by radius and placed in one sweep from the root.
+
+    :param int workers: the number of worker processes laying out the subtrees in parallel, see
+                        parallel.parallel_layout(), default None to run in this process
+    """
+
+    @instrumented
+    def set_layout(self, workers=None):
+        if workers is not None and workers > 1:
+            from parallel import parallel_layout
+            self._assign_layout(*parallel_layout(self.child_offsets, self.child_index, self.root_index, workers))
+            self._observe_placement(np.flatnonzero(self.parent >= 0))
+            return
+        order, level_bounds = self._levels()
+        num_children = np.diff(self.child_offsets)[order]
+        self.tree_size[order], self.radius[order], self.area[order] = \
+            reverse_sweep(num_children, level_bounds)
+        self.depth[order] = np.repeat(np.arange(len(level_bounds) - 1), np.diff(level_bounds))
+        self.height = len(level_bounds) - 2
+        child_order, self.band[order], self.theta[order], self.phi[order], coords = \
+            forward_sweep(num_children, level_bounds, self.radius[order], self.radius[order])
+        self.x[order], self.y[order], self.z[order] = coords.T
+        first_child = np.cumsum(num_children) - num_children + 1
+        parent = np.repeat(np.arange(len(order)), num_children)
+        slot = self.child_offsets[order[parent]] + np.arange(1, len(order)) - first_child[parent]
+        self.child_index[slot] = order[child_order[1:]]
+        self._observe_placement(order[1:])
+
+    def _assign_layout(self, depth, tree_size, radius, area, band, theta, phi, coords, rank):
+        self.depth[:], self.tree_size[:], self.radius[:], self.area[:] = depth, tree_size, radius, area
+        self.band[:], self.theta[:], self.phi[:] = band, theta, phi
+        self.x[:], self.y[:], self.z[:] = coords.T
+        nonroot = np.flatnonzero(self.parent >= 0)
+        self.child_index[self.child_offsets[self.parent[nonroot]] + rank[nonroot]] = nonroot
+        self.height = int(self.depth.max())
+
+    """
+    Restore a layout exported with export_layout(path, attributes=True), e.g. by cache.LayoutCache,
+    instead of computing it. The rows of the file are the dense indices.
+
+    :param layoutfile.LayoutFile layout: the layout file of a tree with the same nodes
+    """
+
+    @instrumented
+    def apply_layout(self, layout):
+        if not np.array_equal(layout.ids, self.ids):
+            logging.error("You attempted to apply the layout of another tree \n")
+            raise InvalidArgument("You attempted to apply the layout of another tree \n")
+        self._assign_layout(layout.depth, layout.column("tree_size"), layout.column("radius"),
+                            layout.column("area"), layout.column("band"), layout.column("theta"),
+                            layout.column("phi"), np.column_stack([layout.x, layout.y, layout.z]),
+                            np.asarray(layout.column("rank"), dtype=np.int64))
+
+    def _observe_placement(self, nodes):
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited")
+            self.instrumentation.observe(self.ids[nodes], parent=self.parent[nodes], depth=self.depth[nodes],
+                                         band=self.band[nodes], radius=self.radius[nodes], theta=self.theta[nodes],
+                                         phi=self.phi[nodes])
+
+    """
+    Get the coordinates of all nodes as arrays, sorted by node id.
+
+    :returns: return the pair (ids, coords), the node ids and the N x 3 coordinates
+    """
+
+    def get_coords(self):
+        return self.ids, np.column_stack([self.x, self.y, self.z])
+
+    """
+    Export the layout as a columnar binary file, see layoutfile.write_layout() for the format. The
+    rows are the dense indices, which are already sorted by node id.
+
+    :param str path: the path of the layout file
+    :param dtype: the float type of the coordinates, numpy.float32 or numpy.float64, default numpy.float32
+    :param bool attributes: whether to write the layout attributes too, see layoutfile.ATTRIBUTES, default False
+    """
+
+    @instrumented
+    def export_layout(self, path, dtype=np.float32, attributes=False):
+        extra = None
+        if attributes:
+            rank = np.zeros(len(self.ids), dtype=np.int32)
+            rank[self.child_index] = np.arange(len(self.child_index)) - \
+                self.child_offsets[self.parent[self.child_index]]
+            extra = [("tree_size", self.tree_size), ("radius", self.radius), ("area", self.area),
+                     ("band", self.band), ("theta", self.theta), ("phi", self.phi), ("rank", rank)]
+        write_layout(path, self.ids, self.parent, self.depth, self.x, self.y, self.z, dtype, extra)
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.ids))
+
+    """
+    Plot the tree with a plotting backend, as Tree.scatter_plot(), see render.get_backend().
+
+    :param bool equators: whether to draw the 3D equators, default True
+    :param bool tagging: whether to tag nodes with node numbers, default True
+    :param int depth_cap: a filter for rendering the first N generations, default tree height
+    :param str backend: the name of the plotting backend, default "matplotlib"
+    :param options: the options of the backend
+    :returns: return what the backend returns, the 3D axes for matplotlib
+    """
+
+    def scatter_plot(self, equators=True, tagging=True, depth_cap=None, backend="matplotlib", **options):
+        from render import get_backend
+        return get_backend(backend).scatter_plot(self, equators, tagging, depth_cap, **options)
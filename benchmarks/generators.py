@@ -0,0 +1,82 @@
+import numpy as np
+
+"""
+Deterministic synthetic trees for the benchmarks. Every generator returns the pair (child, parent)
+of integer arrays with one edge per non-root node, the root is node 0 and every parent is given
+before its children, so the same size always gives the same tree.
+"""
+
+
+"""
+A balanced k-ary tree, node i has the children k * i + 1 to k * i + k.
+
+:param int num_nodes: the number of nodes
+:param int k: the number of children of each inner node, default 3
+:returns: return the pair (child, parent) of arrays
+"""
+
+
+def kary(num_nodes, k=3):
+    child = np.arange(1, num_nodes, dtype=np.int64)
+    return child, (child - 1) // k
+
+
+"""
+A deep chain, node i is the only child of node i - 1.
+
+:param int num_nodes: the number of nodes
+:returns: return the pair (child, parent) of arrays
+"""
+
+
+def chain(num_nodes):
+    child = np.arange(1, num_nodes, dtype=np.int64)
+    return child, child - 1
+
+
+"""
+A star, every node is a child of the root.
+
+:param int num_nodes: the number of nodes
+:returns: return the pair (child, parent) of arrays
+"""
+
+
+def star(num_nodes):
+    child = np.arange(1, num_nodes, dtype=np.int64)
+    return child, np.zeros(num_nodes - 1 if num_nodes else 0, dtype=np.int64)
+
+
+"""
+A power-law tree grown by preferential attachment, the Barabasi-Albert model with one edge per
+node: node i attaches to an end of one of the i - 1 edges so far, chosen uniformly, so a node is
+chosen in proportion to its degree. An end which is the parent of an edge refers to an earlier
+choice, all the references are resolved together by pointer jumping instead of growing the tree
+node by node.
+
+:param int num_nodes: the number of nodes
+:param int seed: the seed of the random numbers, default 0
+:returns: return the pair (child, parent) of arrays
+"""
+
+
+def power_law(num_nodes, seed=0):
+    child = np.arange(1, num_nodes, dtype=np.int64)
+    parent = np.zeros(num_nodes, dtype=np.int64)
+    pointer = np.zeros(num_nodes, dtype=bool)
+    if num_nodes > 2:
+        edges = np.arange(1, num_nodes - 1, dtype=np.int64)
+        end = (np.random.RandomState(seed).random_sample(num_nodes - 2) * 2 * edges).astype(np.int64)
+        parent[2:] = end // 2 + 1
+        pointer[2:] = end % 2 == 0
+    while pointer.any():
+        nodes = np.flatnonzero(pointer)
+        referred = parent[nodes]
+        parent[nodes], pointer[nodes] = parent[referred], pointer[referred]
+    return child, parent[1:]
+
+
+"""
+The generators by name.
+"""
+GENERATORS = {"kary": kary, "chain": chain, "star": star, "power_law": power_law}
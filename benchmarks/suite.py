@@ -0,0 +1,263 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import numpy as np
+from timeit import default_timer
+
+from hypy.tree import Tree
+from hypy.arraytree import ArrayTree
+from hypy.benchmarks.generators import GENERATORS
+
+"""
+Benchmark the layout phase by phase on deterministic synthetic trees. Every phase is timed on its
+own, the best of a few runs, and its peak memory is traced in one more run, as tracemalloc slows
+the code down. The results are written as JSON and can be compared with a stored baseline, any
+phase slower or bigger than the baseline by more than the threshold is a regression and fails the
+run with exit status 1.
+
+    $ python -m hypy.benchmarks.suite --sizes 10,1000,100000 --output result.json
+    $ python -m hypy.benchmarks.suite --sizes 10,1000,100000 --baseline result.json --threshold 0.25
+
+The import of the layout engine is timed too, in a fresh interpreter, and fails the run if it takes
+longer than IMPORT_TARGET or loads a plotting library.
+"""
+
+PHASES = ["construction", "set_node_depth", "set_subtree_radius", "set_subtree_size",
+          "sort_children_by_radius", "set_placement", "export"]
+SHAPES = ["kary", "chain", "star", "power_law"]
+SIZES = [10, 10 ** 3, 10 ** 5]
+
+"""
+Phases faster than this many seconds in the baseline are too noisy to be compared by time.
+"""
+MIN_SECONDS = 0.005
+
+"""
+Phases with a smaller peak memory than this many bytes in the baseline are not compared by memory.
+"""
+MIN_BYTES = 1 << 16
+
+"""
+The modules of the layout engine, which must be importable without any plotting library.
+"""
+CORE_MODULES = ["hypy.tree", "hypy.arraytree", "hypy.h3math"]
+
+"""
+The target for the import of the core modules in a fresh interpreter, in seconds.
+"""
+IMPORT_TARGET = 0.25
+
+IMPORT_SCRIPT = """
+import json, sys
+from timeit import default_timer
+start = default_timer()
+for module in sys.argv[1:]:
+    __import__(module)
+seconds = default_timer() - start
+plotting = sorted(set(m.split(".")[0] for m in sys.modules) & set(["matplotlib", "mpl_toolkits"]))
+print(json.dumps({"seconds": seconds, "plotting": plotting}))
+"""
+
+
+"""
+The steps of one layout, in order, as (phase, function) pairs. The construction builds the tree,
+the other phases work on it.
+
+:param str backend: "dict" for Tree or "array" for ArrayTree
+:param numpy.ndarray child: the child id of each edge
+:param numpy.ndarray parent: the parent id of each edge
+:param str path: the path of the layout file written by the export phase
+:returns: return the list of (phase, function) pairs
+"""
+
+
+def pipeline(backend, child, parent, path):
+    state = {}
+    edges = list(zip(child.tolist(), parent.tolist())) if backend == "dict" else None
+
+    def construction():
+        if backend == "dict":
+            state["tree"] = Tree(0, edges)
+        else:
+            state["tree"] = ArrayTree.from_arrays(0, child, parent)
+    return [("construction", construction),
+            ("set_node_depth", lambda: state["tree"].set_node_depth()),
+            ("set_subtree_radius", lambda: state["tree"].set_subtree_radius(edges)),
+            ("set_subtree_size", lambda: state["tree"].set_subtree_size(edges)),
+            ("sort_children_by_radius", lambda: state["tree"].sort_children_by_radius()),
+            ("set_placement", lambda: state["tree"].set_placement()),
+            ("export", lambda: state["tree"].export_layout(path))]
+
+
+"""
+Run every phase of the layout of one tree.
+
+:param str backend: "dict" for Tree or "array" for ArrayTree
+:param str shape: the name of the tree generator, see generators.GENERATORS
+:param int size: the number of nodes
+:param int repeat: the number of timed runs, the best time is kept
+:param bool memory: whether to trace the peak memory of every phase in one more run
+:returns: return a list of dicts with shape, size, phase, seconds and peak_bytes
+"""
+
+
+def run_case(backend, shape, size, repeat=3, memory=True):
+    child, parent = GENERATORS[shape](size)
+    seconds = dict((phase, float("inf")) for phase in PHASES)
+    peak_bytes = dict((phase, None) for phase in PHASES)
+    handle, path = tempfile.mkstemp(suffix=".layout")
+    os.close(handle)
+    try:
+        for run in range(repeat + (1 if memory else 0)):
+            traced = memory and run == repeat
+            if traced:
+                tracemalloc.start()
+            gc.collect()
+            for phase, step in pipeline(backend, child, parent, path):
+                if traced:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    step()
+                    peak_bytes[phase] = tracemalloc.get_traced_memory()[1] - before
+                else:
+                    start = default_timer()
+                    step()
+                    seconds[phase] = min(seconds[phase], default_timer() - start)
+            if traced:
+                tracemalloc.stop()
+    finally:
+        os.remove(path)
+    return [{"shape": shape, "size": size, "phase": phase, "seconds": seconds[phase],
+             "peak_bytes": peak_bytes[phase]} for phase in PHASES]
+
+
+"""
+Time the import of the core modules, each run in a fresh interpreter with the same module search path.
+
+:param list modules: the module names, default CORE_MODULES
+:param int repeat: the number of runs, the best time is kept
+:returns: return a dict with the import phase, its seconds and the plotting libraries it loaded
+"""
+
+
+def measure_import(modules=CORE_MODULES, repeat=3):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    seconds, plotting = float("inf"), []
+    for run in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT] + list(modules), env=env)
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        seconds, plotting = min(seconds, result["seconds"]), result["plotting"]
+    return {"shape": "import", "size": 0, "phase": "import", "seconds": seconds, "peak_bytes": None,
+            "plotting": plotting}
+
+
+"""
+Check the import of the core modules against IMPORT_TARGET.
+
+:param dict current: the results of run_suite()
+:returns: return the list of failures as strings, empty if there is none
+"""
+
+
+def check_import(current):
+    failures = []
+    for result in current["results"]:
+        if result["phase"] != "import":
+            continue
+        if result["seconds"] > IMPORT_TARGET:
+            failures.append("import: seconds {0:.6g} > target {1:.6g}".format(result["seconds"], IMPORT_TARGET))
+        if result["plotting"]:
+            failures.append("import: loaded " + ", ".join(result["plotting"]))
+    return failures
+
+
+"""
+Run the benchmark on every shape and size, after timing the import of the core modules.
+
+:param str backend: "dict" for Tree or "array" for ArrayTree
+:param list shapes: the names of the tree generators
+:param list sizes: the numbers of nodes
+:param int repeat: the number of timed runs of each case
+:param bool memory: whether to trace the peak memory of every phase
+:returns: return the results as a dict with the environment under "meta" and the phases under "results"
+"""
+
+
+def run_suite(backend="dict", shapes=SHAPES, sizes=SIZES, repeat=3, memory=True):
+    results = [measure_import(repeat=repeat)]
+    print("{0:<20}  {1:<24}{2:>12.6f} s".format("import", ", ".join(CORE_MODULES), results[0]["seconds"]))
+    for shape in shapes:
+        for size in sizes:
+            for result in run_case(backend, shape, size, repeat, memory):
+                results.append(result)
+                print("{0:<10}{1:>10}  {2:<24}{3:>12.6f} s{4:>16}".format(
+                    shape, size, result["phase"], result["seconds"],
+                    "{0} B".format(result["peak_bytes"]) if result["peak_bytes"] is not None else "-"))
+    meta = {"backend": backend, "repeat": repeat, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "platform": platform.platform()}
+    return {"meta": meta, "results": results}
+
+
+"""
+Compare results with a baseline, phase by phase. A phase regresses when it takes more than
+(1 + threshold) times the baseline time or peak memory, phases below MIN_SECONDS or MIN_BYTES in
+the baseline are not compared, nor are the phases missing from the baseline.
+
+:param dict current: the results of run_suite()
+:param dict baseline: the stored results of an earlier run_suite()
+:param float threshold: the allowed relative growth, default 0.25
+:returns: return the list of regressions as strings, empty if there is none
+"""
+
+
+def compare(current, baseline, threshold=0.25):
+    expected = dict(((r["shape"], r["size"], r["phase"]), r) for r in baseline["results"])
+    regressions = []
+    for result in current["results"]:
+        base = expected.get((result["shape"], result["size"], result["phase"]))
+        if base is None:
+            continue
+        for field, floor in [("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)]:
+            if result[field] is None or base[field] is None or base[field] < floor:
+                continue
+            if result[field] > (1 + threshold) * base[field]:
+                regressions.append("{0} {1} {2}: {3} {4:.6g} > baseline {5:.6g} by more than {6:.0%}".format(
+                    result["shape"], result["size"], result["phase"], field, result[field], base[field],
+                    threshold))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hypy layout phase by phase.")
+    parser.add_argument("--backend", choices=["dict", "array"], default="dict")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="comma separated, from " + ", ".join(SHAPES))
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated node counts")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracing the peak memory")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare with the JSON results stored at this path")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    current = run_suite(args.backend, args.shapes.split(","), [int(size) for size in args.sizes.split(",")],
+                        args.repeat, not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(current, fp, indent=1)
+    regressions = check_import(current)
+    if args.baseline:
+        with open(args.baseline) as fp:
+            regressions += compare(current, json.load(fp), args.threshold)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    if regressions:
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
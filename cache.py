@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import h3math
+from layoutfile import ATTRIBUTES, load_layout
+from errors import InvalidArgument
+
+
+"""
+The default directory and size budget of the layout cache.
+"""
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "hypy")
+CACHE_BYTES = 1 << 30
+
+"""
+The order of the siblings in the layout, part of the cache key with the layout constants of h3math.
+"""
+SORT_STRATEGY = "radius"
+SUFFIX = ".layout"
+
+
+"""
+A content-addressed cache of layouts on the local disk. A layout is stored under the hash of its edges,
+of the tree options (the backend and whether the ids are interned) and of the layout parameters
+(h3math.K, RESERVATION and LEAF_AREA, and SORT_STRATEGY) as a layout file
+with every attribute of the nodes, see Tree.export_layout(path, attributes=True). A hit memory-maps
+the file, and get_layout() builds the laid out tree straight from its columns with from_layout()
+instead of building the tree from the edges and computing its layout. The least recently used
+layouts, by the modification time of their files which a hit refreshes, are evicted to keep the cache
+under its size budget, so several processes can share one directory.
+"""
+
+
+class LayoutCache(object):
+
+    """
+    The constructor for the layout cache, creating the directory if needed.
+
+    :param str directory: the cache directory, default CACHE_DIRECTORY
+    :param int max_bytes: the size budget of the cache, default CACHE_BYTES
+    """
+
+    def __init__(self, directory=CACHE_DIRECTORY, max_bytes=CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """
+    Hash a tree and the layout parameters into a cache key. The edges are normalized to little-endian
+    int64 pairs, so a list of tuples and an array of the same edges share a key, but their order is
+    kept: the siblings of equal radius keep their insertion order when sorted, so a reordered edge list
+    may give another layout.
+
+    :param root: the root id of the tree, an integer or None, or any other id hashed by its repr
+    :param edges: the (child, parent) edges, a sequence of pairs or an N x 2 array
+    :param str backend: the tree backend of the layout, see tree.get_layout(), default "dict"
+    :param bool intern_ids: whether the tree interns its node ids, see tree.get_layout(), default False
+    :returns: return the key as a hex string
+    """
+
+    def key(self, root, edges, backend="dict", intern_ids=False):
+        edges = np.asarray(edges)
+        if edges.size and (edges.ndim != 2 or edges.shape[1] != 2 or edges.dtype.kind not in "iu"):
+            logging.error("Only integer (child, parent) edges can be cached \n")
+            raise InvalidArgument("Only integer (child, parent) edges can be cached \n")
+        if isinstance(root, (int, np.integer)) and not isinstance(root, bool):
+            root = int(root)
+        elif root is not None:
+            root = repr(root)
+        parameters = {"K": h3math.K, "RESERVATION": h3math.RESERVATION, "LEAF_AREA": h3math.LEAF_AREA,
+                      "sort": SORT_STRATEGY, "root": root, "backend": backend, "intern_ids": bool(intern_ids)}
+        digest = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode("utf-8"))
+        digest.update(np.ascontiguousarray(edges, dtype="<i8").tobytes())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    """
+    Look up a layout and mark it as the most recently used.
+
+    :param str key: the cache key
+    :returns: return the memory-mapped layoutfile.LayoutFile, or None on a miss
+    """
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            layout = load_layout(path)
+            _touch(path)
+        except (IOError, OSError, ValueError, InvalidArgument):
+            self.misses += 1
+            return None
+        if not all(name in layout.columns for name in ATTRIBUTES):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return layout
+
+    """
+    Store the layout of a laid out tree, then evict the least recently used layouts over the budget.
+    The file is written aside and renamed, so a reader never sees half a layout.
+
+    :param str key: the cache key
+    :param tree: the laid out Tree or ArrayTree
+    """
+
+    def put(self, key, tree):
+        handle, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(handle)
+        try:
+            tree.export_layout(temporary, np.float64, attributes=True)
+            _touch(temporary)
+            os.replace(temporary, self.path(key))
+        except Exception:
+            os.remove(temporary)
+            raise
+        self.stores += 1
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        return sorted(entries)
+
+    """
+    Remove the least recently used layouts until the cache fits in its size budget. A layout being
+    read stays readable, as its file is only unlinked.
+    """
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    """
+    Remove every layout of the cache.
+    """
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    """
+    Summarize the cache use since the cache was created.
+
+    :returns: return a dict of hits, misses, hit_rate, stores, evictions, and the entries and bytes on disk
+    """
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": float(self.hits) / lookups if lookups else 0.,
+                "stores": self.stores, "evictions": self.evictions, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries)}
+
+
+"""
+Mark a file as used now. The time is set explicitly, as the implicit timestamps of some file systems
+are too coarse to order the uses of a busy cache.
+"""
+
+
+def _touch(path):
+    now = time.time()
+    os.utime(path, (now, now))
@@ -0,0 +1,14 @@
+"""
+The exceptions of the package, in a module of their own which imports nothing, so every module
+imports them the same way and there is one class for each, whichever module raises it and however
+the package is imported. tree re-exports them. 
+"""
+
+
+"""
+Customized exception for invalid edge input. 
+"""
+
+
+class InvalidArgument(Exception):
+    pass
@@ -1,10 +1,13 @@
 import igraph
-from h3.tree import Tree, get_layout
+from h3.tree import Tree
 
 """
-An example for drawing a random spanning tree with 500 nodes without tagging or equators.
+An example for drawing a random spanning tree with 500 nodes without tagging or equators. The spanning
+tree of the Barabasi graph is extracted by Tree.from_graph, which reports the edges it dropped.
 """
 if __name__ == '__main__':
-    edges = igraph.Graph.Barabasi(n=500, m=3, directed=True).spanning_tree(None, True).get_edgelist()
-    tree = get_layout(0, edges)
+    edges = igraph.Graph.Barabasi(n=500, m=3, directed=True).get_edgelist()
+    tree = Tree.from_graph(0, edges)
+    print(tree.spanning_stats)
+    tree.set_layout()
     tree.scatter_plot(equators=False, tagging=False)
@@ -3,35 +3,67 @@ import collections
 import logging
 import json
 import csv
-from timeit import Timer
+import numpy as np
+from timeit import default_timer
 
 from hypy.tree import Tree
+from hypy.kernels import reverse_sweep, forward_sweep
 
 """
-Benchmark the performance of getting layout
+Benchmark the performance of getting layout, pass by pass. The five passes of get_layout are
+timed one by one, and so are the steps of the fused engine, which gets the breath-first-search
+order once and runs the passes as one reverse sweep and one forward sweep.
 """
 
 
-def calc_layout(num_nodes):
-    edges = igraph.Graph.Barabasi(n=num_nodes, m=3, directed=True).\
-        spanning_tree(None, True).get_edgelist()
+def time_passes(edges):
     tree = Tree(0, edges)
-    tree.set_node_depth()
-    tree.set_subtree_radius(edges)
-    tree.set_subtree_size(edges)
-    tree.sort_children_by_radius()
-    tree.set_placement()
+    timings = []
+    for name, run in [("set_node_depth", tree.set_node_depth),
+                      ("set_subtree_radius", lambda: tree.set_subtree_radius(edges)),
+                      ("set_subtree_size", lambda: tree.set_subtree_size(edges)),
+                      ("sort_children_by_radius", tree.sort_children_by_radius),
+                      ("set_placement", tree.set_placement)]:
+        start = default_timer()
+        run()
+        timings.append((name, default_timer() - start))
+    return timings
+
+
+def time_fused(edges):
+    tree = Tree(0, edges)
+    timings = []
+    start = default_timer()
+    order, level_bounds = tree.get_level_order()
+    num_children = np.array([len(tree.nodes[n].children) for n in order])
+    timings.append(("get_level_order", default_timer() - start))
+    start = default_timer()
+    tree_size, radius, area = reverse_sweep(num_children, level_bounds)
+    timings.append(("reverse_sweep", default_timer() - start))
+    start = default_timer()
+    forward_sweep(num_children, level_bounds, radius, radius)
+    timings.append(("forward_sweep", default_timer() - start))
+    tree = Tree(0, edges)  # set_layout also writes the results back to the nodes
+    start = default_timer()
+    tree.set_layout()
+    timings.append(("total", default_timer() - start))
+    return timings
 
 if __name__ == '__main__':
     result = []
-    print("#nodes\t\ttime")
+    print("#nodes\t\tengine\t\tpass\t\t\ttime")
     for num_nodes in [10, 10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5]:
-        t = Timer(lambda: calc_layout(num_nodes))
-        lapse = t.timeit(number=10) / 10.0
-        result.append((num_nodes, lapse))
-        print("{0}\t\t{1}".format(num_nodes, lapse))
+        edges = igraph.Graph.Barabasi(n=num_nodes, m=3, directed=True).\
+            spanning_tree(None, True).get_edgelist()
+        for engine, timer in [("passes", time_passes), ("fused", time_fused)]:
+            timings = timer(edges)
+            if engine == "passes":
+                timings.append(("total", sum(lapse for name, lapse in timings)))
+            for name, lapse in timings:
+                result.append((num_nodes, engine, name, lapse))
+                print("{0}\t\t{1}\t\t{2:<24}{3}".format(num_nodes, engine, name, lapse))
     with open('result.csv', 'w') as fp:
         csv_w = csv.writer(fp, delimiter=',')
-        csv_w.writerows([['#nodes', 'time']])
+        csv_w.writerows([['#nodes', 'engine', 'pass', 'time']])
         csv_w.writerows(result)
     fp.close()
@@ -3,7 +3,6 @@ import collections
 import logging
 import json
 import csv
-from collections import deque
 
 from hypy.tree import Tree
 
@@ -25,21 +24,13 @@ def calc_layout(num_nodes):
 
 def get_coordinates(tree):
     coord_list = []
-    current_generation = deque([tree.root])
-    next_generation = True
-    while next_generation:
-        next_generation = deque()
-        while current_generation:
-            node_id = current_generation.popleft()
-            coord_list.append([tree.nodes[node_id].coord.x,
-                               tree.nodes[node_id].coord.y,
-                               tree.nodes[node_id].coord.z])
-            coord_list.append([tree.nodes[node_id].coord.x,
-                               tree.nodes[node_id].coord.y,
-                               tree.nodes[node_id].coord.z])
-            for child in tree.nodes[node_id].children:
-                next_generation.append(child)
-        current_generation = next_generation
+    for node_id in tree.traversal.bfs().tolist():
+        coord_list.append([tree.nodes[node_id].coord.x,
+                           tree.nodes[node_id].coord.y,
+                           tree.nodes[node_id].coord.z])
+        coord_list.append([tree.nodes[node_id].coord.x,
+                           tree.nodes[node_id].coord.y,
+                           tree.nodes[node_id].coord.z])
     return coord_list
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+import logging
+import numpy as np
+from timeit import default_timer
+from kernels import INDEX_DTYPE, build_children, bfs_levels, reverse_sweep, forward_sweep
+from errors import InvalidArgument
+
+
+"""
+Lay out a batch of many small trees, e.g. tens of thousands of cascades, in one call. The edges of
+all trees come as concatenated arrays with a tree number per edge, a node is identified by the pair
+(tree number, node id), so the trees may reuse the same ids, and the whole batch is laid out as one
+forest by the fused kernels: one breath-first-search by generation over all trees, one reverse and
+one forward sweep, every generation of every tree in the same vectorized calls. The coordinates of
+every tree are the ones of the fused engine on the tree alone, see Tree.set_layout().
+"""
+
+
+"""
+The layout of a batch of trees, the nodes of tree t are the rows offsets[t]:offsets[t + 1], its root
+first and then in breath-first-search order.
+"""
+
+
+class ForestLayout(object):
+
+    """
+    The constructor for the forest layout.
+
+    :param numpy.ndarray offsets: the first row of each tree, and the number of rows last
+    :param numpy.ndarray ids: the node id of each row
+    :param numpy.ndarray parent: the row of the parent of each row, -1 for the roots
+    :param numpy.ndarray depth: the depth of each row in its tree
+    :param numpy.ndarray coords: the N x 3 coordinates of the rows
+    :param float seconds: the time taken by the layout
+    """
+
+    def __init__(self, offsets, ids, parent, depth, coords, seconds=0.):
+        self.offsets = offsets
+        self.ids = ids
+        self.parent = parent
+        self.depth = depth
+        self.coords = coords
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def trees_per_second(self):
+        return len(self) / self.seconds if self.seconds else float("inf")
+
+    """
+    Get the coordinates of one tree.
+
+    :param int t: the tree number
+    :returns: return the pair (ids, coords) of the tree, views of the node ids and N x 3 coordinates
+    """
+
+    def get_coords(self, t):
+        lo, hi = self.offsets[t], self.offsets[t + 1]
+        return self.ids[lo:hi], self.coords[lo:hi]
+
+
+"""
+Lay out a batch of trees given by concatenated edge arrays.
+
+:param numpy.ndarray roots: the root id of every tree, by tree number
+:param numpy.ndarray tree: the tree number of each edge, from 0 to len(roots) - 1
+:param numpy.ndarray child: the child id of each edge
+:param numpy.ndarray parent: the parent id of each edge
+:returns: return the ForestLayout, an InvalidArgument is raised if the edges of a tree are not a
+          tree rooted at its root
+"""
+
+
+def batch_layout(roots, tree, child, parent):
+    start = default_timer()
+    roots, tree = np.asarray(roots), np.asarray(tree, dtype=np.int64)
+    num_trees, num_edges = len(roots), len(tree)
+    if num_edges and (tree.min() < 0 or tree.max() >= num_trees):
+        logging.error("The tree numbers of the edges are not between 0 and {0} \n".format(num_trees - 1))
+        raise InvalidArgument("The tree numbers of the edges are not between 0 and {0} \n".format(num_trees - 1))
+    key_tree = np.concatenate([tree, tree, np.arange(num_trees)])
+    key_id = np.concatenate([np.asarray(child), np.asarray(parent), roots])
+    order = np.lexsort((key_id, key_tree))
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (key_tree[order][1:] != key_tree[order][:-1]) | (key_id[order][1:] != key_id[order][:-1])
+    inverse = np.empty(len(order), dtype=INDEX_DTYPE)
+    inverse[order] = np.cumsum(new) - 1
+    unique = order[new]
+    n = len(unique)
+    child_index, parent_index, root_index = np.split(inverse, [num_edges, 2 * num_edges])
+    is_child = np.zeros(n, dtype=np.int64)
+    np.add.at(is_child, child_index, 1)
+    if is_child.max(initial=0) > 1 or is_child[root_index].any() or len(np.unique(root_index)) < num_trees:
+        logging.error("The edges of a tree are not a tree rooted at its root \n")
+        raise InvalidArgument("The edges of a tree are not a tree rooted at its root \n")
+    child_offsets, child_slots = build_children(child_index, parent_index, n)
+    bfs, level_bounds = bfs_levels(child_offsets, child_slots, root_index)
+    if len(bfs) < n:
+        logging.error("{0} nodes are not connected to the root of their tree \n".format(n - len(bfs)))
+        raise InvalidArgument("{0} nodes are not connected to the root of their tree \n".format(n - len(bfs)))
+    num_children = np.diff(child_offsets)[bfs]
+    _, radius, _ = reverse_sweep(num_children, level_bounds)
+    _, _, _, _, coords = forward_sweep(num_children, level_bounds, radius, radius)
+    depth = np.repeat(np.arange(len(level_bounds) - 1, dtype=INDEX_DTYPE), np.diff(level_bounds))
+    parent_position = np.full(n, -1, dtype=np.int64)
+    parent_position[num_trees:] = np.repeat(np.arange(n), num_children)
+    rows = np.argsort(key_tree[unique][bfs], kind="mergesort")
+    row_of = np.empty(n, dtype=np.int64)
+    row_of[rows] = np.arange(n)
+    parent_row = parent_position[rows]
+    parent_row[parent_row >= 0] = row_of[parent_row[parent_row >= 0]]
+    offsets = np.searchsorted(key_tree[unique][bfs][rows], np.arange(num_trees + 1))
+    layout = ForestLayout(offsets, key_id[unique][bfs][rows], parent_row.astype(INDEX_DTYPE), depth[rows],
+                          coords[rows], default_timer() - start)
+    logging.info("laid out {0} trees with {1} nodes in {2:.3f}s, {3:.0f} trees per second"
+                 .format(num_trees, n, layout.seconds, layout.trees_per_second))
+    return layout
@@ -7,6 +7,27 @@ compute_delta_theta() and compute_delta_phi().
 """
 K = 2.0
 
+"""
+Space reservation factor of a child hemisphere on its parent hemisphere, see Tree.set_subtree_radius().
+"""
+RESERVATION = 7.2
+
+"""
+Hemisphere area of a leaf node, the radius of a leaf is compute_radius(LEAF_AREA).
+"""
+LEAF_AREA = 0.0025
+
+"""
+The tolerance of the array versions of the scalar functions by the float type they compute in,
+relative to the scalar result and absolute below 1, e.g.
+abs(compute_radius_array(a, dtype) - compute_radius(a)) <= ARRAY_TOLERANCE[dtype] * max(1, compute_radius(a)).
+The layout engines always compute in float64, the dtype parameter is only for callers running the
+functions on their own arrays, where float32 keeps about 6 significant digits, except for
+hyperbolic_distance_array(): arccosh amplifies the rounding of nearby points and its float32 results
+are only within about 1e-3.
+"""
+ARRAY_TOLERANCE = {np.dtype(np.float64): 1e-12, np.dtype(np.float32): 1e-5}
+
 
 """
 The 3D coordinate structure
@@ -102,6 +123,34 @@ def compute_hyperbolic_area(radius):
     return 2 * math.pi * (math.cosh(radius / K) - 1.0) * beta
 
 
+"""
+Compute the hemisphere radii of many nodes at once, the array version of compute_radius()
+
+:param numpy.ndarray H_p: the hemisphere space reserved of each node
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the nodes' radii as a float array
+"""
+
+
+def compute_radius_array(H_p, dtype=np.float64):
+    return K * np.arcsinh(np.sqrt(np.asarray(H_p, dtype=dtype) / (2 * math.pi * K * K)))
+
+
+"""
+Compute the hemisphere space reservations of many nodes at once, the array version of
+compute_hyperbolic_area()
+
+:param numpy.ndarray radius: the hemisphere radius of each node
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the nodes' hemisphere space reservations as a float array
+"""
+
+
+def compute_hyperbolic_area_array(radius, dtype=np.float64):
+    beta = 1.00
+    return 2 * math.pi * (np.cosh(np.asarray(radius, dtype=dtype) / K) - 1.0) * beta
+
+
 """
 Compute the proper delta variant value for node's hemisphere placement, similar to 
 the space reservation the size of the node's hemisphere radius
@@ -149,6 +198,77 @@ def hyperbolic_distance(x, y):
     t3 = minkowski(y, y)
     return (2 * math.acosh(((t1 * t1) / (t2 * t3))**2))
 
+
+"""
+Compute delta_theta for many nodes at once, the array version of compute_delta_theta(). Where the
+scalar version raises a ZeroDivisionError, at a zero parent radius or phi, the result is NaN.
+
+:param numpy.ndarray r: the hemisphere radius of each node
+:param numpy.ndarray rp: the hemisphere radius of each node's parent
+:param numpy.ndarray phi: the phi of the band of each node
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the nodes' delta_theta as a float array
+"""
+
+
+def compute_delta_theta_array(r, rp, phi, dtype=np.float64):
+    r, rp, phi = np.asarray(r, dtype=dtype), np.asarray(rp, dtype=dtype), np.asarray(phi, dtype=dtype)
+    denominator = np.sinh(rp / K) * np.sinh(phi)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator == 0, np.nan, np.arctan(np.tanh(r / K) / denominator)).astype(dtype)
+
+
+"""
+Compute delta_phi for many nodes at once, the array version of compute_delta_phi(). Where the scalar
+version raises a ZeroDivisionError, at a zero parent radius, the result is NaN.
+
+:param numpy.ndarray r: the hemisphere radius of each node
+:param numpy.ndarray rp: the hemisphere radius of each node's parent
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the nodes' delta_phi as a float array
+"""
+
+
+def compute_delta_phi_array(r, rp, dtype=np.float64):
+    r, rp = np.asarray(r, dtype=dtype), np.asarray(rp, dtype=dtype)
+    denominator = np.sinh(rp / K)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator == 0, np.nan, np.arctan(np.tanh(r / K) / denominator)).astype(dtype)
+
+
+"""
+Compute the Minkowski inner product of many pairs of homogeneous coordinates at once, the array
+version of minkowski(). Either side may also be a single 4-vector.
+
+:param numpy.ndarray x: the N x 4 homogeneous coordinates (x, y, z, w)
+:param numpy.ndarray y: the N x 4 homogeneous coordinates (x, y, z, w)
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the N inner products as a float array
+"""
+
+
+def minkowski_array(x, y, dtype=np.float64):
+    x, y = np.asarray(x, dtype=dtype), np.asarray(y, dtype=dtype)
+    return (x[..., :3] * y[..., :3]).sum(axis=-1) - x[..., 3] * y[..., 3]
+
+
+"""
+Compute the hyperbolic distance of many pairs of homogeneous coordinates at once, the array version
+of hyperbolic_distance(). Either side may also be a single 4-vector.
+
+:param numpy.ndarray x: the N x 4 homogeneous coordinates (x, y, z, w)
+:param numpy.ndarray y: the N x 4 homogeneous coordinates (x, y, z, w)
+:param dtype: the float type to compute in, see ARRAY_TOLERANCE, default numpy.float64
+:returns: return the N distances as a float array
+"""
+
+
+def hyperbolic_distance_array(x, y, dtype=np.float64):
+    t1 = minkowski_array(x, y, dtype)
+    t2 = minkowski_array(x, x, dtype)
+    t3 = minkowski_array(y, y, dtype)
+    return 2 * np.arccosh(((t1 * t1) / (t2 * t3)) ** 2)
+
 """
 Rotation matrix around X axis
 
@@ -192,3 +312,211 @@ def rotation_matrix_z(angle):
                      [math.sin(angle), math.cos(angle), 0, 0],
                      [0, 0, 1, 0],
                      [0, 0, 0, 1]])
+
+
+"""
+Transform many coodinates from spherical space to homogeneous cartesian space at once, the array
+version of Point4d.sph_to_cart()
+
+:param numpy.ndarray theta: the theta coordinate of each node in spherical space, polar angle
+:param numpy.ndarray phi: the phi coordinate of each node in spherical space, elevation angle
+:param numpy.ndarray r: the radius of each node in spherical space, radial distance
+:returns: return the N x 4 homogeneous coordinates (x, y, z, 1)
+"""
+
+
+def sph_to_cart_array(theta, phi, r):
+    sin_phi = np.sin(phi)
+    return np.column_stack([r * sin_phi * np.cos(theta), r * sin_phi * np.sin(theta),
+                            r * np.cos(phi), np.ones(len(theta))])
+
+
+"""
+Stack the 4x4 transformation matrices which rotate by rotation_matrix_z(theta).dot(rotation_matrix_y(phi))
+and then translate by the offset, one matrix per (theta, phi, offset) row. Applying matrix i to a
+point gives the same result as Point4d.coordinate_transformation(theta[i], phi[i]) followed by
+Point4d.cart_offset(offset[i]).
+
+:param numpy.ndarray theta: the angles for rotating around Z axis
+:param numpy.ndarray phi: the angles for rotating around Y axis
+:param numpy.ndarray offset: the N x 3 translations
+:returns: return the N x 4 x 4 stack of transformation matrices
+"""
+
+
+def transformation_matrices(theta, phi, offset):
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+    matrices = np.zeros((len(theta), 4, 4))
+    matrices[:, 0, 0] = cos_theta * cos_phi
+    matrices[:, 0, 1] = -sin_theta
+    matrices[:, 0, 2] = cos_theta * sin_phi
+    matrices[:, 1, 0] = sin_theta * cos_phi
+    matrices[:, 1, 1] = cos_theta
+    matrices[:, 1, 2] = sin_theta * sin_phi
+    matrices[:, 2, 0] = -sin_phi
+    matrices[:, 2, 2] = cos_phi
+    matrices[:, :3, 3] = offset
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+"""
+Rotate many cartesian coordinates at once by rotation_matrix_z(theta).dot(rotation_matrix_y(phi)),
+one (theta, phi) per point, the array version of Point4d.coordinate_transformation() without the
+N x 4 x 4 stack of matrices.
+
+:param numpy.ndarray theta: the angle for rotating each point around Z axis
+:param numpy.ndarray phi: the angle for rotating each point around Y axis
+:param numpy.ndarray points: the N x 3 coordinates
+:returns: return the N x 3 rotated coordinates
+"""
+
+
+def rotate_array(theta, phi, points):
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+    x = cos_phi * points[:, 0] + sin_phi * points[:, 2]
+    z = cos_phi * points[:, 2] - sin_phi * points[:, 0]
+    return np.column_stack([cos_theta * x - sin_theta * points[:, 1],
+                            sin_theta * x + cos_theta * points[:, 1], z])
+
+
+"""
+Apply a stack of 4x4 transformation matrices to homogeneous coordinates in one batched product,
+point i is transformed by matrices[index[i]].
+
+:param numpy.ndarray matrices: the M x 4 x 4 stack of transformation matrices
+:param numpy.ndarray points: the N x 4 homogeneous coordinates
+:param numpy.ndarray index: the row of the matrix applied to each point, default None for one matrix per point
+:returns: return the N x 4 transformed homogeneous coordinates
+"""
+
+
+def apply_transformations(matrices, points, index=None):
+    if index is not None:
+        matrices = matrices[index]
+    return np.einsum("nij,nj->ni", matrices, points)
+
+
+"""
+The Minkowski metric diag(1, 1, 1, -1) of minkowski(), as a matrix.
+"""
+MINKOWSKI_METRIC = np.diag([1., 1., 1., -1.])
+
+
+"""
+Map many layout coordinates into the Klein model at once, as homogeneous coordinates (x, y, z, 1).
+A layout coordinate at distance d from the origin is taken as a point at hyperbolic distance d in
+the direction of the coordinate, which sits at tanh(d / K) from the origin in the Klein model. The
+Klein radius is kept just below 1, so far away points stay finite.
+
+:param numpy.ndarray coords: the N x 3 layout coordinates
+:returns: return the N x 4 homogeneous Klein coordinates
+"""
+
+
+def to_klein_array(coords):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    distance = np.sqrt(np.einsum("ni,ni->n", coords, coords))
+    scale = np.minimum(np.tanh(distance / K), np.nextafter(1., 0.))
+    scale = np.divide(scale, distance, out=np.zeros_like(distance), where=distance > 0)
+    return np.column_stack([coords * scale[:, None], np.ones(len(coords))])
+
+
+"""
+Map many homogeneous Klein coordinates back to layout coordinates at once, the inverse of
+to_klein_array()
+
+:param numpy.ndarray points: the N x 4 homogeneous Klein coordinates
+:returns: return the N x 3 layout coordinates
+"""
+
+
+def from_klein_array(points):
+    points = np.asarray(points, dtype=float).reshape(-1, 4)
+    klein = points[:, :3] / points[:, 3:]
+    radius = np.sqrt(np.einsum("ni,ni->n", klein, klein))
+    scale = np.divide(K * np.arctanh(radius), radius, out=np.full_like(radius, K), where=radius > 0)
+    return klein * scale[:, None]
+
+
+"""
+Build the hyperbolic translation, a Lorentz boost, which moves a point of the Klein model to the
+origin along the line through it and the origin. The matrix acts on homogeneous coordinates
+(x, y, z, w) and preserves minkowski().
+
+:param numpy.ndarray point: the Klein coordinate (x, y, z) or homogeneous coordinate (x, y, z, w) of the point
+:returns: return the 4x4 translation matrix
+"""
+
+
+def translation_to_origin(point):
+    point = np.asarray(point, dtype=float)
+    v = point[:3] / point[3] if len(point) == 4 else point[:3]
+    speed = v.dot(v)
+    if speed >= 1:
+        raise ValueError("The point {0} is not inside the Klein model".format(v))
+    gamma = 1 / math.sqrt(1 - speed)
+    matrix = np.identity(4)
+    if speed > 0:
+        matrix[:3, :3] += (gamma - 1) * np.outer(v, v) / speed
+    matrix[:3, 3] = -gamma * v
+    matrix[3, :3] = -gamma * v
+    matrix[3, 3] = gamma
+    return matrix
+
+
+"""
+Pull a product of hyperbolic translations and rotations back onto the Lorentz group, so composing
+many refocus steps does not drift away from an isometry. The columns are made orthonormal under
+minkowski() by a Gram-Schmidt process starting from the time column.
+
+:param numpy.ndarray matrix: the 4x4 transformation matrix, close to a Lorentz transformation
+:returns: return the nearby 4x4 Lorentz transformation
+"""
+
+
+def lorentz_normalize(matrix):
+    columns = [np.array(matrix[:, 3], dtype=float)]
+    if columns[0][3] < 0:
+        columns[0] = -columns[0]
+    columns[0] /= math.sqrt(-columns[0].dot(MINKOWSKI_METRIC).dot(columns[0]))
+    for i in range(3):
+        column = np.array(matrix[:, i], dtype=float)
+        for j, other in enumerate(columns):
+            sign = -1. if j == 0 else 1.
+            column -= sign * column.dot(MINKOWSKI_METRIC).dot(other) * other
+        column /= math.sqrt(column.dot(MINKOWSKI_METRIC).dot(column))
+        columns.append(column)
+    return np.column_stack(columns[1:] + columns[:1])
+
+
+"""
+Compose successive refocus steps, applying first then second, and keep the product a Lorentz
+transformation, see lorentz_normalize().
+
+:param numpy.ndarray first: the 4x4 transformation applied first
+:param numpy.ndarray second: the 4x4 transformation applied second
+:returns: return the composed 4x4 transformation
+"""
+
+
+def compose_transformations(first, second):
+    return lorentz_normalize(second.dot(first))
+
+
+"""
+Apply one 4x4 transformation to many homogeneous Klein coordinates in one matrix product, and
+scale the results back to w = 1.
+
+:param numpy.ndarray matrix: the 4x4 transformation, e.g. from translation_to_origin()
+:param numpy.ndarray points: the N x 4 homogeneous Klein coordinates
+:returns: return the N x 4 transformed homogeneous Klein coordinates with w = 1
+"""
+
+
+def refocus_array(matrix, points):
+    target = np.dot(points, matrix.T)
+    target /= target[:, 3:]
+    return target
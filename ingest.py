@@ -0,0 +1,211 @@
+import itertools
+import logging
+import os
+import numpy as np
+from timeit import default_timer
+from spanning import spanning_tree
+
+
+"""
+The number of edges read at a time by the streaming tree constructors.
+"""
+CHUNK_SIZE = 1 << 16
+
+
+"""
+The throughput of reading the edges into a tree.
+"""
+
+
+class IngestStats(object):
+
+    """
+    The constructor for the ingest statistics.
+
+    :param int edges: the number of edges read, default 0
+    :param float seconds: the wall time of building the tree, default 0
+    """
+
+    def __init__(self, edges=0, seconds=0.):
+        self.edges = edges
+        self.seconds = seconds
+
+    @property
+    def edges_per_second(self):
+        return self.edges / self.seconds if self.seconds else float("inf")
+
+    def __repr__(self):
+        return "IngestStats(edges={0}, seconds={1:.3f}, edges_per_second={2:.0f})" \
+            .format(self.edges, self.seconds, self.edges_per_second)
+
+
+"""
+Read the edges from an iterator of (child, parent) pairs in chunks, each chunk is turned into two
+arrays straight from the iterator without a list of tuples in between.
+
+:param edges: an iterable of (child, parent) pairs
+:param int chunk_size: the maximum number of edges in a chunk, default CHUNK_SIZE
+:param dtype: the type of the node ids, default numpy.int64
+:returns: yield the pairs (child, parent) of arrays, one per chunk
+"""
+
+
+def iterator_chunks(edges, chunk_size=CHUNK_SIZE, dtype=np.int64):
+    edges = iter(edges)
+    while True:
+        flat = np.fromiter(itertools.chain.from_iterable(itertools.islice(edges, chunk_size)), dtype=dtype)
+        if not len(flat):
+            return
+        flat = flat.reshape(-1, 2)
+        yield flat[:, 0], flat[:, 1]
+
+
+"""
+Read the edges from a text file with one "child<delimiter>parent" edge per line in chunks, e.g. a
+CSV file with delimiter "," or a TSV file with delimiter "\t". Lines starting with "#" are skipped.
+
+:param str path: the path of the edge file
+:param str delimiter: the column delimiter, default ","
+:param int chunk_size: the maximum number of edges in a chunk, default CHUNK_SIZE
+:param dtype: the type of the node ids, default numpy.int64
+:param int skip_header: the number of header lines to skip, default 0
+:returns: yield the pairs (child, parent) of arrays, one per chunk
+"""
+
+
+def csv_chunks(path, delimiter=",", chunk_size=CHUNK_SIZE, dtype=np.int64, skip_header=0):
+    with open(path) as fp:
+        for line in itertools.islice(fp, skip_header):
+            pass
+        while True:
+            lines = list(itertools.islice(fp, chunk_size))
+            if not lines:
+                return
+            edges = np.loadtxt(lines, delimiter=delimiter, dtype=dtype, ndmin=2, usecols=(0, 1))
+            yield edges[:, 0], edges[:, 1]
+
+
+"""
+Read the edges from a binary edge file, a flat array of integers with the child and the parent
+of each edge next to each other, see write_binary_edges(). The file is memory-mapped and the
+chunks are views into it, nothing is read before it is used.
+
+:param str path: the path of the edge file
+:param dtype: the integer type of the node ids in the file, default numpy.int64
+:param int chunk_size: the maximum number of edges in a chunk, default CHUNK_SIZE
+:returns: yield the pairs (child, parent) of arrays, one per chunk
+"""
+
+
+def binary_chunks(path, dtype=np.int64, chunk_size=CHUNK_SIZE):
+    if os.path.getsize(path) == 0:
+        return
+    edges = np.memmap(path, dtype=dtype, mode="r").reshape(-1, 2)
+    for start in range(0, len(edges), chunk_size):
+        yield edges[start:start + chunk_size, 0], edges[start:start + chunk_size, 1]
+
+
+"""
+Write the edges to a binary edge file that binary_chunks() can memory-map.
+
+:param str path: the path of the edge file
+:param numpy.ndarray child: the child id of each edge
+:param numpy.ndarray parent: the parent id of each edge
+:param dtype: the integer type of the node ids in the file, default numpy.int64
+"""
+
+
+def write_binary_edges(path, child, parent, dtype=np.int64):
+    np.column_stack([child, parent]).astype(dtype).tofile(path)
+
+
+def _counted(chunks, stats):
+    for child, parent in chunks:
+        stats.edges += len(child)
+        yield child, parent
+
+
+"""
+Streaming constructors shared by the tree classes. A tree class provides _from_chunks(root, chunks)
+to build itself from an iterable of (child, parent) array pairs, and gets constructors reading from
+an iterator, a CSV/TSV file or a binary edge file. Every constructor stores the throughput as
+tree.ingest_stats and logs it.
+"""
+
+
+class StreamingConstructors(object):
+
+    """
+    Build a tree from chunks of edges.
+
+    :param int root: the root id of the tree
+    :param chunks: an iterable of (child, parent) array pairs
+    :returns: return the tree
+    """
+
+    @classmethod
+    def from_edge_chunks(cls, root, chunks):
+        stats = IngestStats()
+        start = default_timer()
+        tree = cls._from_chunks(root, _counted(chunks, stats))
+        stats.seconds = default_timer() - start
+        tree.ingest_stats = stats
+        logging.info("read {0} edges in {1:.3f} s, {2:.0f} edges/s"
+                     .format(stats.edges, stats.seconds, stats.edges_per_second))
+        return tree
+
+    """
+    Build a tree from an iterator of (child, parent) pairs, see iterator_chunks().
+    """
+
+    @classmethod
+    def from_iterator(cls, root, edges, chunk_size=CHUNK_SIZE, dtype=np.int64):
+        return cls.from_edge_chunks(root, iterator_chunks(edges, chunk_size, dtype))
+
+    """
+    Build a tree from a CSV or TSV edge file, see csv_chunks().
+    """
+
+    @classmethod
+    def from_csv(cls, root, path, delimiter=",", chunk_size=CHUNK_SIZE, dtype=np.int64, skip_header=0):
+        return cls.from_edge_chunks(root, csv_chunks(path, delimiter, chunk_size, dtype, skip_header))
+
+    """
+    Build a tree from a memory-mapped binary edge file, see binary_chunks().
+    """
+
+    @classmethod
+    def from_binary(cls, root, path, dtype=np.int64, chunk_size=CHUNK_SIZE):
+        return cls.from_edge_chunks(root, binary_chunks(path, dtype, chunk_size))
+
+    """
+    Build a tree from a general graph, with cycles, nodes of several parents or repeated edges, by
+    extracting a spanning tree below the chosen root first, see spanning.spanning_tree(). The edges
+    dropped from the graph are reported in tree.spanning_stats and logged.
+
+    :param int root: the root id of the tree
+    :param edges: the (child, parent) edges of the graph, an iterable of pairs or an N x 2 array
+    :param bool directed: whether the edges can only be followed from the parent to the child, default True
+    :param str method: "bfs" or "prim", "prim" holding up to a Python tuple per edge in its heap,
+                       see spanning.spanning_tree(), default "bfs"
+    :param weights: the weight of each edge for "prim", default None
+    :param int chunk_size: the number of pairs read at a time from an iterable, default CHUNK_SIZE
+    :param dtype: the type of the node ids, default numpy.int64
+    :returns: return the tree
+    """
+
+    @classmethod
+    def from_graph(cls, root, edges, directed=True, method="bfs", weights=None, chunk_size=CHUNK_SIZE,
+                   dtype=np.int64):
+        if isinstance(edges, np.ndarray):
+            edges = edges.reshape(-1, 2)
+            child, parent = edges[:, 0], edges[:, 1]
+        else:
+            chunks = list(iterator_chunks(edges, chunk_size, dtype))
+            child = np.concatenate([c for c, _ in chunks]) if chunks else np.zeros(0, dtype=dtype)
+            parent = np.concatenate([p for _, p in chunks]) if chunks else np.zeros(0, dtype=dtype)
+            del chunks
+        child, parent, stats = spanning_tree(root, child, parent, directed, method, weights)
+        tree = cls.from_edge_chunks(root, [(child, parent)])
+        tree.spanning_stats = stats
+        return tree
@@ -0,0 +1,263 @@
+import collections
+import functools
+import numpy as np
+from timeit import default_timer
+
+
+"""
+The default number of records kept by a TraceBuffer, the oldest records are overwritten first.
+"""
+TRACE_CAPACITY = 1 << 20
+
+"""
+The columns of a trace record, one record per node and phase. The node column holds the index of the
+node id in the id table of the buffer, so ids of any hashable type are traced. The columns a phase
+does not set keep -1 for the integers and NaN for the floats.
+"""
+TRACE_DTYPE = np.dtype([("phase", np.int16), ("node", np.int64), ("depth", np.int32), ("band", np.int32),
+                        ("radius", np.float64), ("theta", np.float64), ("phi", np.float64)])
+
+
+"""
+A bounded, array-backed ring buffer of per-node trace records. Records are appended a generation or
+a phase at a time as columns, so tracing costs a few array copies per call instead of a formatted
+log line per node.
+"""
+
+
+class TraceBuffer(object):
+
+    """
+    The constructor for the trace buffer.
+
+    :param int capacity: the maximum number of records kept, default TRACE_CAPACITY
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self.phases = []
+        self.ids = []
+        self._index = {}
+        self.written = 0
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    @property
+    def dropped(self):
+        return max(0, self.written - self.capacity)
+
+    """
+    Append one record per node, the other columns are scalars or arrays as long as the nodes.
+
+    :param str phase: the phase name
+    :param nodes: the node ids, of any hashable type
+    :param columns: the values of the depth, band, radius, theta and phi columns
+    """
+
+    def append(self, phase, nodes, **columns):
+        if phase not in self.phases:
+            self.phases.append(phase)
+        nodes = self._intern(nodes.tolist() if isinstance(nodes, np.ndarray) else list(nodes))
+        keep = min(len(nodes), self.capacity)
+        rows = (self.written + len(nodes) - keep + np.arange(keep)) % self.capacity
+        block = np.zeros(keep, dtype=TRACE_DTYPE)
+        block["phase"] = self.phases.index(phase)
+        block["node"] = nodes[len(nodes) - keep:]
+        for name in ["depth", "band"]:
+            block[name] = -1
+        for name in ["radius", "theta", "phi"]:
+            block[name] = np.nan
+        for name, values in columns.items():
+            values = np.asarray(values)
+            block[name] = values[len(nodes) - keep:] if values.ndim else values
+        self.records[rows] = block
+        self.written += len(nodes)
+
+    """
+    Get the index of each node id in the id table, adding the ids not seen yet.
+
+    :param list nodes: the node ids
+    :returns: return the indices as an int64 array
+    """
+
+    def _intern(self, nodes):
+        index, ids = self._index, self.ids
+        indices = np.empty(len(nodes), dtype=np.int64)
+        for i, node in enumerate(nodes):
+            j = index.get(node)
+            if j is None:
+                j = index[node] = len(ids)
+                ids.append(node)
+            indices[i] = j
+        return indices
+
+    """
+    Get the node ids of records.
+
+    :param numpy.ndarray records: the records, as returned by to_array or phase_records
+    :returns: return the list of the node id of each record
+    """
+
+    def node_ids(self, records):
+        ids = self.ids
+        return [ids[i] for i in records["node"].tolist()]
+
+    """
+    Get the records kept, from the oldest to the newest.
+
+    :returns: return the records as a structured array of TRACE_DTYPE
+    """
+
+    def to_array(self):
+        if self.written <= self.capacity:
+            return self.records[:self.written].copy()
+        start = self.written % self.capacity
+        return np.concatenate([self.records[start:], self.records[:start]])
+
+    """
+    Get the records of one phase, from the oldest to the newest.
+
+    :param str phase: the phase name
+    :returns: return the records as a structured array of TRACE_DTYPE
+    """
+
+    def phase_records(self, phase):
+        records = self.to_array()
+        if phase not in self.phases:
+            return records[:0]
+        return records[records["phase"] == self.phases.index(phase)]
+
+
+"""
+Timers, counters, hooks and an optional trace buffer for the layout phases of a tree. Attach it to
+a tree as tree.instrumentation, or pass it to get_layout(..., instrumentation=...), and every phase
+is timed and its nodes counted. With no instrumentation attached, a phase only checks the attribute.
+    - timers: the total seconds of each phase, and calls the number of times it ran
+    - counters: the totals of nodes_visited, bands_created and zero_division_fallbacks, the nodes
+      left unplaced by a ZeroDivisionError, and phase_counters the same per phase
+    - hooks: callables hook(event, phase, instrumentation) invoked with the event "start" or "end"
+      at the phase boundaries
+    - trace: a TraceBuffer of per-node records if tracing is on, else None
+"""
+
+
+class Instrumentation(object):
+
+    """
+    The constructor for the instrumentation.
+
+    :param bool trace: whether to record per-node trace records, default False
+    :param int capacity: the maximum number of trace records kept, default TRACE_CAPACITY
+    :param list hooks: the callables invoked at the phase boundaries, default None
+    """
+
+    def __init__(self, trace=False, capacity=TRACE_CAPACITY, hooks=None):
+        self.timers = collections.OrderedDict()
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+        self.phase_counters = collections.defaultdict(collections.Counter)
+        self.hooks = list(hooks or [])
+        self.trace = TraceBuffer(capacity) if trace else None
+        self._running = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    """
+    Start timing a phase and invoke the hooks with the event "start".
+
+    :param str phase: the phase name
+    """
+
+    def start(self, phase):
+        for hook in self.hooks:
+            hook("start", phase, self)
+        self._running.append((phase, default_timer()))
+
+    """
+    Stop timing the last phase started and invoke the hooks with the event "end".
+    """
+
+    def stop(self):
+        phase, start = self._running.pop()
+        self.timers[phase] = self.timers.get(phase, 0.) + default_timer() - start
+        self.calls[phase] += 1
+        for hook in self.hooks:
+            hook("end", phase, self)
+
+    """
+    Get the name of the phase running, the innermost one if phases are nested.
+
+    :returns: return the phase name, or None outside any phase
+    """
+
+    @property
+    def phase(self):
+        return self._running[-1][0] if self._running else None
+
+    """
+    Add to a counter, in the total and in the running phase.
+
+    :param str name: the counter name
+    :param int value: the amount to add, default 1
+    """
+
+    def count(self, name, value=1):
+        self.counters[name] += int(value)
+        if self._running:
+            self.phase_counters[self.phase][name] += int(value)
+
+    """
+    Account for a batch of nodes handled by the running phase: count them as visited and, given
+    their bands, count the bands created and the ZeroDivisionError fallbacks, then record them in
+    the trace buffer if tracing is on.
+
+    :param nodes: the node ids
+    :param parent: the parent id or position of each node, to count the bands per parent
+    :param columns: the trace columns, see TRACE_DTYPE, band also counts the bands and fallbacks
+    """
+
+    def observe(self, nodes, parent=None, **columns):
+        self.count("nodes_visited", len(nodes))
+        band = columns.get("band")
+        if band is not None and parent is not None:
+            band = np.asarray(band)
+            placed = band > 0
+            if placed.any():
+                parent = np.unique(np.asarray(parent)[placed], return_inverse=True)[1].astype(np.int64)
+                self.count("bands_created", len(np.unique(parent * (band.max() + 1) + band[placed])))
+            self.count("zero_division_fallbacks", np.count_nonzero(band < 0))
+        if self.trace is not None:
+            self.trace.append(self.phase, nodes, **columns)
+
+    """
+    Summarize the timers and counters.
+
+    :returns: return a dict of timers, calls, counters, phase_counters and the trace size
+    """
+
+    def summary(self):
+        return {"timers": dict(self.timers), "calls": dict(self.calls), "counters": dict(self.counters),
+                "phase_counters": dict((phase, dict(counters)) for phase, counters in self.phase_counters.items()),
+                "trace": {"records": len(self.trace), "dropped": self.trace.dropped} if self.trace else None}
+
+
+"""
+Time a tree method as a phase named after it when the tree has an instrumentation attached.
+"""
+
+
+def instrumented(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return method(self, *args, **kwargs)
+        instrumentation.start(method.__name__)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            instrumentation.stop()
+    return wrapper
@@ -0,0 +1,195 @@
+import numpy as np
+from kernels import INDEX_DTYPE
+
+
+"""
+A compact table of arbitrary hashable node ids, e.g. post URLs or user-id strings, interned to dense
+int32 indices in the order of their first appearance. The reverse table is stored by the type of
+the ids:
+    - integers: one int64 array
+    - strings: their UTF-8 bytes concatenated in one buffer, with the int64 offset of every id
+    - any other hashable ids: a list
+The lookup of an id is a binary search in the sorted 64-bit keys of the ids, the integers
+themselves or the hashes of the other ids, each with the index it stands for, and the candidates
+are checked against the reverse table, so the hashes may collide. The ids added after the table was
+built, e.g. for Tree.insert_edge on a laid out tree, are kept in a dict of their own.
+"""
+
+
+class IdTable(object):
+
+    """
+    The constructor for the id table.
+
+    :param ids: the unique node ids, in the order of their dense indices
+    """
+
+    def __init__(self, ids):
+        ids = list(ids)
+        self.size = len(ids)
+        types = set(map(type, ids))
+        if all(issubclass(t, (int, np.integer)) and not issubclass(t, bool) for t in types):
+            self.kind = "int"
+            self.values = np.array(ids, dtype=np.int64)
+            keys = self.values
+        elif types <= {str}:
+            self.kind = "str"
+            encoded = list(map(str.encode, ids))
+            self.buffer = b"".join(encoded)
+            self.offsets = np.zeros(self.size + 1, dtype=np.int64)
+            np.cumsum(list(map(len, encoded)), out=self.offsets[1:])
+            del encoded
+            keys = np.array(list(map(hash, ids)), dtype=np.int64)
+        else:
+            self.kind = "object"
+            self.values = ids
+            keys = np.array(list(map(hash, ids)), dtype=np.int64)
+        self.order = np.argsort(keys, kind="mergesort").astype(INDEX_DTYPE)
+        self.keys = keys[self.order]
+        self.added = {}
+        self.added_ids = []
+
+    """
+    Intern the ids of a tree given by its root and edges, the root first, then the children in the
+    order of the edges and the parents which are no child of any edge last. As every node of a tree
+    is the child of one edge, the children are numbered by their position in one pass.
+
+    :param root: the root id
+    :param edges: the (child, parent) edges
+    :returns: return the triple (table, root, edges), the IdTable and the root and edges as dense indices
+    """
+
+    @classmethod
+    def from_edges(cls, root, edges):
+        edges = list(edges)
+        index = {} if root is None else {root: 0}
+        first = len(index)
+        children = list(range(first, first + len(edges)))
+        index.update(zip([child for child, _ in edges], children))
+        if len(index) != first + len(edges):
+            index = {} if root is None else {root: 0}
+            children = [index.setdefault(child, len(index)) for child, _ in edges]
+        parents = list(map(index.get, [parent for _, parent in edges]))
+        if None in parents:
+            parents = [index.setdefault(parent, len(index)) for _, parent in edges]
+        return cls(index), None if root is None else 0, list(zip(children, parents))
+
+    def __len__(self):
+        return self.size + len(self.added_ids)
+
+    def __contains__(self, node_id):
+        try:
+            self.index(node_id)
+        except KeyError:
+            return False
+        return True
+
+    """
+    Get the number of bytes held by the table, the arrays and buffer in full and the ids added later
+    by the size of their references.
+    """
+
+    @property
+    def nbytes(self):
+        if self.kind == "int":
+            reverse = self.values.nbytes
+        elif self.kind == "str":
+            reverse = len(self.buffer) + self.offsets.nbytes
+        else:
+            reverse = 8 * len(self.values)
+        return reverse + self.keys.nbytes + self.order.nbytes + 8 * 3 * len(self.added_ids)
+
+    def _key(self, node_id):
+        if self.kind != "int":
+            return hash(node_id)
+        if not isinstance(node_id, (int, np.integer)) or isinstance(node_id, bool) or \
+                not -2 ** 63 <= node_id < 2 ** 63:
+            return None
+        return node_id
+
+    def _id(self, i):
+        if i >= self.size:
+            return self.added_ids[i - self.size]
+        if self.kind == "str":
+            return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+        return self.values[i].item() if self.kind == "int" else self.values[i]
+
+    """
+    Look up the dense index of a node id.
+
+    :param node_id: the node id
+    :returns: return the dense index, a KeyError is raised for an unknown id
+    """
+
+    def index(self, node_id):
+        if node_id in self.added:
+            return self.added[node_id]
+        key = self._key(node_id)
+        if key is not None:
+            lo = int(np.searchsorted(self.keys, key))
+            while lo < self.size and self.keys[lo] == key:
+                if self._id(int(self.order[lo])) == node_id:
+                    return int(self.order[lo])
+                lo += 1
+        raise KeyError(node_id)
+
+    """
+    Add a node id to the table if it is not in it yet.
+
+    :param node_id: the node id
+    :returns: return the dense index of the node id
+    """
+
+    def add(self, node_id):
+        try:
+            return self.index(node_id)
+        except KeyError:
+            self.added[node_id] = len(self)
+            self.added_ids.append(node_id)
+            return self.added[node_id]
+
+    """
+    Translate node ids to their dense indices in bulk.
+
+    :param ids: the node ids
+    :returns: return the dense indices as an int32 array, a KeyError is raised for an unknown id
+    """
+
+    def intern(self, ids):
+        ids = ids if isinstance(ids, np.ndarray) else list(ids)
+        if self.kind == "int":
+            keys = np.asarray(ids)
+            keys = keys.astype(np.int64) if keys.dtype.kind in "iu" else None
+        else:
+            keys = np.array(list(map(hash, ids)), dtype=np.int64)
+        if keys is None or not self.size:
+            return np.array([self.index(x) for x in ids], dtype=INDEX_DTYPE).reshape(-1)
+        found = self.order[np.minimum(np.searchsorted(self.keys, keys), self.size - 1)]
+        if self.kind == "int":
+            missed = np.flatnonzero(self.values[found] != keys)
+        else:
+            missed = [k for k, (i, x) in enumerate(zip(found.tolist(), ids)) if self._id(i) != x]
+        for k in missed:
+            found[k] = self.index(ids[k])
+        return found
+
+    """
+    Translate dense indices back to the node ids in bulk, e.g. for an export of the layout.
+
+    :param indices: the dense indices
+    :returns: return the node ids, as an int64 array for integer ids, otherwise as an object array
+    """
+
+    def external(self, indices):
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if self.kind == "int" and not self.added_ids:
+            return self.values[indices]
+        if self.kind == "str" and not self.added_ids:
+            buffer, starts, stops = self.buffer, self.offsets[indices].tolist(), self.offsets[indices + 1].tolist()
+            ids = [buffer[start:stop].decode("utf-8") for start, stop in zip(starts, stops)]
+        else:
+            ids = [self._id(i) for i in indices.tolist()]
+        integer = self.kind == "int" and all(isinstance(x, (int, np.integer)) for x in self.added_ids)
+        result = np.empty(len(ids), dtype=np.int64 if integer else object)
+        result[:] = ids
+        return result
@@ -0,0 +1,248 @@
+import logging
+import math
+import numpy as np
+from h3math import RESERVATION, LEAF_AREA, compute_radius, compute_radius_array, \
+    compute_hyperbolic_area_array, compute_delta_phi, compute_delta_theta, sph_to_cart_array, \
+    transformation_matrices, apply_transformations
+
+
+"""
+Integer type of the dense node indices used by the array-backed tree structures.
+"""
+INDEX_DTYPE = np.int32
+
+
+"""
+Build the children lookup of a tree in compressed sparse row (CSR) form, the children of node i
+are child_index[child_offsets[i]:child_offsets[i + 1]]. A stable sort is used so that the siblings
+keep the order in which their edges were given, the same order Tree.insert_edge appends them.
+
+:param numpy.ndarray child: the dense index of the child of each edge
+:param numpy.ndarray parent: the dense index of the parent of each edge
+:param int n: the number of nodes in the tree
+:returns: return the pair (child_offsets, child_index) as integer arrays
+"""
+
+
+def build_children(child, parent, n):
+    by_parent = np.argsort(parent, kind="mergesort")
+    child_offsets = np.zeros(n + 1, dtype=INDEX_DTYPE)
+    np.cumsum(np.bincount(parent, minlength=n), out=child_offsets[1:])
+    return child_offsets, np.asarray(child, dtype=INDEX_DTYPE)[by_parent]
+
+
+"""
+Gather the children of a set of nodes in one go, the children of each node stay contiguous and
+in their CSR order, and the nodes are visited in the given order.
+
+:param numpy.ndarray child_offsets: the CSR offsets of the children lookup
+:param numpy.ndarray child_index: the CSR child index array of the children lookup
+:param numpy.ndarray nodes: the dense indices of the parent nodes
+:returns: return the dense indices of all children as an integer array
+"""
+
+
+def gather_children(child_offsets, child_index, nodes):
+    starts = child_offsets[nodes].astype(np.int64)
+    counts = child_offsets[nodes + 1] - starts
+    ends = np.cumsum(counts)
+    shift = np.repeat(starts - ends + counts, counts)
+    return child_index[shift + np.arange(ends[-1] if len(ends) else 0)]
+
+
+"""
+Traverse the tree in a breath-first-search, one generation at a time.
+
+:param numpy.ndarray child_offsets: the CSR offsets of the children lookup
+:param numpy.ndarray child_index: the CSR child index array of the children lookup
+:param roots: the dense indices of the first generation, usually the root only
+:returns: return the pair (order, level_bounds), the dense indices in BFS order and the offsets
+          of each generation in it, so generation d is order[level_bounds[d]:level_bounds[d + 1]]
+"""
+
+
+def bfs_levels(child_offsets, child_index, roots):
+    frontier = np.asarray(roots, dtype=INDEX_DTYPE).reshape(-1)
+    levels = []
+    while len(frontier):
+        levels.append(frontier)
+        frontier = gather_children(child_offsets, child_index, frontier)
+    level_bounds = np.zeros(len(levels) + 1, dtype=np.int64)
+    np.cumsum([len(level) for level in levels], out=level_bounds[1:])
+    if not levels:
+        return np.zeros(0, dtype=INDEX_DTYPE), level_bounds
+    return np.concatenate(levels), level_bounds
+
+
+"""
+Compute the subtree size, hemisphere radius and area of every node in one sweep over the
+generations from the last one to the root. The nodes are given in breath-first-search order, so the
+children of a generation are exactly the next generation, grouped by parent in the same order as the
+parents. For each generation the child areas are computed in one vectorized call, summed per parent
+with a segmented sum and turned into the parents' radii in bulk. A leaf gets the radius of a
+hemisphere of LEAF_AREA and keeps a zero area.
+
+:param numpy.ndarray num_children: the number of children of each node, in BFS order
+:param numpy.ndarray level_bounds: the offsets of each generation in the BFS order
+:param initial: the triple (tree_size, radius, area) in BFS order to start from, the nodes without
+                children keep their values, e.g. the roots of subtrees laid out on their own,
+                default None for leaves
+:returns: return the triple (tree_size, radius, area) as arrays in BFS order
+"""
+
+
+def reverse_sweep(num_children, level_bounds, initial=None):
+    if initial is None:
+        tree_size = np.ones(len(num_children), dtype=np.int64)
+        radius = np.zeros(len(num_children))
+        area = np.zeros(len(num_children))
+        radius[num_children == 0] = compute_radius(LEAF_AREA)
+    else:
+        tree_size, radius, area = [np.array(values) for values in initial]
+    for d in range(len(level_bounds) - 3, -1, -1):
+        lo, hi, end = level_bounds[d], level_bounds[d + 1], level_bounds[d + 2]
+        counts = num_children[lo:hi]
+        has_children = counts > 0
+        starts = (np.cumsum(counts) - counts)[has_children]
+        parents = lo + np.flatnonzero(has_children)
+        tree_size[parents] += np.add.reduceat(tree_size[hi:end], starts)
+        area[parents] = np.add.reduceat(RESERVATION * compute_hyperbolic_area_array(radius[hi:end]), starts)
+        radius[parents] = compute_radius_array(area[parents])
+    return tree_size, radius, area
+
+
+"""
+Place one generation of hemispheres on their parent hemispheres, band by band, see Tree.set_placement
+for the placement rules. The nodes are given in placement order, the children of a parent are
+contiguous and sorted. A first child stays on the pole with band 0, and a node raising a
+ZeroDivisionError keeps band -1 and zero angles.
+
+:param numpy.ndarray radius: the hemisphere radius of each node
+:param numpy.ndarray parent_radius: the hemisphere radius of the parent of each node
+:param numpy.ndarray parent: any id of the parent of each node, to tell the sibling groups apart
+:param list state: the placement carried from one call to the next, to place a sibling group too
+                   large for one call in several, an empty list for the first call, updated in place,
+                   default None
+:returns: return the triple (band, theta, phi) as arrays in the given order
+"""
+
+
+def place_bands(radius, parent_radius, parent, state=None):
+    bands = np.full(len(radius), -1, dtype=INDEX_DTYPE)
+    thetas = np.zeros(len(radius))
+    phis = np.zeros(len(radius))
+    radius, parent_radius, parent = radius.tolist(), parent_radius.tolist(), parent.tolist()
+    # last_max_phi: span phi before jumping to the next band
+    last_parent, phi, theta, delta_theta, band, last_max_phi = state or [None, 0.000001, 0., 0., 1, 0]
+    for i in range(len(radius)):
+        if parent[i] != last_parent:  # same gen, diff parent
+            last_parent = parent[i]
+            phi, theta, delta_theta, band = 0.000001, 0., 0., 1
+        rp = parent_radius[i]
+        try:
+            if phi == 0.000001:  # first child
+                phi += compute_delta_phi(radius[i], rp)
+                bands[i] = 0
+            else:
+                delta_theta = compute_delta_theta(radius[i], rp, phi)
+                if (theta + delta_theta) <= 2 * math.pi:
+                    theta += delta_theta
+                    if last_max_phi:
+                        last_max_phi = compute_delta_phi(radius[i], rp)
+                        phi += compute_delta_phi(radius[i], rp)
+                else:
+                    band += 1
+                    theta = delta_theta
+                    phi += last_max_phi + compute_delta_phi(radius[i], rp)
+                    last_max_phi = 0
+                bands[i] = band
+                thetas[i] = theta
+                phis[i] = phi
+        except ZeroDivisionError as e:
+            logging.error("{0}\n radius={1}, rp={2}, phi={3}".format(e, radius[i], rp, phi))
+        theta += delta_theta    # reserve space for the other half sphere
+    if state is not None:
+        state[:] = [last_parent, phi, theta, delta_theta, band, last_max_phi]
+    return bands, thetas, phis
+
+
+"""
+Compute the cartesian coordinates of one generation of placed hemispheres. A node is placed on its
+parent hemisphere by its theta and phi, rotated by the parent's theta and phi and moved to the
+parent's coordinate, except for the children of the root which stay around the origin. The
+rotation and translation of each parent are stacked as one 4x4 matrix and all the nodes are
+transformed in one batched matrix product.
+
+:param numpy.ndarray theta: the theta of each node
+:param numpy.ndarray phi: the phi of each node
+:param numpy.ndarray group: the row of the parent of each node in the parent arrays
+:param numpy.ndarray parent_radius: the hemisphere radius of each parent
+:param numpy.ndarray parent_theta: the theta of each parent
+:param numpy.ndarray parent_phi: the phi of each parent
+:param numpy.ndarray parent_coord: the M x 3 coordinates of each parent
+:param bool at_root: whether the parents are the root
+:returns: return the N x 3 coordinates as a float array
+"""
+
+
+def place_coords(theta, phi, group, parent_radius, parent_theta, parent_phi, parent_coord, at_root):
+    coords = sph_to_cart_array(theta, phi, parent_radius[group])
+    if not at_root:
+        matrices = transformation_matrices(parent_theta, parent_phi, parent_coord)
+        coords = apply_transformations(matrices, coords, group)
+    return coords[:, :3]
+
+
+"""
+Sort the children of every node and place them, one generation at a time from the root to the
+last generation. The nodes are given in breath-first-search order and the children of each node
+are sorted in decreasing order by the key, siblings with the same key keep their order.
+
+:param numpy.ndarray num_children: the number of children of each node, in BFS order
+:param numpy.ndarray level_bounds: the offsets of each generation in the BFS order
+:param numpy.ndarray radius: the hemisphere radius of each node, in BFS order
+:param numpy.ndarray key: the sort key of each node, in BFS order
+:returns: return (child_order, band, theta, phi, coords) in BFS order, where child_order holds the
+          sorted BFS positions of the children of each node in the slots of its children
+"""
+
+
+def forward_sweep(num_children, level_bounds, radius, key):
+    for _, sweep in forward_levels(num_children, level_bounds, radius, key):
+        pass
+    return sweep
+
+
+"""
+Run forward_sweep() one generation at a time, e.g. to hand the coordinates of every generation on
+as soon as it is placed.
+
+:param numpy.ndarray num_children: the number of children of each node, in BFS order
+:param numpy.ndarray level_bounds: the offsets of each generation in the BFS order
+:param numpy.ndarray radius: the hemisphere radius of each node, in BFS order
+:param numpy.ndarray key: the sort key of each node, in BFS order
+:returns: yield the pair (placed, sweep) for every generation, the root first, where placed holds
+          the BFS positions of the generation in placing order and sweep the arrays
+          (child_order, band, theta, phi, coords) of forward_sweep(), set up to this generation
+"""
+
+
+def forward_levels(num_children, level_bounds, radius, key):
+    n = len(num_children)
+    child_order = np.arange(n)
+    band = np.full(n, -1, dtype=INDEX_DTYPE)
+    theta = np.zeros(n)
+    phi = np.zeros(n)
+    coords = np.zeros((n, 3))
+    sweep = (child_order, band, theta, phi, coords)
+    yield np.arange(level_bounds[1]), sweep
+    for d in range(1, len(level_bounds) - 1):
+        above, lo, hi = level_bounds[d - 1], level_bounds[d], level_bounds[d + 1]
+        parent = np.repeat(np.arange(above, lo), num_children[above:lo])
+        placed = lo + np.lexsort((-key[lo:hi], parent))
+        child_order[lo:hi] = placed
+        p = parent[placed - lo]
+        band[placed], theta[placed], phi[placed] = place_bands(radius[placed], radius[p], p)
+        coords[placed] = place_coords(theta[placed], phi[placed], p - above, radius[above:lo],
+                                      theta[above:lo], phi[above:lo], coords[above:lo], d == 1)
+        yield placed, sweep
@@ -0,0 +1,186 @@
+import json
+import logging
+import struct
+import numpy as np
+
+from errors import InvalidArgument
+
+
+"""
+The layout file format. The file starts with the magic bytes and a JSON header, padded to HEADER_SIZE
+bytes, followed by one contiguous little-endian column per attribute, each aligned to ALIGNMENT bytes:
+    - id: the node id, int64
+    - parent: the row of the parent node, -1 for the root, int32
+    - depth: the depth of the node in the tree, int32
+    - x, y, z: the node's coordinate, float32 or float64
+    - optionally the layout attributes in ATTRIBUTES, each in its own type, as written by
+      export_layout(path, attributes=True) for a tree to be restored by apply_layout()
+The rows are sorted by node id, so the row of a node is found by a binary search on the id column.
+Only integer node ids fit the id column, write_layout() raises InvalidArgument for any other id.
+"""
+MAGIC = b"HYPYLAYT"
+VERSION = 1
+HEADER_SIZE = 4096
+ALIGNMENT = 64
+ATTRIBUTES = ["tree_size", "radius", "area", "band", "theta", "phi", "rank"]
+
+
+"""
+Write the layout of a tree as a columnar binary file.
+
+:param str path: the path of the layout file
+:param numpy.ndarray ids: the integer node id of each row, in increasing order
+:param numpy.ndarray parent: the row of the parent of each row, -1 for the root
+:param numpy.ndarray depth: the depth of each row
+:param numpy.ndarray x: the x coordinate of each row
+:param numpy.ndarray y: the y coordinate of each row
+:param numpy.ndarray z: the z coordinate of each row
+:param dtype: the float type of the coordinates, numpy.float32 or numpy.float64, default numpy.float32
+:param list extra: more columns as (name, values) pairs, each written in the type of its values, default None
+"""
+
+
+def write_layout(path, ids, parent, depth, x, y, z, dtype=np.float32, extra=None):
+    ids = np.asarray(ids)
+    if ids.size and (ids.dtype.kind not in "iu" or ids.dtype.kind == "u" and ids.max() > np.iinfo(np.int64).max):
+        logging.error("Only integer node ids can be written to a layout file \n")
+        raise InvalidArgument("Only integer node ids can be written to a layout file \n")
+    columns = [("id", ids.astype("<i8")),
+               ("parent", np.asarray(parent, dtype="<i4")),
+               ("depth", np.asarray(depth, dtype="<i4"))]
+    columns += [(name, np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<")))
+                for name, values in [("x", x), ("y", y), ("z", z)]]
+    for name, values in extra or []:
+        values = np.asarray(values)
+        columns.append((name, values.astype(values.dtype.newbyteorder("<"))))
+    header, size = _header([(name, values.dtype) for name, values in columns], len(columns[0][1]))
+    with open(path, "wb") as fp:
+        _write_header(fp, header)
+        for column, (name, values) in zip(header["columns"], columns):
+            fp.seek(column["offset"])
+            fp.write(values.tobytes())
+        fp.truncate(size)
+
+
+"""
+Create a layout file of zeros, to be filled in place through memory-mapped windows of its columns,
+e.g. by a layout too large to hold in memory for write_layout().
+
+:param str path: the path of the layout file
+:param int num_nodes: the number of rows
+:param dtype: the float type of the coordinates, numpy.float32 or numpy.float64, default numpy.float32
+:returns: return a dict of the columns, the pair (dtype, offset) in the file by column name
+"""
+
+
+def create_layout(path, num_nodes, dtype=np.float32):
+    columns = [("id", np.dtype("<i8")), ("parent", np.dtype("<i4")), ("depth", np.dtype("<i4"))]
+    columns += [(name, np.dtype(dtype).newbyteorder("<")) for name in ["x", "y", "z"]]
+    header, size = _header(columns, num_nodes)
+    with open(path, "wb") as fp:
+        _write_header(fp, header)
+        fp.truncate(size)
+    return dict((column["name"], (np.dtype(column["dtype"]), column["offset"])) for column in header["columns"])
+
+
+def _header(columns, num_nodes):
+    header = {"version": VERSION, "num_nodes": num_nodes, "columns": []}
+    offset = HEADER_SIZE
+    for name, dtype in columns:
+        header["columns"].append({"name": name, "dtype": dtype.str, "offset": offset})
+        offset += -(-dtype.itemsize * num_nodes // ALIGNMENT) * ALIGNMENT
+    return header, offset
+
+
+def _write_header(fp, header):
+    text = json.dumps(header).encode("utf-8")
+    if len(MAGIC) + 4 + len(text) > HEADER_SIZE:
+        logging.error("The layout header does not fit in {0} bytes \n".format(HEADER_SIZE))
+        raise InvalidArgument("The layout header does not fit in {0} bytes \n".format(HEADER_SIZE))
+    fp.write(MAGIC + struct.pack("<I", len(text)) + text)
+
+
+"""
+A layout file opened by load_layout(). Every column is memory-mapped, so reading one node or one
+column only touches the pages it needs.
+"""
+
+
+class LayoutFile(object):
+
+    """
+    The constructor for the layout file, reading the header only.
+
+    :param str path: the path of the layout file
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                logging.error("{0} is not a layout file \n".format(path))
+                raise InvalidArgument("{0} is not a layout file \n".format(path))
+            length, = struct.unpack("<I", fp.read(4))
+            header = json.loads(fp.read(length).decode("utf-8"))
+        self.path = path
+        self.version = header["version"]
+        self.num_nodes = header["num_nodes"]
+        self.columns = {}
+        for column in header["columns"]:
+            if self.num_nodes:
+                self.columns[column["name"]] = np.memmap(path, dtype=column["dtype"], mode="r",
+                                                         offset=column["offset"], shape=(self.num_nodes,))
+            else:
+                self.columns[column["name"]] = np.zeros(0, dtype=column["dtype"])
+        self.ids = self.columns["id"]
+        self.parent = self.columns["parent"]
+        self.depth = self.columns["depth"]
+        self.x, self.y, self.z = self.columns["x"], self.columns["y"], self.columns["z"]
+
+    def __len__(self):
+        return self.num_nodes
+
+    """
+    Get one column of the layout.
+
+    :param str name: the column name, one of id, parent, depth, x, y and z, or an extra column
+    :returns: return the memory-mapped column
+    """
+
+    def column(self, name):
+        return self.columns[name]
+
+    """
+    Look up the row of a node id by a binary search on the id column.
+
+    :param int node_id: the node id
+    :returns: return the row of the node, a KeyError is raised for an unknown id
+    """
+
+    def row_of(self, node_id):
+        row = int(np.searchsorted(self.ids, node_id))
+        if row == self.num_nodes or self.ids[row] != node_id:
+            raise KeyError(node_id)
+        return row
+
+    """
+    Get the coordinate of one node.
+
+    :param int node_id: the node id
+    :returns: return the node's (x, y, z) coordinate as floats
+    """
+
+    def coord(self, node_id):
+        row = self.row_of(node_id)
+        return float(self.x[row]), float(self.y[row]), float(self.z[row])
+
+
+"""
+Open a layout file written by Tree.export_layout() or write_layout().
+
+:param str path: the path of the layout file
+:returns: return the LayoutFile with memory-mapped columns
+"""
+
+
+def load_layout(path):
+    return LayoutFile(path)
@@ -0,0 +1,116 @@
+import numpy as np
+from kernels import INDEX_DTYPE, place_bands, place_coords, reverse_sweep
+
+
+"""
+A lazy layout for viewers showing the top generations of a tree or one subtree drilled into. The
+subtree sizes and hemisphere radii are computed once for the whole tree, as the placement of every
+node needs the radii of its siblings, but the nodes are only placed when a query asks for them: the
+children of a node are sorted and placed on their bands, one sibling group at a time and one batched
+call per generation, the first time a query reaches the node, and cached. A later query for deeper
+generations or another subtree only places the sibling groups not placed yet, and the coordinates
+are the ones of the fused engine, see Tree.set_layout().
+"""
+
+
+class LazyLayout(object):
+
+    """
+    The constructor for the lazy layout.
+
+    :param ids: the node ids in breath-first-search order, the root first
+    :param numpy.ndarray num_children: the number of children of each node, in the same order
+    :param numpy.ndarray level_bounds: the offsets of each generation in the order
+    """
+
+    def __init__(self, ids, num_children, level_bounds):
+        n = len(num_children)
+        self.ids = np.asarray(ids)
+        self.num_children = np.asarray(num_children, dtype=np.int64)
+        self.level_bounds = np.asarray(level_bounds)
+        self.row = dict((node_id, i) for i, node_id in enumerate(self.ids.tolist()))
+        self.tree_size, self.radius, self.area = reverse_sweep(self.num_children, self.level_bounds)
+        self.depth = np.repeat(np.arange(len(self.level_bounds) - 1), np.diff(self.level_bounds))
+        self.parent = np.full(n, -1, dtype=np.int64)
+        self.parent[1:] = np.repeat(np.arange(n), self.num_children)
+        self.first_child = np.cumsum(self.num_children) - self.num_children + 1
+        self.band = np.full(n, -1, dtype=INDEX_DTYPE)
+        self.theta = np.zeros(n)
+        self.phi = np.zeros(n)
+        self.coords = np.zeros((n, 3))
+        self.placed = np.zeros(n, dtype=bool)
+        self.placed[:1] = True
+        self.expanded = np.zeros(n, dtype=bool)
+
+    """
+    Build the lazy layout of a Tree, which needs no layout of its own.
+
+    :param tree.Tree tree: the tree
+    :returns: return the LazyLayout
+    """
+
+    @classmethod
+    def from_tree(cls, tree):
+        order, level_bounds = tree.get_level_order()
+        return cls(order, [len(tree.nodes[n].children) for n in order], level_bounds)
+
+    """
+    Get the number of nodes placed so far.
+    """
+
+    @property
+    def num_placed(self):
+        return int(np.count_nonzero(self.placed))
+
+    """
+    Get the coordinates of the nodes of a subtree down to a depth cap, placing the ones not placed
+    yet. A subtree needs the sibling groups on the path from the root to it placed too.
+
+    :param subtree: the node id of the subtree root, default None for the root of the tree
+    :param int depth_cap: the number of generations below the subtree root, default None for all of
+                          them, so for the root the same filter as Tree.scatter_plot(depth_cap)
+    :returns: return the pair (ids, coords) of the nodes generation by generation, the node ids and
+              the N x 3 coordinates, a KeyError is raised for an unknown subtree root
+    """
+
+    def get_coords(self, subtree=None, depth_cap=None):
+        top = 0 if subtree is None else self.row[subtree]
+        path = [top]
+        while path[-1] > 0:
+            path.append(self.parent[path[-1]])
+        for row in reversed(path[1:]):
+            self._expand(np.array([row]))
+        levels = [np.array([top])]
+        height = len(self.level_bounds) - 2 - self.depth[top]
+        for _ in range(height if depth_cap is None else min(depth_cap, height)):
+            self._expand(levels[-1])
+            levels.append(self._children(levels[-1])[0])
+        rows = np.concatenate(levels)
+        return self.ids[rows], self.coords[rows]
+
+    def _children(self, rows):
+        counts = self.num_children[rows]
+        ends = np.cumsum(counts)
+        children = np.repeat(self.first_child[rows] - ends + counts, counts) + np.arange(ends[-1] if len(ends) else 0)
+        return children, np.repeat(np.arange(len(rows)), counts)
+
+    """
+    Place the children of the nodes of one generation that were not expanded yet, the same way as
+    one generation of kernels.forward_sweep().
+    """
+
+    def _expand(self, rows):
+        rows = rows[~self.expanded[rows]]
+        self.expanded[rows] = True
+        rows = rows[self.num_children[rows] > 0]
+        if not len(rows):
+            return
+        children, group = self._children(rows)
+        order = np.lexsort((-self.radius[children], group))
+        children, group = children[order], group[order]
+        parent_radius = self.radius[rows]
+        band, theta, phi = place_bands(self.radius[children], parent_radius[group], group)
+        self.band[children], self.theta[children], self.phi[children] = band, theta, phi
+        self.coords[children] = place_coords(theta, phi, group, parent_radius, self.theta[rows], self.phi[rows],
+                                             self.coords[rows], rows[0] == 0)
+        self.placed[children] = True
@@ -0,0 +1,148 @@
+import collections
+import logging
+from errors import InvalidArgument
+
+
+"""
+Level of detail for trees with a few huge subtrees, e.g. power-law cascades where a few nodes have
+10^5 descendants. Before set_placement, the subtrees larger than a size threshold or deeper than a
+depth threshold are collapsed into their roots, the summary nodes in tree.collapsed, and
+set_placement does not place below them. A summary node keeps the hemisphere radius of its whole
+subtree, so the nodes around it are placed exactly as in the full layout and its subtree fits in
+its hemisphere when it is expanded. Focusing a summary node expands it: the thresholds are applied
+again below it, relative to it, and only the newly visible region is placed, one batched call per
+generation, the rest of the layout is not touched. Tree.update_layout keeps the collapsed nodes too,
+and set_layout, which places the whole tree, forgets them, as does clear().
+
+    tree.set_node_depth()
+    tree.set_subtree_radius()
+    tree.set_subtree_size()
+    tree.sort_children_by_radius()
+    lod = LevelOfDetail(tree, max_size=1000)
+    lod.apply()
+    tree.set_placement()
+    lod.focus(node_id)
+"""
+
+
+class LevelOfDetail(object):
+
+    """
+    The constructor for the level of detail.
+
+    :param tree.Tree tree: the tree, with the depth and subtree size of its nodes set
+    :param int max_size: the largest subtree shown below a node, larger ones are collapsed, default None
+    :param int max_depth: the number of generations shown below a node, the nodes of the last one
+                          are collapsed, default None
+    """
+
+    def __init__(self, tree, max_size=None, max_depth=None):
+        if max_size is None and max_depth is None:
+            logging.error("You attempted to set a level of detail without a size or depth threshold \n")
+            raise InvalidArgument("You attempted to set a level of detail without a size or depth threshold \n")
+        self.tree = tree
+        self.max_size = max_size
+        self.max_depth = max_depth
+
+    """
+    Collapse the subtrees over the thresholds below the root, to run before Tree.set_placement.
+
+    :returns: return the list of the collapsed node ids
+    """
+
+    def apply(self):
+        self.tree.collapsed = set()
+        return self._collapse_below(self.tree.root)
+
+    def _collapse_below(self, top):
+        nodes, collapsed = self.tree.nodes, []
+        frontier, depth = list(nodes[top].children), 1
+        while frontier:
+            below = []
+            for n in frontier:
+                node = nodes[n]
+                if not node.children:
+                    continue
+                if (self.max_size is not None and node.tree_size > self.max_size) or \
+                        (self.max_depth is not None and depth >= self.max_depth):
+                    collapsed.append(n)
+                else:
+                    self.tree.collapsed.discard(n)
+                    below.extend(node.children)
+            frontier, depth = below, depth + 1
+        self.tree.collapsed.update(collapsed)
+        return collapsed
+
+    """
+    Get the visible nodes below a node, the ones not below a collapsed node.
+
+    :param top: the node id to start from, default None for the root
+    :returns: return the list of visible node ids in breath-first-search order, top first
+    """
+
+    def visible(self, top=None):
+        nodes, collapsed = self.tree.nodes, self.tree.collapsed
+        order = [self.tree.root if top is None else top]
+        for n in order:
+            if n not in collapsed:
+                order.extend(nodes[n].children)
+        return order
+
+    """
+    Expand a collapsed node: collapse its subtree again by the thresholds relative to it and place
+    the visible part of it.
+
+    :param node_id: the id of the collapsed node
+    :returns: return the list of the newly visible node ids, an InvalidArgument is raised if the node
+              is not collapsed
+    """
+
+    def expand(self, node_id):
+        if node_id not in self.tree.collapsed:
+            logging.error("The node {0} is not collapsed \n".format(node_id))
+            raise InvalidArgument("The node {0} is not collapsed \n".format(node_id))
+        self.tree.collapsed.discard(node_id)
+        self._collapse_below(node_id)
+        self.tree._place_generations([node_id], self.tree.nodes[node_id].depth + 1)
+        return self.visible(node_id)[1:]
+
+    """
+    Collapse a node again, its subtree keeps its placement until it is expanded again.
+
+    :param node_id: the node id
+    """
+
+    def collapse(self, node_id):
+        if self.tree.nodes[node_id].children:
+            self.tree.collapsed.add(node_id)
+
+    """
+    Drop the level of detail: forget the collapsed nodes and place the subtrees hidden below them,
+    so the tree is laid out in full again and later placements place the whole tree.
+    """
+
+    def clear(self):
+        hidden = collections.defaultdict(list)
+        for n in self.visible():
+            if n in self.tree.collapsed:
+                hidden[self.tree.nodes[n].depth].append(n)
+        self.tree.collapsed = set()
+        for depth in sorted(hidden):
+            self.tree._place_generations(hidden[depth], depth + 1)
+
+    """
+    Focus a node: expand the collapsed nodes on the path from the root to it, and the node itself.
+
+    :param node_id: the node id
+    :returns: return the list of the newly visible node ids
+    """
+
+    def focus(self, node_id):
+        path = [node_id]
+        while self.tree.nodes[path[-1]].parent is not None:
+            path.append(self.tree.nodes[path[-1]].parent)
+        shown = []
+        for n in reversed(path):
+            if n in self.tree.collapsed:
+                shown.extend(self.expand(n))
+        return shown
@@ -0,0 +1,90 @@
+import numpy as np
+from h3math import to_klein_array, from_klein_array, translation_to_origin, compose_transformations, \
+    refocus_array
+
+
+"""
+Navigate a laid out tree by moving a chosen node to the center of the Klein model. The layout is
+mapped into the Klein model once, see h3math.to_klein_array(), and every refocus step is composed
+into one Lorentz transformation which is applied to the original points in one matrix product.
+The points are never transformed twice, so rounding errors do not pile up however long the user
+navigates, and the composed transformation is pulled back onto the Lorentz group at every step.
+"""
+
+
+class Navigator(object):
+
+    """
+    The constructor for the navigator.
+
+    :param numpy.ndarray ids: the node ids, in increasing order
+    :param numpy.ndarray coords: the N x 3 layout coordinates of the nodes
+    """
+
+    def __init__(self, ids, coords):
+        self.ids = np.asarray(ids)
+        self.base = to_klein_array(coords)
+        self.reset()
+
+    """
+    Build the navigator from a laid out Tree or ArrayTree.
+
+    :param tree: the laid out tree
+    :returns: return the Navigator
+    """
+
+    @classmethod
+    def from_tree(cls, tree):
+        return cls(*tree.get_coords())
+
+    """
+    Go back to the layout as it was computed, with the root at the center.
+    """
+
+    def reset(self):
+        self.transformation = np.identity(4)
+        self.points = self.base.copy()
+
+    """
+    Look up the row of a node id by a binary search on the ids.
+
+    :param int node_id: the node id
+    :returns: return the row of the node, a KeyError is raised for an unknown id
+    """
+
+    def row_of(self, node_id):
+        row = int(np.searchsorted(self.ids, node_id))
+        if row == len(self.ids) or self.ids[row] != node_id:
+            raise KeyError(node_id)
+        return row
+
+    """
+    Move a node to the center by a hyperbolic translation, after the refocus steps so far.
+
+    :param int node_id: the node id
+    :returns: return the N x 4 homogeneous Klein coordinates of all nodes with w = 1
+    """
+
+    def focus(self, node_id):
+        step = translation_to_origin(self.points[self.row_of(node_id)])
+        self.transformation = compose_transformations(self.transformation, step)
+        self.points = refocus_array(self.transformation, self.base)
+        return self.points
+
+    """
+    Get the Klein coordinates of all nodes after the refocus steps so far.
+
+    :returns: return the N x 3 Klein coordinates, inside the unit ball
+    """
+
+    def klein_coords(self):
+        return self.points[:, :3]
+
+    """
+    Get the layout coordinates of all nodes after the refocus steps so far, see h3math.from_klein_array().
+
+    :returns: return the N x 3 layout coordinates
+    """
+
+    def layout_coords(self):
+        return from_klein_array(self.points)
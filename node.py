@@ -23,6 +23,8 @@ class Node(object):
     :param float theta: the angle of the node's hemisphere rotating around Z axis in spherical space, default 0
     :param float phi: the angle between the node and Z axis in spherical space, default 0
     :param Point4d coord: the node's 3D coordinate in cartesisan space, default to Point4d(0,0,0,0)
+    :param int rank: the position of the node among its siblings in the order of insertion, the tie
+                     breaker of the sorts of the children, default 0
     """
 
     def __init__(self, node_id, parent_id=None, depth=0, tree_size=1, radius=0, area=0):
@@ -37,3 +39,4 @@ class Node(object):
         self.theta = 0
         self.phi = 0
         self.coord = Point4d()
+        self.rank = 0
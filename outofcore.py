@@ -0,0 +1,705 @@
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+from timeit import default_timer
+from h3math import RESERVATION, LEAF_AREA, compute_radius, compute_radius_array, compute_hyperbolic_area_array
+from kernels import place_bands, place_coords
+from layoutfile import create_layout, load_layout
+from errors import InvalidArgument
+
+
+"""
+Lay out a tree too large to hold in memory, e.g. 10^8 nodes, with a bounded amount of working memory.
+No Tree is built: the edges and every per-node attribute live in scratch files on disk, which are
+read and written a bounded window at a time, through np.fromfile and through memory-mapped windows
+that are unmapped after use, so the resident memory does not grow with the tree. The layout is the one of the fused engine, see kernels.reverse_sweep() and forward_sweep():
+    - the edges are externally sorted by child, to number the nodes by the rank of their id, and by
+      parent, to build the children lookup of each node on disk
+    - a breath-first-search writes the node order and the number of children of each node, one
+      generation at a time, so every later sweep reads a generation as a contiguous range
+    - the size, radius and area sweep runs from the last generation to the root and the placement
+      sweep from the root to the last generation, both in chunks of whole sibling groups; a sibling
+      group too large for a chunk is sorted externally by radius and placed in several calls
+    - the coordinates are written straight into the memory-mapped columns of a layout file, see
+      layoutfile.create_layout(), read back with load_layout()
+The memory is bounded by the chunk sizes, apart from 8 bytes per generation for the generation offsets.
+"""
+
+
+"""
+The default number of bytes of working memory of the out-of-core layout, on top of the interpreter.
+"""
+MEMORY_LIMIT = 256 << 20
+
+"""
+The working memory per row of a chunk, for the arrays and temporaries of the sweeps and sorts.
+"""
+ROW_BYTES = 1024
+
+"""
+The largest gap in bytes between two positions read at once by a random read, about the bytes read
+in the time of one more read call.
+"""
+GAP_BYTES = 32768
+
+"""
+The smallest number of rows of a chunk.
+"""
+MIN_ROWS = 64
+
+"""
+The number of keys sampled per chunk to choose the buckets of the external sort.
+"""
+SAMPLES = 64
+
+"""
+The largest number of buckets of one pass of the external sort and the scatter, larger inputs take
+more passes.
+"""
+MAX_BUCKETS = 256
+
+"""
+The records of the scratch files: the (key, value) pairs of the edge sorts, the runs of children of
+each parent, the attributes of the two sweeps and the rows written to the layout file.
+"""
+PAIR_DTYPE = np.dtype([("key", np.int64), ("value", np.int64)])
+RADIUS_DTYPE = np.dtype([("key", np.float64), ("value", np.int64)])
+CHILD_ROW_DTYPE = np.dtype([("target", np.int64), ("row", np.int64)])
+RUN_DTYPE = np.dtype([("target", np.int64), ("start", np.int64), ("count", np.int64)])
+CHILDREN_DTYPE = np.dtype([("start", np.int64), ("count", np.int64)])
+SWEEP_DTYPE = np.dtype([("tree_size", np.int64), ("radius", np.float64), ("area", np.float64)])
+PLACE_DTYPE = np.dtype([("theta", np.float64), ("phi", np.float64), ("coord", np.float64, (3,))])
+PLACED_DTYPE = np.dtype([("target", np.int64), ("theta", np.float64), ("phi", np.float64),
+                         ("coord", np.float64, (3,))])
+ROW_DTYPE = np.dtype([("target", np.int64), ("parent", np.int64), ("depth", np.int64),
+                      ("x", np.float64), ("y", np.float64), ("z", np.float64)])
+
+
+"""
+Lay out a tree with a bounded amount of working memory and write the layout to a layout file, see
+layoutfile.write_layout() for the format. The result is the layout of get_layout(engine="fused").
+
+:param int root: the root id of the tree
+:param edges: the path of a binary edge file, see ingest.write_binary_edges(), or an iterable of
+              (child, parent) array pairs, e.g. ingest.csv_chunks()
+:param str path: the path of the layout file
+:param int memory: the number of bytes of working memory, default MEMORY_LIMIT
+:param str directory: the directory of the scratch files, default None for the system temporary directory
+:param dtype: the float type of the coordinates, numpy.float32 or numpy.float64, default numpy.float32
+:param edge_dtype: the integer type of the node ids in a binary edge file, default numpy.int64
+:returns: return the LayoutFile of the layout, with memory-mapped columns
+"""
+
+
+def layout_out_of_core(root, edges, path, memory=MEMORY_LIMIT, directory=None, dtype=np.float32,
+                       edge_dtype=np.int64):
+    start = default_timer()
+    scratch = _Scratch(directory, memory)
+    try:
+        edge_path, num_edges = _spill_edges(scratch, edges, edge_dtype)
+        ids, child_row, root_row = _sort_children(scratch, root, edge_path, num_edges)
+        children, child_rows = _sort_parents(scratch, edge_path, child_row, ids, num_edges + 1)
+        order, num_children, level_bounds = _breath_first(scratch, root_row, children, child_rows, num_edges + 1)
+        sweep = _reverse_sweep(scratch, num_children, level_bounds)
+        placement = _forward_sweep(scratch, num_children, level_bounds, sweep)
+        _write_rows(scratch, path, ids, order, num_children, level_bounds, placement, dtype)
+    finally:
+        scratch.remove()
+    logging.info("laid out {0} nodes out of core in {1:.3f} s with chunks of {2} rows"
+                 .format(num_edges + 1, default_timer() - start, scratch.rows))
+    return load_layout(path)
+
+
+"""
+The scratch directory of an out-of-core layout and the chunk sizes of its working memory.
+"""
+
+
+class _Scratch(object):
+
+    """
+    The constructor for the scratch space.
+
+    :param str directory: the directory to create the scratch directory in, None for the system default
+    :param int memory: the number of bytes of working memory
+    """
+
+    def __init__(self, directory, memory):
+        self.directory = tempfile.mkdtemp(prefix="hypy-", dir=directory)
+        self.rows = max(MIN_ROWS, memory // ROW_BYTES)
+        self.files = 0
+
+    def path(self, name):
+        self.files += 1
+        return os.path.join(self.directory, "{0}.{1}".format(self.files, name))
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _length(path, dtype):
+    return os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+
+
+def _read(path, dtype, start, stop):
+    dtype = np.dtype(dtype)
+    if stop <= start:
+        return np.zeros(0, dtype=dtype)
+    with open(path, "rb") as fp:
+        fp.seek(start * dtype.itemsize)
+        return np.fromfile(fp, dtype=dtype, count=stop - start)
+
+
+def _chunks(path, dtype, rows, start=0, stop=None):
+    stop = _length(path, dtype) if stop is None else stop
+    for lo in range(start, stop, rows):
+        yield _read(path, dtype, lo, min(lo + rows, stop))
+
+
+def _append(path, values):
+    with open(path, "ab") as fp:
+        fp.write(np.ascontiguousarray(values).tobytes())
+
+
+def _allocate(path, dtype, n):
+    with open(path, "wb") as fp:
+        fp.truncate(n * np.dtype(dtype).itemsize)
+
+
+def _window(path, dtype, start, stop, mode="r+", offset=0):
+    dtype = np.dtype(dtype)
+    if stop <= start:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset + start * dtype.itemsize, shape=(stop - start,))
+
+
+"""
+Read the values of a file at arbitrary positions. The positions are sorted and the ones close to each
+other are read together, one read of at most span values at a time. The reads are explicit rather than
+through a memory-mapped window, as the kernel maps whole large page cache folios on a page fault, up to
+megabytes for a single random read, and unbuffered, as np.fromfile costs several times a read call.
+"""
+
+
+def _gather(path, dtype, index, span):
+    dtype = np.dtype(dtype)
+    values = np.empty(len(index), dtype=dtype)
+    order = np.argsort(index, kind="mergesort")
+    index = index[order]
+    breaks = np.append(np.flatnonzero(np.diff(index) > GAP_BYTES // dtype.itemsize) + 1, len(index))
+    lo = 0
+    with open(path, "rb", buffering=0) as fp:
+        while lo < len(index):
+            first = int(index[lo])
+            hi = min(int(breaks[np.searchsorted(breaks, lo, "right")]),
+                     int(np.searchsorted(index, first + span, "left")))
+            fp.seek(first * dtype.itemsize)
+            read = np.frombuffer(fp.read((int(index[hi - 1]) - first + 1) * dtype.itemsize), dtype=dtype)
+            values[order[lo:hi]] = read[index[lo:hi] - first]
+            lo = hi
+    return values
+
+
+"""
+Append the ranges [start, start + count) of a file to another file, in the order of the ranges. The
+ranges are copied in groups of at most a chunk of values, a range longer than a chunk on its own.
+"""
+
+
+def _copy_ranges(scratch, source, dtype, starts, counts, target):
+    cost = np.cumsum(counts)
+    i = 0
+    while i < len(starts):
+        if counts[i] > scratch.rows:
+            for values in _chunks(source, dtype, scratch.rows, int(starts[i]), int(starts[i] + counts[i])):
+                _append(target, values)
+            i += 1
+            continue
+        j = max(i + 1, int(np.searchsorted(cost, (cost[i - 1] if i else 0) + scratch.rows, "right")))
+        group_starts, group_counts = starts[i:j], counts[i:j]
+        ends = np.cumsum(group_counts)
+        if ends[-1]:
+            positions = np.repeat(group_starts - ends + group_counts, group_counts) + np.arange(ends[-1])
+            _append(target, _gather(source, dtype, positions, scratch.rows))
+        i = j
+
+
+"""
+Distribute records into bucket files in one pass, each bucket keeping the order of its records. The
+bucket files stay open for the pass, so at most a few hundred buckets are used at a time.
+
+:param _Scratch scratch: the scratch space
+:param chunks: an iterable of record arrays
+:param bucket_of: a function giving the bucket of every record of a record array
+:param int num_buckets: the number of buckets
+:returns: return the triple (paths, sizes, dtype), the path and number of records of every bucket
+          and the type of the records
+"""
+
+
+def _distribute(scratch, chunks, bucket_of, num_buckets):
+    paths = [scratch.path("bucket") for _ in range(num_buckets)]
+    sizes = np.zeros(num_buckets, dtype=np.int64)
+    files, dtype = {}, None
+    try:
+        for records in chunks:
+            dtype = records.dtype
+            bucket = bucket_of(records)
+            order = np.argsort(bucket, kind="mergesort")
+            bounds = np.searchsorted(bucket[order], np.arange(num_buckets + 1))
+            for j in np.flatnonzero(np.diff(bounds)):
+                if j not in files:
+                    files[j] = open(paths[j], "ab")
+                files[j].write(records[order[bounds[j]:bounds[j + 1]]].tobytes())
+            sizes += np.diff(bounds)
+    finally:
+        for fp in files.values():
+            fp.close()
+    return paths, sizes, dtype
+
+
+"""
+Sort records by one field with a bounded amount of memory, records with equal keys keep their order.
+This is a distribution sort: the records are spilled to disk while the keys are sampled, then split
+into buckets between the sampled keys and into buckets of the sampled keys themselves, and each
+bucket is sorted in memory, copied as it is when all its keys are equal, or sorted the same way when
+it is still too large.
+
+:param _Scratch scratch: the scratch space
+:param chunks: an iterable of record arrays
+:param str key: the field to sort by
+:param str output: the path of the file the sorted records are appended to
+"""
+
+
+def _external_sort(scratch, chunks, key, output):
+    spill = scratch.path("spill")
+    stride = max(1, scratch.rows // SAMPLES)
+    sample, total, dtype = [], 0, None
+    for records in chunks:
+        dtype = records.dtype
+        _append(spill, records)
+        sample.append(records[key][::stride].copy())
+        total += len(records)
+    if total <= scratch.rows:
+        if total:
+            records = _read(spill, dtype, 0, total)
+            _append(output, records[np.argsort(records[key], kind="mergesort")])
+            os.remove(spill)
+        return
+    sample = np.sort(np.concatenate(sample))
+    num_buckets = min(MAX_BUCKETS, -(-2 * total // scratch.rows))
+    splitters = np.unique(sample[len(sample) * np.arange(1, num_buckets) // num_buckets])
+
+    def bucket_of(records):
+        keys = records[key]
+        below = np.searchsorted(splitters, keys)
+        return 2 * below + (splitters[np.minimum(below, len(splitters) - 1)] == keys)
+
+    buckets, sizes, _ = _distribute(scratch, _chunks(spill, dtype, scratch.rows), bucket_of, 2 * len(splitters) + 1)
+    os.remove(spill)
+    for j in np.flatnonzero(sizes):
+        if j % 2:
+            for records in _chunks(buckets[j], dtype, scratch.rows):
+                _append(output, records)
+        elif sizes[j] <= scratch.rows:
+            records = _read(buckets[j], dtype, 0, sizes[j])
+            _append(output, records[np.argsort(records[key], kind="mergesort")])
+        else:
+            _external_sort(scratch, _chunks(buckets[j], dtype, scratch.rows), key, output)
+        os.remove(buckets[j])
+
+
+"""
+Write values to arbitrary positions of files with a bounded amount of memory: the records are
+distributed into buckets of consecutive positions first, then each bucket of at most a chunk of
+positions is written through one memory-mapped window per file, and a larger one distributed again.
+
+:param _Scratch scratch: the scratch space
+:param chunks: an iterable of record arrays with a "target" field, the position to write to
+:param list targets: the files to write to, as (path, dtype, offset, fields) with the offset in
+                     bytes of the array in the file and fields the (record field, array field) pairs
+                     to write, the array field None for a plain array
+:param int size: the number of positions of the files the targets fall in
+:param int lo: the first position the targets fall in, default 0
+"""
+
+
+def _scatter(scratch, chunks, targets, size, lo=0):
+    width = max(scratch.rows, -(-size // MAX_BUCKETS))
+    buckets, sizes, dtype = _distribute(scratch, chunks, lambda records: (records["target"] - lo) // width,
+                                        -(-size // width))
+    for b in np.flatnonzero(sizes):
+        start = lo + int(b) * width
+        if width > scratch.rows:
+            _scatter(scratch, _chunks(buckets[b], dtype, scratch.rows), targets,
+                     min(width, lo + size - start), start)
+            os.remove(buckets[b])
+            continue
+        records = _read(buckets[b], dtype, 0, sizes[b])
+        index = records["target"] - start
+        for path, array_dtype, offset, fields in targets:
+            window = _window(path, array_dtype, start, start + int(index.max()) + 1, "r+", offset)
+            for source, field in fields:
+                (window if field is None else window[field])[index] = records[source]
+            window.flush()
+            del window
+        os.remove(buckets[b])
+
+
+"""
+Look up the positions of increasing keys in a sorted file, reading it once from the start to the end.
+"""
+
+
+class _SortedReader(object):
+
+    """
+    The constructor for the reader.
+
+    :param str path: the path of the sorted file of int64 keys
+    :param int rows: the number of keys read at a time
+    """
+
+    def __init__(self, path, rows):
+        self.chunks = _chunks(path, np.int64, rows)
+        self.window = np.zeros(0, dtype=np.int64)
+        self.base = 0
+
+    """
+    Find the positions of the keys, which must not be smaller than the keys of the previous call.
+
+    :param numpy.ndarray keys: the sorted keys
+    :returns: return the positions of the keys in the file, a KeyError is raised for a missing key
+    """
+
+    def positions(self, keys):
+        positions = np.empty(len(keys), dtype=np.int64)
+        done = 0
+        while done < len(keys):
+            if not len(self.window) or self.window[-1] < keys[done]:
+                self.base += len(self.window)
+                self.window = next(self.chunks, None)
+                if self.window is None:
+                    raise KeyError(int(keys[done]))
+                continue
+            stop = done + int(np.searchsorted(keys[done:], self.window[-1], "right"))
+            found = np.searchsorted(self.window, keys[done:stop])
+            missing = self.window[found] != keys[done:stop]
+            if missing.any():
+                raise KeyError(int(keys[done:stop][missing][0]))
+            positions[done:stop] = self.base + found
+            done = stop
+        return positions
+
+
+def _spill_edges(scratch, edges, dtype):
+    if isinstance(edges, str):
+        edges = ((flat[:, 0], flat[:, 1]) for flat in
+                 (values.reshape(-1, 2) for values in _chunks(edges, dtype, 2 * scratch.rows)))
+    path, num_edges = scratch.path("edges"), 0
+    for child, parent in edges:
+        records = np.empty(len(child), dtype=PAIR_DTYPE)
+        records["key"], records["value"] = child, parent
+        _append(path, records)
+        num_edges += len(records)
+    return path, num_edges
+
+
+"""
+Number the nodes by the rank of their id: sort the edges by child, write the sorted ids with the
+root, and write the row of the child of each edge in the order of the edges.
+"""
+
+
+def _sort_children(scratch, root, edges, num_edges):
+    by_child, ids, child_row = scratch.path("by_child"), scratch.path("ids"), scratch.path("child_row")
+
+    def positions():
+        for lo, records in zip(range(0, num_edges, scratch.rows), _chunks(edges, PAIR_DTYPE, scratch.rows)):
+            records["value"] = np.arange(lo, lo + len(records))
+            yield records
+
+    _external_sort(scratch, positions(), "key", by_child)
+    _allocate(child_row, np.int64, num_edges)
+    root_row = []
+
+    def rows():
+        done, last = 0, None
+        for records in _chunks(by_child, PAIR_DTYPE, scratch.rows):
+            keys = records["key"]
+            repeated = keys[1:][keys[1:] == keys[:-1]]
+            if len(repeated) or keys[0] == last:
+                node = repeated[0] if len(repeated) else last
+                logging.error("The node {0} is the child of more than one edge \n".format(node))
+                raise InvalidArgument("The node {0} is the child of more than one edge \n".format(node))
+            last = keys[-1]
+            split = int(np.searchsorted(keys, root))
+            if split < len(keys) and keys[split] == root:
+                logging.error("The root {0} is the child of an edge \n".format(root))
+                raise InvalidArgument("The root {0} is the child of an edge \n".format(root))
+            if not root_row and split < len(keys):
+                root_row.append(done + split)
+                keys = np.concatenate([keys[:split], [root], keys[split:]])
+            _append(ids, keys)
+            values = np.empty(len(records), dtype=CHILD_ROW_DTYPE)
+            values["target"] = records["value"]
+            values["row"] = done + np.arange(len(records)) + (records["key"] > root)
+            done += len(records)
+            yield values
+        if not root_row:
+            root_row.append(done)
+            _append(ids, np.array([root], dtype=np.int64))
+
+    _scatter(scratch, rows(), [(child_row, np.int64, 0, [("row", None)])], num_edges)
+    return ids, child_row, root_row[0]
+
+
+"""
+Build the children lookup on disk: sort the edges by parent, keeping the edge order among siblings,
+write the child rows in that order and the first position and number of children of each row.
+"""
+
+
+def _sort_parents(scratch, edges, child_row, ids, n):
+    by_parent, child_rows, children = scratch.path("by_parent"), scratch.path("child_rows"), scratch.path("children")
+
+    def pairs():
+        for records, rows in zip(_chunks(edges, PAIR_DTYPE, scratch.rows), _chunks(child_row, np.int64, scratch.rows)):
+            values = np.empty(len(records), dtype=PAIR_DTYPE)
+            values["key"], values["value"] = records["value"], rows
+            yield values
+
+    _external_sort(scratch, pairs(), "key", by_parent)
+    _allocate(children, CHILDREN_DTYPE, n)
+    reader = _SortedReader(ids, scratch.rows)
+
+    def runs():
+        pending, done = None, 0
+        for records in _chunks(by_parent, PAIR_DTYPE, scratch.rows):
+            _append(child_rows, records["value"])
+            try:
+                parent = reader.positions(records["key"])
+            except KeyError as e:
+                logging.error("The node {0} is neither the root nor the child of an edge \n".format(e.args[0]))
+                raise InvalidArgument("The node {0} is neither the root nor the child of an edge \n"
+                                      .format(e.args[0]))
+            starts = np.flatnonzero(np.concatenate([[True], parent[1:] != parent[:-1]]))
+            values = np.empty(len(starts), dtype=RUN_DTYPE)
+            values["target"], values["start"] = parent[starts], done + starts
+            values["count"] = np.diff(np.append(starts, len(parent)))
+            if pending is not None and pending["target"][0] == values["target"][0]:
+                values["start"][0] = pending["start"][0]
+                values["count"][0] += pending["count"][0]
+            elif pending is not None:
+                yield pending
+            pending = values[-1:].copy()
+            done += len(parent)
+            yield values[:-1]
+        if pending is not None:
+            yield pending
+
+    _scatter(scratch, runs(), [(children, CHILDREN_DTYPE, 0, [("start", "start"), ("count", "count")])], n)
+    return children, child_rows
+
+
+"""
+Traverse the tree in a breath-first-search, one generation at a time, writing the rows of the nodes
+in BFS order and the number of children of each, see kernels.bfs_levels().
+"""
+
+
+def _breath_first(scratch, root_row, children, child_rows, n):
+    order, num_children = scratch.path("order"), scratch.path("num_children")
+    _append(order, np.array([root_row], dtype=np.int64))
+    level_bounds = [0, 1]
+    while level_bounds[-1] > level_bounds[-2]:
+        for lo in range(level_bounds[-2], level_bounds[-1], scratch.rows):
+            rows = _read(order, np.int64, lo, min(lo + scratch.rows, level_bounds[-1]))
+            ranges = _gather(children, CHILDREN_DTYPE, rows, scratch.rows)
+            _append(num_children, ranges["count"])
+            _copy_ranges(scratch, child_rows, np.int64, ranges["start"], ranges["count"], order)
+        level_bounds.append(_length(order, np.int64))
+    level_bounds.pop()
+    if level_bounds[-1] < n:
+        logging.error("{0} nodes are not connected to the root \n".format(n - level_bounds[-1]))
+        raise InvalidArgument("{0} nodes are not connected to the root \n".format(n - level_bounds[-1]))
+    return order, num_children, level_bounds
+
+
+"""
+Split one generation into windows of at most a chunk of parents, with the positions of their children.
+
+:returns: yield the triple (lo, counts, offsets) for every window, the BFS position of the first
+          parent, the number of children of each parent and the BFS offsets of their children, so the
+          children of parent i of the window are at offsets[i]:offsets[i + 1]
+"""
+
+
+def _families(scratch, num_children, level_bounds, d):
+    lo, hi = level_bounds[d], level_bounds[d + 1]
+    first = hi
+    for start in range(lo, hi, scratch.rows):
+        counts = _read(num_children, np.int64, start, min(start + scratch.rows, hi))
+        offsets = first + np.concatenate([[0], np.cumsum(counts)])
+        first = int(offsets[-1])
+        yield start, counts, offsets
+
+
+"""
+Split the children of a window of parents into windows of whole sibling groups of at most a chunk of
+children. A sibling group larger than a chunk is split into chunks, or with split False is a window
+on its own.
+"""
+
+
+def _child_windows(scratch, offsets, split=True):
+    a, end = int(offsets[0]), int(offsets[-1])
+    while a < end:
+        k = int(np.searchsorted(offsets, a + scratch.rows, "right")) - 1
+        if offsets[k] > a:
+            b = int(offsets[k])
+        elif split:
+            b = min(a + scratch.rows, end)
+        else:
+            b = int(offsets[np.searchsorted(offsets, a, "right")])
+        yield a, b
+        a = b
+
+
+"""
+Compute the subtree size, hemisphere radius and area of every node one generation at a time from the
+last one to the root, see kernels.reverse_sweep().
+"""
+
+
+def _reverse_sweep(scratch, num_children, level_bounds):
+    sweep = scratch.path("sweep")
+    for counts in _chunks(num_children, np.int64, scratch.rows):
+        values = np.zeros(len(counts), dtype=SWEEP_DTYPE)
+        values["tree_size"] = 1
+        values["radius"][counts == 0] = compute_radius(LEAF_AREA)
+        _append(sweep, values)
+    for d in range(len(level_bounds) - 3, -1, -1):
+        for lo, counts, offsets in _families(scratch, num_children, level_bounds, d):
+            tree_size = np.zeros(len(counts), dtype=np.int64)
+            area = np.zeros(len(counts))
+            for a, b in _child_windows(scratch, offsets):
+                children = _read(sweep, SWEEP_DTYPE, a, b)
+                parent = np.searchsorted(offsets, np.arange(a, b), "right") - 1
+                starts = np.flatnonzero(np.concatenate([[True], parent[1:] != parent[:-1]]))
+                tree_size[parent[starts]] += np.add.reduceat(children["tree_size"], starts)
+                area[parent[starts]] += np.add.reduceat(
+                    RESERVATION * compute_hyperbolic_area_array(children["radius"]), starts)
+            has_children = counts > 0
+            window = _window(sweep, SWEEP_DTYPE, lo, lo + len(counts))
+            window["tree_size"] += tree_size
+            window["area"][has_children] = area[has_children]
+            window["radius"][has_children] = compute_radius_array(area[has_children])
+            window.flush()
+            del window
+    return sweep
+
+
+"""
+Sort the children of every node by decreasing radius and place them, one generation at a time from
+the root to the last generation, see kernels.forward_sweep().
+"""
+
+
+def _forward_sweep(scratch, num_children, level_bounds, sweep):
+    placement = scratch.path("placement")
+    _allocate(placement, PLACE_DTYPE, level_bounds[-1])
+    for d in range(len(level_bounds) - 2):
+        for lo, counts, offsets in _families(scratch, num_children, level_bounds, d):
+            parents = _read(placement, PLACE_DTYPE, lo, lo + len(counts))
+            parent_radius = _read(sweep, SWEEP_DTYPE, lo, lo + len(counts))["radius"]
+            parent_frames = parent_radius, parents["theta"], parents["phi"], parents["coord"]
+            for a, b in _child_windows(scratch, offsets, split=False):
+                if b - a > scratch.rows:
+                    k = int(np.searchsorted(offsets, a, "right")) - 1
+                    _place_group(scratch, sweep, placement, a, b, [v[k:k + 1] for v in parent_frames], d == 0)
+                    continue
+                radius = _read(sweep, SWEEP_DTYPE, a, b)["radius"]
+                parent = np.searchsorted(offsets, np.arange(a, b), "right") - 1
+                placed = np.lexsort((-radius, parent))
+                group = parent[placed]
+                _, theta, phi = place_bands(radius[placed], parent_radius[group], group)
+                values = np.zeros(b - a, dtype=PLACE_DTYPE)
+                values["theta"][placed], values["phi"][placed] = theta, phi
+                values["coord"][placed] = place_coords(theta, phi, group, *parent_frames, at_root=d == 0)
+                window = _window(placement, PLACE_DTYPE, a, b)
+                window[:] = values
+                window.flush()
+                del window
+    return placement
+
+
+"""
+Place one sibling group larger than a chunk: the group is sorted externally by decreasing radius,
+placed a chunk at a time with the band state carried from chunk to chunk, and written back to the
+BFS positions of the siblings.
+"""
+
+
+def _place_group(scratch, sweep, placement, a, b, parent_frame, at_root):
+    by_radius = scratch.path("by_radius")
+
+    def keyed():
+        for lo, children in zip(range(a, b, scratch.rows), _chunks(sweep, SWEEP_DTYPE, scratch.rows, a, b)):
+            records = np.empty(len(children), dtype=RADIUS_DTYPE)
+            records["key"], records["value"] = -children["radius"], np.arange(lo, lo + len(children))
+            yield records
+
+    _external_sort(scratch, keyed(), "key", by_radius)
+    state = []
+
+    def placed():
+        for records in _chunks(by_radius, RADIUS_DTYPE, scratch.rows):
+            group = np.zeros(len(records), dtype=np.int64)
+            _, theta, phi = place_bands(-records["key"], parent_frame[0][group], group, state)
+            values = np.empty(len(records), dtype=PLACED_DTYPE)
+            values["target"], values["theta"], values["phi"] = records["value"], theta, phi
+            values["coord"] = place_coords(theta, phi, group, *parent_frame, at_root=at_root)
+            yield values
+
+    _scatter(scratch, placed(), [(placement, PLACE_DTYPE, 0, [("theta", "theta"), ("phi", "phi"), ("coord", "coord")])],
+             b - a, a)
+    os.remove(by_radius)
+
+
+"""
+Write the rows of the layout file: the sorted ids, then the parent row, depth and coordinate of every
+node from the BFS order to the row of its id.
+"""
+
+
+def _write_rows(scratch, path, ids, order, num_children, level_bounds, placement, dtype):
+    columns = create_layout(path, level_bounds[-1], dtype)
+    id_dtype, id_offset = columns["id"]
+    for lo, values in zip(range(0, level_bounds[-1], scratch.rows), _chunks(ids, np.int64, scratch.rows)):
+        window = _window(path, id_dtype, lo, lo + len(values), "r+", id_offset)
+        window[:] = values
+        window.flush()
+        del window
+
+    def rows():
+        values = np.zeros(1, dtype=ROW_DTYPE)
+        values["target"], values["parent"] = _read(order, np.int64, 0, 1), -1
+        yield values
+        for d in range(len(level_bounds) - 2):
+            for lo, counts, offsets in _families(scratch, num_children, level_bounds, d):
+                parent_rows = _read(order, np.int64, lo, lo + len(counts))
+                for a, b in _child_windows(scratch, offsets):
+                    coord = _read(placement, PLACE_DTYPE, a, b)["coord"]
+                    values = np.empty(b - a, dtype=ROW_DTYPE)
+                    values["target"] = _read(order, np.int64, a, b)
+                    values["parent"] = parent_rows[np.searchsorted(offsets, np.arange(a, b), "right") - 1]
+                    values["depth"] = d + 1
+                    values["x"], values["y"], values["z"] = coord[:, 0], coord[:, 1], coord[:, 2]
+                    yield values
+
+    _scatter(scratch, rows(), [(path, columns[name][0], columns[name][1], [(name, None)])
+                               for name in ["parent", "depth", "x", "y", "z"]], level_bounds[-1])
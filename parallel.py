@@ -0,0 +1,170 @@
+import heapq
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from h3math import LEAF_AREA, compute_radius, rotate_array
+from kernels import INDEX_DTYPE, build_children, bfs_levels, reverse_sweep, forward_sweep
+
+
+"""
+Lay out a tree with a pool of worker processes. The subtrees below one frontier generation are
+independent of each other: their radii, sibling order, bands and angles only depend on the subtree,
+and so do their coordinates up to the frame of the subtree root. The tree is cut at the frontier,
+the subtrees are split into balanced groups and each group is laid out as a forest by the fused
+kernels in a worker. The main process lays out the generations above the frontier, with the radii
+of the subtree roots from the workers, and moves each subtree into the frame of its root.
+
+A node g laid out in a subtree with root c, where k is the child of c above g, is placed at
+    coord(g) = coord'(g) + coord(c) + (R(c) - I) coord'(k)
+with coord' the coordinate in the worker and R(c) the rotation by the theta and phi of c, as every
+node is rotated by its parent's angles only and the children of a root are not rotated.
+"""
+
+
+"""
+Lay out a forest with the fused kernels, in a worker process.
+
+:param numpy.ndarray roots: the ids of the roots of the forest
+:param numpy.ndarray child: the child id of each edge
+:param numpy.ndarray parent: the parent id of each edge
+:returns: return (ids, tree_size, radius, area, band, theta, phi, coords, rank, root, anchor)
+          in breath-first-search order, where rank is the position of a node among its sorted
+          siblings, root the BFS position of its root and anchor the BFS position of its ancestor
+          in the first generation below the roots, -1 for the roots
+"""
+
+
+def layout_forest(roots, child, parent):
+    ids, inverse = np.unique(np.concatenate([child, parent, roots]), return_inverse=True)
+    inverse = inverse.astype(INDEX_DTYPE)
+    num_edges = len(child)
+    child_offsets, child_index = build_children(inverse[:num_edges], inverse[num_edges:2 * num_edges], len(ids))
+    order, level_bounds = bfs_levels(child_offsets, child_index, inverse[2 * num_edges:])
+    num_children = np.diff(child_offsets)[order]
+    tree_size, radius, area = reverse_sweep(num_children, level_bounds)
+    child_order, band, theta, phi, coords = forward_sweep(num_children, level_bounds, radius, radius)
+    num_roots = level_bounds[1]
+    parent_position = np.repeat(np.arange(len(order)), num_children)
+    root = np.arange(len(order))
+    anchor = np.full(len(order), -1)
+    for d in range(1, len(level_bounds) - 1):
+        lo, hi = level_bounds[d], level_bounds[d + 1]
+        above = parent_position[lo - num_roots:hi - num_roots]
+        root[lo:hi] = root[above]
+        anchor[lo:hi] = np.arange(lo, hi) if d == 1 else anchor[above]
+    return ids[order], tree_size, radius, area, band, theta, phi, coords, \
+        sibling_rank(num_children, child_order, num_roots), root, anchor
+
+
+"""
+Turn the child_order of kernels.forward_sweep() into the position of each node among its sorted siblings.
+
+:param numpy.ndarray num_children: the number of children of each node, in BFS order
+:param numpy.ndarray child_order: the sorted BFS positions of the children in the slots of the children
+:param int num_roots: the number of roots at the start of the BFS order
+:returns: return the rank of each node in BFS order, 0 for the roots
+"""
+
+
+def sibling_rank(num_children, child_order, num_roots=1):
+    rank = np.zeros(len(num_children), dtype=INDEX_DTYPE)
+    first_child = np.cumsum(num_children) - num_children + num_roots
+    slots = np.arange(num_roots, len(num_children))
+    rank[child_order[num_roots:]] = slots - np.repeat(first_child, num_children)
+    return rank
+
+
+"""
+Split weighted items into balanced groups, the largest item first into the lightest group.
+
+:param numpy.ndarray sizes: the weight of each item
+:param int groups: the number of groups
+:returns: return the group of each item
+"""
+
+
+def balance(sizes, groups):
+    heap = [(0, i) for i in range(groups)]
+    group = np.zeros(len(sizes), dtype=np.int64)
+    for j, size in sorted(enumerate(np.asarray(sizes).tolist()), key=lambda item: -item[1]):
+        load, i = heapq.heappop(heap)
+        group[j] = i
+        heapq.heappush(heap, (load + size, i))
+    return group
+
+
+"""
+Lay out a tree given by its children lookup with a pool of worker processes, with the same result
+as the fused engine of Tree.set_layout(). The frontier is the first generation if it has at least
+four subtrees per worker or the tree has less than three generations, otherwise the second.
+
+:param numpy.ndarray child_offsets: the CSR offsets of the children lookup, see kernels.build_children()
+:param numpy.ndarray child_index: the CSR child index array, the siblings in their insertion order
+:param int root_index: the dense index of the root
+:param int workers: the number of worker processes
+:param int frontier_depth: the depth to cut the tree at, default None to choose the first or second generation
+:returns: return (depth, tree_size, radius, area, band, theta, phi, coords, rank) as arrays by dense
+          index, where rank is the position of a node among its sorted siblings
+"""
+
+
+def parallel_layout(child_offsets, child_index, root_index, workers, frontier_depth=None):
+    n = len(child_offsets) - 1
+    num_children = np.diff(child_offsets)
+    parent = np.full(n, -1, dtype=INDEX_DTYPE)
+    parent[child_index] = np.repeat(np.arange(n, dtype=INDEX_DTYPE), num_children)
+    order, level_bounds = bfs_levels(child_offsets, child_index, [root_index])
+    height = len(level_bounds) - 2
+    depth = np.zeros(n, dtype=INDEX_DTYPE)
+    depth[order] = np.repeat(np.arange(height + 1), np.diff(level_bounds))
+    if frontier_depth is None:
+        frontier_depth = 1 if height < 3 or level_bounds[2] - level_bounds[1] >= 4 * workers else 2
+    frontier_depth = min(frontier_depth, height)
+
+    label = np.full(n, -1, dtype=INDEX_DTYPE)
+    frontier = order[level_bounds[frontier_depth]:level_bounds[frontier_depth + 1]]
+    label[frontier] = frontier
+    for d in range(frontier_depth + 1, height + 1):
+        nodes = order[level_bounds[d]:level_bounds[d + 1]]
+        label[nodes] = label[parent[nodes]]
+    below = order[level_bounds[frontier_depth + 1]:]
+    busy = frontier[num_children[frontier] > 0]
+    group = np.full(n, -1, dtype=np.int64)
+    group[busy] = balance(np.bincount(label[below], minlength=n)[busy], workers)
+    by_group = np.argsort(group[label[below]], kind="mergesort")
+    bounds = np.searchsorted(group[label[below]][by_group], np.arange(workers + 1))
+    results = []
+    if len(busy):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(layout_forest, busy[group[busy] == i], below[by_group[bounds[i]:bounds[i + 1]]],
+                                   parent[below[by_group[bounds[i]:bounds[i + 1]]]])
+                       for i in range(workers) if bounds[i + 1] > bounds[i]]
+            results = [future.result() for future in futures]
+
+    tree_size = np.ones(n, dtype=np.int64)
+    radius = np.zeros(n)
+    area = np.zeros(n)
+    band = np.full(n, -1, dtype=INDEX_DTYPE)
+    theta = np.zeros(n)
+    phi = np.zeros(n)
+    coords = np.zeros((n, 3))
+    rank = np.zeros(n, dtype=INDEX_DTYPE)
+    radius[num_children == 0] = compute_radius(LEAF_AREA)
+    for ids, size, r, a, b, t, p, c, k, root, anchor in results:
+        tree_size[ids], radius[ids], area[ids] = size, r, a
+        band[ids], theta[ids], phi[ids], rank[ids] = b, t, p, k
+
+    top = order[:level_bounds[frontier_depth + 1]]
+    top_bounds = level_bounds[:frontier_depth + 2]
+    top_children = num_children[top]
+    top_children[top_bounds[-2]:] = 0
+    tree_size[top], radius[top], area[top] = \
+        reverse_sweep(top_children, top_bounds, (tree_size[top], radius[top], area[top]))
+    child_order, band[top], theta[top], phi[top], coords[top] = \
+        forward_sweep(top_children, top_bounds, radius[top], radius[top])
+    rank[top] = sibling_rank(top_children, child_order)
+
+    for ids, size, r, a, b, t, p, c, k, root, anchor in results:
+        placed = anchor >= 0
+        nodes, roots, anchors = ids[placed], ids[root[placed]], c[anchor[placed]]
+        coords[nodes] = c[placed] - anchors + coords[roots] + rotate_array(theta[roots], phi[roots], anchors)
+    return depth, tree_size, radius, area, band, theta, phi, coords, rank
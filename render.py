@@ -0,0 +1,39 @@
+import importlib
+import logging
+from errors import InvalidArgument
+
+
+"""
+The plotting backends by name, each one a module with a function scatter_plot(tree, equators,
+tagging, depth_cap, **options). A backend module is only imported the first time it is asked for,
+so the layout engine can be imported and run on machines without any plotting library.
+"""
+BACKENDS = {"matplotlib": "render_matplotlib"}
+
+
+"""
+Register a plotting backend, e.g. a renderer for another toolkit or for a file format.
+
+:param str name: the name of the backend, as passed to Tree.scatter_plot(backend=name)
+:param str module: the name of the module implementing the backend
+"""
+
+
+def register_backend(name, module):
+    BACKENDS[name] = module
+
+
+"""
+Get a plotting backend by name, importing its module on the first use.
+
+:param str name: the name of the backend, see BACKENDS
+:returns: return the backend module
+"""
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        logging.error("You attempted to plot with an unknown backend {0} \n".format(name))
+        raise InvalidArgument("You attempted to plot with an unknown backend {0}, expected one of {1} \n".format(
+            name, ", ".join(sorted(BACKENDS))))
+    return importlib.import_module(BACKENDS[name])
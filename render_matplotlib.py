@@ -0,0 +1,128 @@
+import logging
+import numpy as np
+
+from mpl_toolkits.mplot3d import Axes3D
+import mpl_toolkits.mplot3d.art3d as art3d
+from matplotlib.patches import Circle, PathPatch
+import matplotlib.pyplot as plt
+from matplotlib.font_manager import FontProperties
+from errors import InvalidArgument
+
+
+"""
+The matplotlib plotting backend of Tree.scatter_plot(), imported by render.get_backend("matplotlib").
+"""
+
+
+"""
+Plot a laid out Tree with nodes and edges, optionally equators and tagging nodes with node numbers. 
+The tree is traversed in a breath-first-search. 
+Note: 
+    - To distinct each generations, a color plate of ["blue", "red", "yellow", "green", "black"] 
+      is used repeatedly. 
+    - The X, Y, Z axises have been labelled. 
+    - When the number of nodes is large and the tree is bushy, it's advised disabling tagging for
+      better user experience.
+    - In the batched mode all the edges of a color are drawn as one Line3DCollection and all the
+      nodes as one scatter, the nodes whose hemisphere would be drawn smaller than min_pixels
+      are skipped with their edges, and at most max_labels nodes are tagged, the first ones in 
+      the breath-first-search. Otherwise every edge and tag is drawn on its own. 
+
+:param tree.Tree tree: the laid out Tree or ArrayTree, any tree with nodes and get_level_order()
+:param bool equators: whether to draw the 3D equators, default True
+:param bool tagging: whether to tag nodes with node numbers, default True
+:param int depth_cap: a filter for rendering the first N generations, default tree height
+:param bool batched: whether to draw the edges and nodes in batches, default True
+:param float min_pixels: the smallest hemisphere radius in pixels of a node drawn in the batched
+                         mode, default 0.5
+:param int max_labels: the maximum number of tagged nodes in the batched mode, default 100
+:returns: return the matplotlib 3D axes
+"""
+
+
+def scatter_plot(tree, equators=True, tagging=True, depth_cap=None, batched=True, min_pixels=0.5, max_labels=100):
+    if not hasattr(tree, "get_level_order") or not hasattr(tree, "nodes"):
+        logging.error("You attempted to plot a {0}, which is not a Tree or an ArrayTree \n".format(type(tree).__name__))
+        raise InvalidArgument("You attempted to plot a {0}, which is not a Tree or an ArrayTree \n".format(
+            type(tree).__name__))
+    if depth_cap is None:
+        depth_cap = tree.height
+    fig = plt.figure(figsize=(12, 10))
+    ax = fig.add_subplot(111, projection="3d")
+    plt.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=0, hspace=0)
+    plot_color_board = ["blue", "red", "yellow", "green", "black"]
+    font0 = FontProperties()
+    font0.set_size(8)
+    global_radius = tree.nodes[tree.root].radius * 1.12
+    if batched:
+        _batched_plot(tree, ax, font0, plot_color_board, global_radius, tagging, depth_cap, min_pixels,
+                      max_labels)
+    else:
+        _plot_by_node(tree, ax, font0, plot_color_board, tagging, depth_cap)
+    if equators:
+        for axis in ["x", "y", "z"]:
+            circle = Circle((0, 0), global_radius * 1.1)
+            circle.set_clip_box(ax.bbox)
+            circle.set_edgecolor("gray")
+            circle.set_alpha(0.3)
+            circle.set_facecolor("none")  # "none" not None
+            ax.add_patch(circle)
+            art3d.pathpatch_2d_to_3d(circle, z=0, zdir=axis)
+    ax.set_xlim([-1.2 * global_radius, 1.2 * global_radius])
+    ax.set_ylim([-1.2 * global_radius, 1.2 * global_radius])
+    ax.set_zlim([-1.2 * global_radius, 1.2 * global_radius])
+    ax.set_xlabel("X Label")
+    ax.set_ylabel("Y Label")
+    ax.set_zlabel("Z Label")
+    plt.show()
+    return ax
+
+
+def _plot_by_node(tree, ax, font0, plot_color_board, tagging, depth_cap):
+    xs = [tree.nodes[tree.root].coord.x]
+    ys = [tree.nodes[tree.root].coord.y]
+    zs = [tree.nodes[tree.root].coord.z]
+    for n in tree.get_level_order()[0]:
+        if tree.nodes[n].depth > depth_cap:
+            break
+        xs.append(tree.nodes[n].coord.x)
+        ys.append(tree.nodes[n].coord.y)
+        zs.append(tree.nodes[n].coord.z)
+        if tagging:
+            ax.text(tree.nodes[n].coord.x + 0.01,
+                    tree.nodes[n].coord.y + 0.01,
+                    tree.nodes[n].coord.z + 0.01,
+                    ("n{0}".format(n)), fontproperties=font0)
+        for child in tree.nodes[n].children:
+            xe = [tree.nodes[n].coord.x, tree.nodes[child].coord.x]
+            ye = [tree.nodes[n].coord.y, tree.nodes[child].coord.y]
+            ze = [tree.nodes[n].coord.z, tree.nodes[child].coord.z]
+            ax.plot(xe, ye, ze, plot_color_board[tree.nodes[n].depth % 5])
+    ax.scatter(xs, ys, zs, c="r", marker="o")
+
+
+def _batched_plot(tree, ax, font0, plot_color_board, global_radius, tagging, depth_cap, min_pixels,
+                  max_labels):
+    order, level_bounds = tree.get_level_order()
+    order = order[:level_bounds[min(depth_cap + 1, len(level_bounds) - 1)]]
+    nodes = [tree.nodes[n] for n in order]
+    row = dict((n, i) for i, n in enumerate(order))
+    parent = np.array([row[n.parent] if n.parent in row else -1 for n in nodes], dtype=np.int64)
+    depth = np.repeat(np.arange(len(level_bounds) - 1), np.diff(level_bounds))[:len(order)]
+    coords = np.array([[n.coord.x, n.coord.y, n.coord.z] for n in nodes]).reshape(-1, 3)
+    pixels = ax.bbox.width / (2.4 * global_radius) if global_radius else 0
+    shown = np.array([n.radius for n in nodes]) * pixels >= min_pixels
+    shown[0] = True
+    edges = np.flatnonzero(shown & (parent >= 0))
+    edges = edges[shown[parent[edges]]]
+    for color in range(len(plot_color_board)):
+        child = edges[depth[parent[edges]] % len(plot_color_board) == color]
+        if len(child):
+            segments = np.stack([coords[parent[child]], coords[child]], axis=1)
+            ax.add_collection3d(art3d.Line3DCollection(segments, colors=plot_color_board[color]))
+    placed = np.flatnonzero(shown & (depth <= depth_cap))
+    ax.scatter(coords[placed, 0], coords[placed, 1], coords[placed, 2], c="r", marker="o")
+    if tagging:
+        for i in placed[:max_labels].tolist():
+            ax.text(coords[i, 0] + 0.01, coords[i, 1] + 0.01, coords[i, 2] + 0.01,
+                    ("n{0}".format(order[i])), fontproperties=font0)
@@ -0,0 +1,451 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import struct
+import sys
+import numpy as np
+from urllib.parse import unquote
+from temporal import insert_edges
+from errors import InvalidArgument
+from tree import Tree, get_layout
+
+
+"""
+A local layout service for viewers, e.g. in a browser, built on asyncio and the standard library
+only. It keeps the laid out trees of its clients by name, lays them out or inserts new edges into
+them in an executor, so the event loop keeps serving the other clients, and streams the coordinates
+back in chunks of CHUNK_NODES nodes, one JSON line per chunk:
+
+    {"ids": [...], "coords": [[x, y, z], ...]}
+
+followed by the line {"done": true, "nodes": N}. A layout from scratch with the fused engine is
+streamed while it is computed: the radii need the whole tree, but then every generation is sent as
+soon as it is placed, root first, see Tree.iter_layout(). An insertion moves the whole tree, so its
+coordinates, like the ones of the passes engine, are streamed once the whole layout is done, sorted
+by node id. The requests are plain HTTP:
+    - PUT /trees/<name>: lay out the tree of the JSON body {"root": root, "edges": [[child, parent], ...]}
+    - POST /trees/<name>/edges: insert the new edges of the JSON body {"edges": [[child, parent], ...]}
+      and update the layout, see temporal.insert_edges() and Tree.update_layout()
+    - GET /trees/<name>: stream the current coordinates
+    - DELETE /trees/<name>: forget the tree
+The coordinates are streamed with the chunked transfer encoding. A GET /trees/<name> upgraded to a
+WebSocket keeps a session on one tree: every text message is a JSON body as above, a layout with a
+root, an insertion without, or {} for the current coordinates, and is answered by one message per
+chunk and line. The requests of one tree run one after another, the ones of different trees at the
+same time.
+
+    $ python -m hypy.service --port 8765
+"""
+CHUNK_NODES = 4096
+
+"""
+The largest request body or WebSocket message accepted, in bytes.
+"""
+MAX_BODY = 256 << 20
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+STATUS = {101: "Switching Protocols", 200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+          405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+"""
+A request the service answers with an error status and message.
+"""
+
+
+class ServiceError(Exception):
+
+    """
+    The constructor for the service error.
+
+    :param int status: the HTTP status
+    :param str message: the error message
+    """
+
+    def __init__(self, status, message):
+        super(ServiceError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+"""
+The layout service, holding the trees by name. handle() serves one connection of
+asyncio.start_server(), serve() starts a server around a service.
+"""
+
+
+class LayoutService(object):
+
+    """
+    The constructor for the layout service.
+
+    :param str engine: the layout engine, see tree.get_layout(), default "fused"
+    :param executor: the concurrent.futures executor to lay out the trees in, default None for the
+                     default executor of the event loop. The trees stay in this process, so it is a
+                     thread pool.
+    :param int chunk_nodes: the number of nodes per streamed chunk, default CHUNK_NODES
+    """
+
+    def __init__(self, engine="fused", executor=None, chunk_nodes=CHUNK_NODES):
+        self.engine = engine
+        self.executor = executor
+        self.chunk_nodes = chunk_nodes
+        self.trees = {}
+        self.locks = {}
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _lock(self, name):
+        return self.locks.setdefault(name, asyncio.Lock())
+
+    """
+    Lay out a tree from scratch and keep it under a name, replacing the tree kept under it before
+    once the layout is done, so a layout whose stream is given up keeps the tree of before.
+
+    :param str name: the name of the tree
+    :param root: the root id of the tree
+    :param edges: the (child, parent) edges of the tree
+    :returns: yield the pair (ids, coords) of every generation once it is placed with the fused
+              engine, see Tree.iter_layout(), or of the whole tree with the passes engine
+    """
+
+    async def layout(self, name, root, edges):
+        async with self._lock(name):
+            if self.engine == "fused":
+                tree = await self._run(Tree, root, edges)
+                generations = tree.iter_layout()
+                while True:
+                    generation = await self._run(next, generations, None)
+                    if generation is None:
+                        break
+                    yield generation
+            else:
+                tree = await self._run(get_layout, root, edges, "dict", self.engine)
+                ids, coords = await self._run(tree.get_coords)
+                yield ids.tolist(), coords
+            self.trees[name] = tree
+
+    """
+    Insert new edges into a tree kept under a name and update its layout. The edges inserted before
+    an invalid one stay in the tree.
+
+    :param str name: the name of the tree
+    :param edges: the new (child, parent) edges
+    :returns: return the pair (ids, coords) of the tree, see Tree.get_coords()
+    """
+
+    async def insert(self, name, edges):
+        self._tree(name)
+        async with self._lock(name):
+            return await self._run(_insert, self._tree(name), edges)
+
+    """
+    Get the coordinates of a tree kept under a name.
+
+    :param str name: the name of the tree
+    :returns: return the pair (ids, coords) of the tree, see Tree.get_coords()
+    """
+
+    async def coords(self, name):
+        self._tree(name)
+        async with self._lock(name):
+            return await self._run(self._tree(name).get_coords)
+
+    """
+    Forget the tree kept under a name. The lock of the name is kept, so the requests waiting on it
+    and the ones of a tree laid out again under the name still run one after another.
+
+    :param str name: the name of the tree
+    """
+
+    async def remove(self, name):
+        self._tree(name)
+        async with self._lock(name):
+            self._tree(name)
+            del self.trees[name]
+
+    def _tree(self, name):
+        if name not in self.trees:
+            raise ServiceError(404, "There is no tree {0}".format(name))
+        return self.trees[name]
+
+    """
+    Answer one request body, the JSON of a layout, an insertion or an empty object.
+
+    :param str name: the name of the tree
+    :param bytes body: the JSON body
+    :param str kind: "layout" or "insert", default None to tell them by the root in the body
+    :returns: yield the pairs (ids, coords) of the tree as they are computed, the list of the node
+              ids and their N x 3 coordinates
+    """
+
+    async def answer(self, name, body, kind=None):
+        generations = None
+        try:
+            request = await self._run(json.loads, body or b"{}")
+            edges = [(child, parent) for child, parent in request.get("edges", [])]
+            kind = kind or ("layout" if "root" in request else "insert" if "edges" in request else None)
+            if kind == "layout":
+                if "root" not in request:
+                    raise ServiceError(400, "A layout needs a root")
+                generations = self.layout(name, request["root"], edges)
+                async for generation in generations:
+                    yield generation
+                return
+            if kind == "insert":
+                if "root" in request:
+                    raise ServiceError(400, "An insertion has no root, a layout is a PUT")
+                ids, coords = await self.insert(name, edges)
+            else:
+                ids, coords = await self.coords(name)
+        except (AttributeError, TypeError, ValueError, InvalidArgument) as e:
+            raise ServiceError(400, str(e).strip())
+        finally:
+            if generations is not None:
+                await generations.aclose()
+        yield ids.tolist(), coords
+
+    """
+    Gather the coordinates of a tree into the JSON lines streamed to the clients, a line as soon as
+    chunk_nodes nodes are computed.
+
+    :param pieces: the async iterator of the pairs (ids, coords) of answer()
+    :returns: yield the encoded lines, one per chunk and the last line
+    """
+
+    async def lines(self, pieces):
+        ids, coords, nodes = [], [], 0
+        try:
+            async for piece_ids, piece_coords in pieces:
+                ids.extend(piece_ids)
+                coords.append(piece_coords)
+                nodes += len(piece_ids)
+                if len(ids) < self.chunk_nodes:
+                    continue
+                coords, start = np.concatenate(coords), 0
+                while len(ids) - start >= self.chunk_nodes:
+                    stop = start + self.chunk_nodes
+                    yield _line({"ids": ids[start:stop], "coords": coords[start:stop].tolist()})
+                    start = stop
+                ids, coords = ids[start:], [coords[start:]]
+        finally:
+            await pieces.aclose()
+        if ids:
+            yield _line({"ids": ids, "coords": np.concatenate(coords).tolist()})
+        yield _line({"done": True, "nodes": nodes})
+
+    """
+    Serve one connection, one HTTP request or a WebSocket session.
+
+    :param asyncio.StreamReader reader: the stream of the client
+    :param asyncio.StreamWriter writer: the stream to the client
+    """
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, headers, body = await _read_request(reader)
+            parts = [unquote(part) for part in path.split("?")[0].strip("/").split("/")]
+            if len(parts) not in (2, 3) or parts[0] != "trees" or parts[2:] not in ([], ["edges"]):
+                raise ServiceError(404, "There is no resource {0}".format(path))
+            name, route = parts[1], (method, len(parts))
+            if route == ("GET", 2) and headers.get("upgrade", "").lower() == "websocket":
+                await self._websocket(name, headers, reader, writer)
+            elif route == ("DELETE", 2):
+                await self.remove(name)
+                await _respond(writer, 204)
+            elif route in [("GET", 2), ("PUT", 2), ("POST", 3)]:
+                kind = {"GET": None, "PUT": "layout", "POST": "insert"}[method]
+                lines = self.lines(self.answer(name, body if kind else b"", kind))
+                try:
+                    first = await lines.__anext__()
+                    await _respond(writer, 200, [first], lines)
+                finally:
+                    await lines.aclose()
+            else:
+                raise ServiceError(405, "Unknown method {0} for {1}".format(method, path))
+        except ServiceError as e:
+            logging.error("{0} \n".format(e.message))
+            await _respond(writer, e.status, [_line({"error": e.message})])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _websocket(self, name, headers, reader, writer):
+        key = headers.get("sec-websocket-key", "").encode("ascii")
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest()).decode("ascii")
+        writer.write(_status_line(101) + "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                     "Sec-WebSocket-Accept: {0}\r\n\r\n".format(accept).encode("latin-1"))
+        while True:
+            try:
+                opcode, message = await _read_message(reader, writer)
+            except ServiceError as e:
+                logging.error("{0} \n".format(e.message))
+                writer.write(_frame(0x8, struct.pack("!H", 1009) + e.message.encode("utf-8")[:123]))
+                await writer.drain()
+                return
+            if opcode == 0x8:
+                writer.write(_frame(0x8, message[:2]))
+                await writer.drain()
+                return
+            lines = self.lines(self.answer(name, message))
+            try:
+                async for line in lines:
+                    writer.write(_frame(0x1, line))
+                    await writer.drain()
+            except ServiceError as e:
+                writer.write(_frame(0x1, _line({"error": e.message})))
+            finally:
+                await lines.aclose()
+
+
+def _insert(tree, edges):
+    try:
+        insert_edges(tree, edges)
+    finally:
+        tree.update_layout()
+    return tree.get_coords()
+
+
+def _line(value):
+    return json.dumps(value).encode("utf-8") + b"\n"
+
+
+def _status_line(status):
+    return "HTTP/1.1 {0} {1}\r\n".format(status, STATUS[status]).encode("latin-1")
+
+
+async def _read_request(reader):
+    try:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ServiceError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if not line.strip():
+            break
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ServiceError(413, "The request body is larger than {0} bytes".format(MAX_BODY))
+    return method, path, headers, await reader.readexactly(length)
+
+
+"""
+Write a response, the lines and then the ones of an async iterator with the chunked transfer
+encoding, one chunk each, draining the stream after every chunk so a slow client holds the lines
+back instead of the memory filling up.
+"""
+
+
+async def _respond(writer, status, lines=(), more=None):
+    writer.write(_status_line(status))
+    if status == 204:
+        writer.write(b"\r\n")
+    else:
+        writer.write(b"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for line in lines:
+            await _write_chunk(writer, line)
+        if more is not None:
+            async for line in more:
+                await _write_chunk(writer, line)
+        writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _write_chunk(writer, line):
+    writer.write("{0:x}\r\n".format(len(line)).encode("ascii") + line + b"\r\n")
+    await writer.drain()
+
+
+"""
+Read one WebSocket message, joining its fragments and answering the pings on the way.
+"""
+
+
+async def _read_message(reader, writer):
+    opcode, message = None, b""
+    while True:
+        head = await reader.readexactly(2)
+        fin, code, length = head[0] & 0x80, head[0] & 0x0f, head[1] & 0x7f
+        if length == 126:
+            length, = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await reader.readexactly(8))
+        if len(message) + length > MAX_BODY:
+            raise ServiceError(413, "The message is larger than {0} bytes".format(MAX_BODY))
+        mask = await reader.readexactly(4) if head[1] & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask is not None:
+            payload = (np.frombuffer(payload, dtype=np.uint8) ^
+                       np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+        if code == 0x9:
+            writer.write(_frame(0xa, payload))
+            continue
+        if code == 0xa:
+            continue
+        if code == 0x8:
+            return code, payload
+        opcode = code if code else opcode
+        message += payload
+        if fin:
+            return opcode, message
+
+
+def _frame(opcode, payload):
+    if len(payload) < 126:
+        head = struct.pack("!BB", 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, len(payload))
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, len(payload))
+    return head + payload
+
+
+"""
+Start a layout server.
+
+:param str host: the host to listen on, default "127.0.0.1" for local clients only
+:param int port: the port to listen on, 0 for any free port, default 8765
+:param LayoutService service: the service, default None for a new LayoutService()
+:returns: return the asyncio server, its sockets give the port
+"""
+
+
+async def serve(host="127.0.0.1", port=8765, service=None):
+    service = service or LayoutService()
+    return await asyncio.start_server(service.handle, host, port)
+
+
+async def _serve_forever(host, port, service):
+    server = await serve(host, port, service)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve hypy layouts to local viewers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--engine", choices=["fused", "passes"], default="fused")
+    parser.add_argument("--chunk-nodes", type=int, default=CHUNK_NODES, help="nodes per streamed chunk")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args.host, args.port, LayoutService(args.engine, chunk_nodes=args.chunk_nodes)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
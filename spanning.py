@@ -0,0 +1,157 @@
+import heapq
+import logging
+import numpy as np
+from kernels import INDEX_DTYPE, build_children
+from errors import InvalidArgument
+
+
+"""
+What spanning_tree() kept and dropped of a graph.
+"""
+
+
+class SpanningStats(object):
+
+    """
+    The constructor for the spanning tree statistics.
+
+    :param int edges: the number of edges of the graph
+    :param int tree_edges: the number of edges kept in the spanning tree
+    :param int unreachable: the number of nodes not reachable from the root, left out of the tree
+    """
+
+    def __init__(self, edges=0, tree_edges=0, unreachable=0):
+        self.edges = edges
+        self.tree_edges = tree_edges
+        self.unreachable = unreachable
+
+    @property
+    def dropped(self):
+        return self.edges - self.tree_edges
+
+    def __repr__(self):
+        return "SpanningStats(edges={0}, tree_edges={1}, dropped={2}, unreachable={3})" \
+            .format(self.edges, self.tree_edges, self.dropped, self.unreachable)
+
+
+"""
+Extract a spanning tree from a general graph, which may have cycles, nodes with several parents,
+repeated edges and self-loops. A directed edge (child, parent) is followed from the parent to the
+child, as in the tree edges, an undirected edge both ways. The adjacency is built once in CSR form
+with 32-bit node indices and the edge list is the only other copy of the graph held in memory.
+    - "bfs": the breath-first-search tree, every node hangs below the first node to reach it in the
+      generation before, one vectorized step per generation
+    - "prim": the tree grown from the root by always taking the lightest edge leaving it, the minimum
+      spanning tree of an undirected graph, a greedy arborescence of a directed one. The edges
+      leaving the tree wait in a binary heap of Python tuples, up to one per edge, over 100 bytes
+      per edge on top of the arrays, and are pushed one by one, so it is far slower than "bfs"
+The tree edges are returned in the order of the graph edges, so the siblings keep the order in
+which their edges were given, and the nodes unreachable from the root are left out.
+
+:param int root: the root id of the tree
+:param numpy.ndarray child: the child id of each edge
+:param numpy.ndarray parent: the parent id of each edge
+:param bool directed: whether the edges can only be followed from the parent to the child, default True
+:param str method: "bfs" or "prim", default "bfs"
+:param numpy.ndarray weights: the weight of each edge for "prim", default None for all 1
+:returns: return (child, parent, stats), the tree edges as two arrays of node ids and the SpanningStats
+"""
+
+
+def spanning_tree(root, child, parent, directed=True, method="bfs", weights=None):
+    if method not in ("bfs", "prim"):
+        logging.error("Unknown spanning tree method {0} \n".format(method))
+        raise InvalidArgument("Unknown spanning tree method {0} \n".format(method))
+    child, parent = np.asarray(child), np.asarray(parent)
+    num_edges = len(child)
+    ids = np.concatenate([child, parent, [root]])
+    ids.sort()
+    ids = ids[np.concatenate([[True], ids[1:] != ids[:-1]])]
+    n = len(ids)
+    root_index = int(np.searchsorted(ids, root))
+    source, target = _dense_index(ids, parent), _dense_index(ids, child)
+    if not directed:
+        source, target = np.concatenate([source, target]), np.concatenate([target, source])
+    offsets, edge = build_children(np.arange(len(source), dtype=INDEX_DTYPE), source, n)
+    del source
+    target = target[edge]
+    if not directed:
+        edge[edge >= num_edges] -= num_edges
+    if method == "bfs":
+        slots = _bfs_slots(offsets, target, root_index, n)
+    else:
+        weights = np.ones(num_edges) if weights is None else np.asarray(weights, dtype=np.float64)
+        slots = _prim_slots(offsets, target, edge, weights[edge], root_index, n)
+    slots = slots[np.argsort(edge[slots], kind="mergesort")]
+    tree_child = ids[target[slots]]
+    tree_parent = ids[np.searchsorted(offsets, slots, side="right") - 1]
+    stats = SpanningStats(num_edges, len(slots), n - 1 - len(slots))
+    logging.info("spanning tree kept {0} of {1} edges, dropped {2}, {3} nodes unreachable"
+                 .format(stats.tree_edges, stats.edges, stats.dropped, stats.unreachable))
+    return tree_child, tree_parent, stats
+
+
+"""
+Map node ids to their dense indices, the positions in the sorted unique ids, by a lookup table when the
+ids are small non-negative integers and by a binary search otherwise.
+"""
+
+
+def _dense_index(ids, values):
+    if len(ids) and ids.dtype.kind in "iu" and ids[0] >= 0 and ids[-1] < 4 * len(ids):
+        table = np.zeros(int(ids[-1]) + 1, dtype=INDEX_DTYPE)
+        table[ids] = np.arange(len(ids), dtype=INDEX_DTYPE)
+        return table[values]
+    return np.searchsorted(ids, values).astype(INDEX_DTYPE)
+
+
+"""
+Find the CSR slots of the breath-first-search tree edges, one vectorized step per generation: the
+slots of the frontier are gathered, the ones leading to visited nodes dropped and every new node
+keeps the first slot reaching it.
+"""
+
+
+def _bfs_slots(offsets, target, root, n):
+    visited = np.zeros(n, dtype=bool)
+    visited[root] = True
+    frontier = np.array([root], dtype=INDEX_DTYPE)
+    found = []
+    while len(frontier):
+        starts = offsets[frontier].astype(np.int64)
+        counts = offsets[frontier + 1] - starts
+        ends = np.cumsum(counts)
+        slots = np.repeat(starts - ends + counts, counts) + np.arange(ends[-1] if len(ends) else 0)
+        slots = slots[~visited[target[slots]]]
+        first = np.unique(target[slots], return_index=True)[1]
+        first.sort()
+        slots = slots[first]
+        visited[target[slots]] = True
+        found.append(slots)
+        frontier = target[slots]
+    return np.concatenate(found)
+
+
+"""
+Find the CSR slots of the tree grown by Prim's algorithm, taking the lightest slot out of the tree
+at every step, ties broken by the edge order. The CSR arrays stay arrays, only the slots of the
+node taken are turned into Python values to be pushed.
+"""
+
+
+def _prim_slots(offsets, target, edge, weights, root, n):
+    done = np.zeros(n, dtype=bool)
+    found = []
+    heap = [(0., -1, -1, root)]
+    while heap:
+        _, _, k, v = heapq.heappop(heap)
+        if done[v]:
+            continue
+        done[v] = True
+        if k >= 0:
+            found.append(k)
+        start, stop = int(offsets[v]), int(offsets[v + 1])
+        slots = np.arange(start, stop)[~done[target[start:stop]]]
+        for entry in zip(weights[slots].tolist(), edge[slots].tolist(), slots.tolist(), target[slots].tolist()):
+            heapq.heappush(heap, entry)
+    return np.array(found, dtype=np.int64)
@@ -0,0 +1,259 @@
+import heapq
+import numpy as np
+
+
+"""
+The maximum number of nodes in a leaf of the spatial index.
+"""
+LEAF_SIZE = 32
+
+
+"""
+A spatial index over the placed coordinates of a tree, for culling and picking in a viewer. It is a
+balanced k-d tree stored as an implicit binary tree, node i has the children 2i + 1 and 2i + 2, and
+each node covers a contiguous range of the nodes sorted by the splits. Every node also keeps the
+bounding box of its range, the queries only use the boxes, so after the coordinates move, e.g. by
+a refocus, refit() recomputes the boxes bottom-up in one vectorized pass per level and keeps the
+splits.
+"""
+
+
+class SpatialIndex(object):
+
+    """
+    The constructor for the spatial index, splitting each range at the median of its widest axis.
+
+    :param numpy.ndarray ids: the node ids
+    :param numpy.ndarray coords: the N x 3 coordinates of the nodes
+    :param int leaf_size: the maximum number of nodes in a leaf, default LEAF_SIZE
+    """
+
+    def __init__(self, ids, coords, leaf_size=LEAF_SIZE):
+        self.ids = np.asarray(ids)
+        self.points = np.array(coords, dtype=float).reshape(-1, 3)
+        n = len(self.points)
+        self.height = 0
+        while (n >> self.height) > leaf_size:
+            self.height += 1
+        self.first_leaf = (1 << self.height) - 1
+        self.start = np.zeros(2 * self.first_leaf + 1, dtype=np.int64)
+        self.stop = np.zeros(2 * self.first_leaf + 1, dtype=np.int64)
+        self.stop[0] = n
+        self.order = np.arange(n)
+        points = self.points
+        for level in range(self.height):
+            nodes = np.arange((1 << level) - 1, (1 << (level + 1)) - 1)
+            lo, hi = self.start[nodes], self.stop[nodes]
+            self.start[2 * nodes + 1], self.stop[2 * nodes + 1] = lo, (lo + hi) // 2
+            self.start[2 * nodes + 2], self.stop[2 * nodes + 2] = (lo + hi) // 2, hi
+            split = np.argsort(_split_keys(points, lo, hi))
+            self.order, points = self.order[split], points[split]
+        self.refit()
+
+    """
+    Build the spatial index from a laid out Tree or ArrayTree.
+
+    :param tree: the laid out tree
+    :param int leaf_size: the maximum number of nodes in a leaf, default LEAF_SIZE
+    :returns: return the SpatialIndex
+    """
+
+    @classmethod
+    def from_tree(cls, tree, leaf_size=LEAF_SIZE):
+        ids, coords = tree.get_coords()
+        return cls(ids, coords, leaf_size)
+
+    """
+    Recompute the bounding boxes, after the coordinates moved, e.g. by navigation.Navigator.focus().
+    The splits are kept, so the queries stay correct and only get slower if the nodes are shuffled
+    far away from each other.
+
+    :param numpy.ndarray coords: the new N x 3 coordinates of the nodes in the same order, default
+                                 None to keep the coordinates
+    """
+
+    def refit(self, coords=None):
+        if coords is not None:
+            self.points = np.array(coords, dtype=float).reshape(-1, 3)
+        self.lower = np.full((len(self.start), 3), np.inf)
+        self.upper = np.full((len(self.start), 3), -np.inf)
+        leaves = self.first_leaf + np.flatnonzero(self.stop[self.first_leaf:] > self.start[self.first_leaf:])
+        if len(leaves):
+            points = self.points[self.order]
+            self.lower[leaves] = np.minimum.reduceat(points, self.start[leaves], axis=0)
+            self.upper[leaves] = np.maximum.reduceat(points, self.start[leaves], axis=0)
+        for level in range(self.height - 1, -1, -1):
+            nodes = np.arange((1 << level) - 1, (1 << (level + 1)) - 1)
+            self.lower[nodes] = np.minimum(self.lower[2 * nodes + 1], self.lower[2 * nodes + 2])
+            self.upper[nodes] = np.maximum(self.upper[2 * nodes + 1], self.upper[2 * nodes + 2])
+
+    def _rows(self, nodes):
+        starts, counts = self.start[nodes], self.stop[nodes] - self.start[nodes]
+        ends = np.cumsum(counts)
+        return self.order[np.repeat(starts - ends + counts, counts) + np.arange(ends[-1] if len(ends) else 0)]
+
+    """
+    Walk down the index one level at a time, dropping the nodes whose box is outside the region and
+    taking every node whose box is inside it, and test the nodes in the remaining leaves one by one.
+
+    :param classify: a function of the (lower, upper) box corners giving the pair (outside, inside) of masks
+    :param contains: a function of the N x 3 coordinates giving the mask of the nodes inside the region
+    :returns: return the ids of the nodes inside the region
+    """
+
+    def _cull(self, classify, contains):
+        nodes = np.zeros(1, dtype=np.int64)
+        found = []
+        while len(nodes):
+            outside, inside = classify(self.lower[nodes], self.upper[nodes])
+            found.append(self._rows(nodes[inside & ~outside]))
+            nodes = nodes[~(inside | outside)]
+            if len(nodes) and nodes[0] >= self.first_leaf:
+                rows = self._rows(nodes)
+                found.append(rows[contains(self.points[rows])])
+                break
+            nodes = np.column_stack([2 * nodes + 1, 2 * nodes + 2]).ravel()
+        return self.ids[np.sort(np.concatenate(found))]
+
+    """
+    Find the nodes inside an axis-aligned box.
+
+    :param lower: the lower (x, y, z) corner of the box
+    :param upper: the upper (x, y, z) corner of the box
+    :returns: return the ids of the nodes inside the box
+    """
+
+    def query_box(self, lower, upper):
+        lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+        return self._cull(lambda lo, hi: (((hi < lower) | (lo > upper)).any(axis=1),
+                                          ((lo >= lower) & (hi <= upper)).all(axis=1)),
+                          lambda p: ((p >= lower) & (p <= upper)).all(axis=1))
+
+    """
+    Find the nodes inside a convex region bounded by planes, e.g. the six planes of a view frustum.
+    A point p is inside plane (a, b, c, d) if a * p.x + b * p.y + c * p.z + d >= 0.
+
+    :param planes: the M x 4 plane coefficients (a, b, c, d), normals pointing inwards
+    :returns: return the ids of the nodes inside every plane
+    """
+
+    def query_planes(self, planes):
+        planes = np.asarray(planes, dtype=float).reshape(-1, 4)
+        normal, offset = planes[:, :3], planes[:, 3]
+        positive = normal > 0
+
+        def classify(lo, hi):
+            farthest = np.where(positive[None], hi[:, None], lo[:, None])
+            nearest = np.where(positive[None], lo[:, None], hi[:, None])
+            outside = (np.einsum("nmi,mi->nm", farthest, normal) + offset < 0).any(axis=1)
+            inside = (np.einsum("nmi,mi->nm", nearest, normal) + offset >= 0).all(axis=1)
+            return outside, inside
+        return self._cull(classify, lambda p: (p.dot(normal.T) + offset >= 0).all(axis=1))
+
+    """
+    Find the node nearest to a point, visiting the index in order of the distance to the boxes.
+
+    :param point: the (x, y, z) coordinate
+    :returns: return the pair (node_id, distance), or None when the index is empty
+    """
+
+    def nearest(self, point):
+        point = np.asarray(point, dtype=float)
+        best, best_distance = None, np.inf
+        heap = [(0., 0)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance >= best_distance:
+                break
+            if node >= self.first_leaf:
+                rows = self.order[self.start[node]:self.stop[node]]
+                if len(rows):
+                    distances = ((self.points[rows] - point) ** 2).sum(axis=1)
+                    i = np.argmin(distances)
+                    if distances[i] < best_distance:
+                        best, best_distance = rows[i], distances[i]
+                continue
+            children = np.array([2 * node + 1, 2 * node + 2])
+            gap = np.maximum(np.maximum(self.lower[children] - point, point - self.upper[children]), 0)
+            for child, child_distance in zip(children.tolist(), (gap ** 2).sum(axis=1).tolist()):
+                heapq.heappush(heap, (child_distance, child))
+        if best is None:
+            return None
+        return self.ids[best], float(np.sqrt(best_distance))
+
+    """
+    Pick the first node along a ray, e.g. the ray under a mouse click. A node is hit when it is in
+    front of the origin and within the tolerance of the ray, the boxes are visited in the order the
+    ray enters them, grown by the tolerance.
+
+    :param origin: the (x, y, z) origin of the ray
+    :param direction: the (x, y, z) direction of the ray
+    :param float tolerance: the maximum distance of a picked node from the ray
+    :returns: return the pair (node_id, t) with the distance t along the ray, or None when nothing is hit
+    """
+
+    def ray_pick(self, origin, direction, tolerance):
+        origin = np.asarray(origin, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+        direction = direction / np.sqrt(direction.dot(direction))
+        with np.errstate(divide="ignore"):
+            inverse = 1 / direction
+        best, best_t = None, np.inf
+        heap = [(0., 0)]
+        while heap:
+            t, node = heapq.heappop(heap)
+            if t >= best_t:
+                break
+            if node >= self.first_leaf:
+                rows = self.order[self.start[node]:self.stop[node]]
+                offset = self.points[rows] - origin
+                along = offset.dot(direction)
+                hit = (along >= 0) & ((offset ** 2).sum(axis=1) - along ** 2 <= tolerance ** 2)
+                if hit.any():
+                    i = np.flatnonzero(hit)[np.argmin(along[hit])]
+                    if along[i] < best_t:
+                        best, best_t = rows[i], along[i]
+                continue
+            children = np.array([2 * node + 1, 2 * node + 2])
+            with np.errstate(invalid="ignore"):
+                near = (self.lower[children] - tolerance - origin) * inverse
+                far = (self.upper[children] + tolerance - origin) * inverse
+            enter = np.fmax.reduce(np.fmin(near, far), axis=1)
+            leave = np.fmin.reduce(np.fmax(near, far), axis=1)
+            for child, child_enter, child_leave in zip(children.tolist(), enter.tolist(), leave.tolist()):
+                if child_leave >= max(child_enter, 0):
+                    heapq.heappush(heap, (max(child_enter, 0), child))
+        if best is None:
+            return None
+        return self.ids[best], float(best_t)
+
+
+"""
+Compute the sort keys which split every range of one level of the spatial index at the median of
+its widest axis with one sort for the whole level, the key of a node is the index of its range plus
+its position along the axis scaled into [0, 0.5].
+
+:param numpy.ndarray points: the N x 3 coordinates in the order of the ranges
+:param numpy.ndarray lo: the start of each range
+:param numpy.ndarray hi: the stop of each range
+:returns: return the sort key of each node as a float array
+"""
+
+
+def _split_keys(points, lo, hi):
+    counts = hi - lo
+    filled = counts > 0
+    lower = np.zeros((len(lo), 3))
+    extent = np.ones((len(lo), 3))
+    lower[filled] = np.minimum.reduceat(points, lo[filled], axis=0)
+    extent[filled] = np.maximum.reduceat(points, lo[filled], axis=0) - lower[filled]
+    axis = np.argmax(extent, axis=1)
+    segments = np.arange(len(lo))
+    scale = extent[segments, axis]
+    scale[scale == 0] = 1
+    offset = lower[segments, axis]
+    segment = np.repeat(segments, counts)
+    values = points.ravel()[3 * np.arange(len(points)) + np.repeat(axis, counts)]
+    values -= np.repeat(offset, counts)
+    values *= np.repeat(0.5 / scale, counts)
+    return values + segment
@@ -0,0 +1,89 @@
+import collections
+import logging
+from errors import InvalidArgument
+from tree import get_layout
+
+
+"""
+Lay out a sequence of snapshots of a growing tree, e.g. a cascade of posts shared over time. The
+first snapshot is laid out from scratch, and every later one only inserts the new nodes with
+Tree.insert_edge and updates the layout with Tree.update_layout: the sizes, radii, sibling order and
+bands are recomputed for the new nodes and their ancestors only, the other subtrees keep theirs, and
+the coordinates are moved one batched transform per generation. A snapshot that removes or moves a
+node cannot be reached by insertions and is laid out from scratch.
+The cost of a frame: update_layout moves every node, as the root hemisphere grows with every
+insertion, see Tree.update_layout(). A whole snapshot is diffed against the previous one first: a
+snapshot extending the edge list of the previous one is cut by one list comparison, any other is
+checked edge by edge against the tree. With incremental set, the snapshots are only the new edges
+and no diff is done.
+"""
+
+
+"""
+Insert new edges into a laid out tree, each parent before its children, the children of a parent in
+the order of the edges.
+
+:param tree.Tree tree: the laid out tree
+:param edges: the new (child, parent) edges, whose parents are in the tree or among the new children
+:returns: return the list of the inserted node ids
+"""
+
+
+def insert_edges(tree, edges):
+    pending = collections.OrderedDict()
+    for child, parent in edges:
+        pending.setdefault(parent, []).append(child)
+    queue = collections.deque(p for p in pending if p in tree.nodes)
+    inserted = []
+    while queue:
+        parent = queue.popleft()
+        for child in pending.pop(parent):
+            tree.insert_edge(child, parent)
+            inserted.append(child)
+            if child in pending:
+                queue.append(child)
+    if pending:
+        logging.error("You attempted to insert edges which are not connected to the tree \n")
+        raise InvalidArgument("You attempted to insert edges which are not connected to the tree \n")
+    return inserted
+
+
+"""
+Lay out every snapshot of a growing tree, reusing the layout of the previous one.
+
+:param int root: the root id of the tree
+:param snapshots: an iterable of edge lists of (child, parent) pairs, every one the whole tree at a
+                  time, or with incremental set only the edges added since the previous one
+:param str engine: the layout engine of the first snapshot, see tree.get_layout(), default "fused"
+:param bool stable: whether the siblings keep their order from frame to frame, see
+                    Tree.update_layout(), otherwise every frame is the layout from scratch of its
+                    snapshot, the siblings of equal radius in the order of their edges. Only the
+                    order is kept, the nodes still move as their ancestors grow, default True
+:param bool incremental: whether each snapshot only holds the new edges, default False
+:returns: yield the pair (tree, inserted) for every snapshot, the same Tree object updated in place
+          and the ids of the nodes inserted into it, or None when the snapshot was laid out from
+          scratch
+"""
+
+
+def snapshot_layouts(root, snapshots, engine="fused", stable=True, incremental=False):
+    tree, previous = None, []
+    for edges in snapshots:
+        edges = snapshot = list(edges)
+        if tree is not None and not incremental:
+            nodes, new = tree.nodes, edges[len(previous):]
+            if edges[:len(previous)] == previous and not any(child in nodes for child, _ in new):
+                edges = new
+            elif any(child in nodes and nodes[child].parent != parent for child, parent in edges) or \
+                    len(set(child for child, _ in edges)) < len(nodes) - 1:
+                tree = None
+            else:
+                edges = [(child, parent) for child, parent in edges if child not in nodes]
+        previous = snapshot
+        if tree is None:
+            tree = get_layout(root, edges, engine=engine)
+            yield tree, None
+            continue
+        inserted = insert_edges(tree, edges)
+        tree.update_layout(stable)
+        yield tree, inserted
@@ -0,0 +1,56 @@
+import unittest
+import igraph
+
+import hypy.tree
+from hypy.tree import get_layout
+from hypy.arraytree import ArrayTree, InvalidArgument
+
+"""
+Test the array-backed tree gives the same layout as the dict of Node objects
+"""
+
+
+class TestArrayTree(unittest.TestCase):
+
+    """
+    Test the node view exposes every node with its parent and its children, as a read-only tuple
+    """
+
+    def test_node_view(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(40, 3).get_edgelist()]
+        tree = ArrayTree(0, edges)
+        self.assertEqual(40, len(tree.nodes))
+        self.assertEqual(None, tree.nodes[0].parent)
+        self.assertEqual((1, 2, 3), tree.nodes[0].children)
+        with self.assertRaises(AttributeError):
+            tree.nodes[0].children.append(40)
+        self.assertEqual(0, tree.nodes[3].parent)
+
+    """
+    Test the layout of both backends is the same for every node
+    """
+
+    def test_same_layout(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(500, 4).get_edgelist()]
+        expected = get_layout(0, edges)
+        tree = get_layout(0, edges, backend="array")
+        for n in expected.nodes:
+            self.assertEqual(expected.nodes[n].children, list(tree.nodes[n].children))
+            self.assertEqual(expected.nodes[n].band, tree.nodes[n].band)
+            self.assertAlmostEqual(expected.nodes[n].radius, tree.nodes[n].radius)
+            self.assertAlmostEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+            self.assertAlmostEqual(expected.nodes[n].coord.y, tree.nodes[n].coord.y)
+            self.assertAlmostEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+
+    """
+    Test a node with two parents and a second root are rejected, with the exception of hypy.tree
+    """
+
+    def test_invalid_edges(self):
+        self.assertRaises(InvalidArgument, ArrayTree, 0, [(1, 0), (2, 0), (2, 1)])
+        self.assertRaises(InvalidArgument, ArrayTree, 0, [(1, 0), (2, 3)])
+        self.assertIs(hypy.tree.InvalidArgument, InvalidArgument)
+        self.assertRaises(hypy.tree.InvalidArgument, get_layout, 0, [(1, 0), (2, 3)], backend="array")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+
+from hypy.arraytree import ArrayTree
+from hypy.benchmarks.generators import GENERATORS, power_law
+from hypy.benchmarks.suite import PHASES, run_case, compare, measure_import, check_import
+
+"""
+Test the benchmark generators and the comparison with a baseline
+"""
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    """
+    Test every generator gives the same valid tree every time
+    """
+
+    def test_generators(self):
+        for name, generate in GENERATORS.items():
+            child, parent = generate(500)
+            self.assertEqual(499, len(child))
+            ArrayTree.from_arrays(0, child, parent)
+            np.testing.assert_array_equal(parent, generate(500)[1])
+        self.assertFalse(np.array_equal(power_law(500)[1], power_law(500, seed=1)[1]))
+
+    """
+    Test a run covers every phase and a slower phase than the baseline is reported
+    """
+
+    def test_compare(self):
+        results = run_case("array", "kary", 200, repeat=1)
+        self.assertEqual(PHASES, [r["phase"] for r in results])
+        self.assertTrue(all(r["peak_bytes"] is not None for r in results))
+        baseline = {"results": [dict(r, seconds=1.0, peak_bytes=1 << 20) for r in results]}
+        self.assertEqual([], compare({"results": results}, baseline))
+        slower = {"results": [dict(r, seconds=2.0, peak_bytes=1 << 20) for r in results]}
+        self.assertEqual(len(PHASES), len(compare(slower, baseline, threshold=0.5)))
+
+    """
+    Test the core modules are imported in a fresh interpreter without a plotting library
+    """
+
+    def test_import(self):
+        result = measure_import(repeat=1)
+        self.assertEqual([], result["plotting"])
+        self.assertTrue(0 < result["seconds"] < 10)
+        self.assertEqual(1, len(check_import({"results": [dict(result, seconds=10.0)]})))
+
+if __name__ == '__main__':
+    unittest.main()
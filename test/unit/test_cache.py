@@ -0,0 +1,140 @@
+import shutil
+import tempfile
+import unittest
+import igraph
+import numpy as np
+from unittest import mock
+
+import hypy.tree
+from hypy.tree import get_layout, InvalidArgument
+from hypy.cache import LayoutCache
+
+"""
+Test the layout cache restores the computed layouts and evicts the least recently used ones
+"""
+
+
+class TestLayoutCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.edges = [(e[1], e[0]) for e in igraph.Graph.Tree(300, 3).get_edgelist()]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    """
+    Test a hit restores the coordinates, attributes and sibling order of the computed layout
+    """
+
+    def test_hit(self):
+        for backend in ["dict", "array"]:
+            cache = LayoutCache(self.tmpdir)
+            expected = get_layout(0, self.edges, backend=backend, cache=cache)
+            tree = get_layout(0, np.array(self.edges), backend=backend, cache=cache)
+            self.assertEqual({"hits": 1, "misses": 1, "stores": 1}, dict((k, cache.stats()[k]) for k in
+                                                                           ["hits", "misses", "stores"]))
+            self.assertEqual(expected.height, tree.height)
+            for n in expected.nodes:
+                self.assertEqual(list(expected.nodes[n].children), list(tree.nodes[n].children))
+                self.assertEqual(expected.nodes[n].band, tree.nodes[n].band)
+                self.assertEqual(expected.nodes[n].radius, tree.nodes[n].radius)
+                self.assertEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+                self.assertEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+            cache.clear()
+
+    """
+    Test a hit builds the tree from the cached columns without inserting the edges, with the same
+    nodes as a miss, and an update after new leaves gives the same layout as on the computed tree
+    """
+
+    def test_hit_from_layout(self):
+        order = np.random.RandomState(1).permutation(len(self.edges))
+        edges = [self.edges[i] for i in order]
+        for intern_ids in [False, True]:
+            cache = LayoutCache(self.tmpdir)
+            expected = get_layout(0, edges, cache=cache, intern_ids=intern_ids)
+            with mock.patch.object(hypy.tree.Tree, "insert_edge") as insert_edge:
+                tree = get_layout(0, edges, cache=cache, intern_ids=intern_ids)
+            self.assertFalse(insert_edge.called)
+            self.assertEqual(1, cache.stats()["hits"])
+            self.assertEqual((expected.root, expected.height, True), (tree.root, tree.height, tree.laid_out))
+            for n in expected.nodes:
+                a, b = expected.nodes[n], tree.nodes[n]
+                self.assertEqual((a.parent, a.children, a.depth, a.rank), (b.parent, b.children, b.depth, b.rank))
+                self.assertEqual((a.tree_size, a.radius, a.area, a.band, a.theta, a.phi),
+                                 (b.tree_size, b.radius, b.area, b.band, b.theta, b.phi))
+            for t in [expected, tree]:
+                for child, parent in [(300, 0), (301, 4), (302, 300)]:
+                    t.insert_edge(child, parent)
+                t.update_layout()
+            for n in expected.nodes:
+                self.assertEqual(expected.nodes[n].children, tree.nodes[n].children)
+                self.assertEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+            cache.clear()
+
+    """
+    Test the layouts over the size budget are evicted, the least recently used first
+    """
+
+    def test_eviction(self):
+        cache = LayoutCache(self.tmpdir)
+        trees = [self.edges[:100], self.edges[:200], self.edges[:100][::-1]]
+        keys = [cache.key(0, edges) for edges in trees]
+        for edges in trees[:2]:
+            get_layout(0, edges, cache=cache)
+        size = cache.stats()["bytes"]
+        cache.get(keys[0])
+        cache.max_bytes = size
+        get_layout(0, trees[2], cache=cache)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    """
+    Test a tree given without a root is cached, and an unknown engine or ids which cannot be cached
+    are rejected before the tree is built or looked up
+    """
+
+    def test_invalid(self):
+        cache = LayoutCache(self.tmpdir)
+        for _ in range(2):
+            tree = get_layout(None, self.edges, backend="array", cache=cache)
+        self.assertEqual((1, 0), (cache.stats()["hits"], tree.root))
+        urls = [("u{0}".format(c), "u{0}".format(p)) for c, p in self.edges]
+        with mock.patch.object(hypy.tree, "Tree") as tree:
+            with self.assertRaises(InvalidArgument):
+                get_layout("u0", urls, cache=cache, intern_ids=True)
+            with self.assertRaises(InvalidArgument):
+                get_layout(0, self.edges, engine="unknown", cache=cache)
+            with self.assertRaises(InvalidArgument):
+                get_layout([0], self.edges)
+        self.assertFalse(tree.called)
+        self.assertEqual(1, cache.stats()["misses"])
+
+    """
+    Test the interned and the plain layouts of the same edges are cached apart, the rows of one are
+    never applied to the ids of the other
+    """
+
+    def test_interned(self):
+        cache = LayoutCache(self.tmpdir)
+        names = np.random.RandomState(0).permutation(1000)
+        edges = [(int(names[c]), int(names[p])) for c, p in self.edges]
+        root = int(names[0])
+        interned = get_layout(root, edges, cache=cache, intern_ids=True)
+        plain = get_layout(root, edges, cache=cache)
+        again = get_layout(root, edges, cache=cache, intern_ids=True)
+        self.assertEqual((1, 2), (cache.stats()["hits"], cache.stats()["misses"]))
+        expected = get_layout(root, edges)
+        for n in expected.nodes:
+            dense = interned.ids.index(n)
+            for tree, node_id in [(plain, n), (interned, dense), (again, dense)]:
+                self.assertEqual(expected.nodes[n].tree_size, tree.nodes[node_id].tree_size)
+                self.assertEqual(expected.nodes[n].coord.z, tree.nodes[node_id].coord.z)
+            self.assertEqual(expected.nodes[n].children, plain.nodes[n].children)
+            self.assertEqual(expected.nodes[n].children, interned.ids.external(again.nodes[dense].children).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.forest import batch_layout, InvalidArgument
+
+"""
+Test the batch layout of many trees against the fused engine on every tree alone
+"""
+
+
+class TestBatchLayout(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.trees = []
+        for t in range(60):
+            n = int(rng.randint(1, 40))
+            ids = rng.permutation(50)[:n]
+            self.trees.append((int(ids[0]), [(int(ids[i]), int(ids[rng.randint(i)])) for i in range(1, n)]))
+
+    def batch(self, trees):
+        tree = np.concatenate([np.full(len(edges), t) for t, (_, edges) in enumerate(trees)])
+        edges = np.array([e for _, edges in trees for e in edges])
+        return batch_layout([root for root, _ in trees], tree, edges[:, 0], edges[:, 1])
+
+    """
+    Test every tree of the batch gets the layout of the tree alone, with the same ids in other trees
+    """
+
+    def test_fused_layout(self):
+        layout = self.batch(self.trees)
+        self.assertEqual(len(self.trees), len(layout))
+        for t, (root, edges) in enumerate(self.trees):
+            ids, coords = layout.get_coords(t)
+            self.assertEqual(root, ids[0])
+            self.assertEqual(len(edges) + 1, len(ids))
+            lo = layout.offsets[t]
+            parent = dict(edges)
+            self.assertEqual([parent.get(n, -1) for n in ids.tolist()],
+                             [layout.ids[p] if p >= 0 else -1 for p in layout.parent[lo:lo + len(ids)].tolist()])
+            if not edges:
+                np.testing.assert_array_equal([[0, 0, 0]], coords)
+                continue
+            expected_ids, expected = get_layout(root, edges, engine="fused").get_coords()
+            order = np.argsort(ids)
+            np.testing.assert_array_equal(expected_ids, ids[order])
+            np.testing.assert_array_equal(expected, coords[order])
+        self.assertGreater(layout.trees_per_second, 0)
+
+    """
+    Test edges which are not a tree rooted at the root of their tree raise an InvalidArgument
+    """
+
+    def test_invalid_edges(self):
+        for trees in [[(1, [(2, 1), (3, 1), (3, 2)])], [(1, [(2, 1), (1, 2)])], [(1, [(2, 1), (4, 3)])],
+                      [(1, [(2, 1)]), (1, [(1, 2)])]]:
+            with self.assertRaises(InvalidArgument):
+                self.batch(trees)
+        with self.assertRaises(InvalidArgument):
+            batch_layout([1], [0, 1], [2, 3], [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+
+from hypy.h3math import Point4d, sph_to_cart_array, transformation_matrices, apply_transformations, \
+    MINKOWSKI_METRIC, to_klein_array, from_klein_array, translation_to_origin, compose_transformations, refocus_array, \
+    ARRAY_TOLERANCE, compute_radius, compute_radius_array, compute_hyperbolic_area, compute_hyperbolic_area_array, \
+    compute_delta_theta, compute_delta_theta_array, compute_delta_phi, compute_delta_phi_array, minkowski, \
+    minkowski_array, hyperbolic_distance, hyperbolic_distance_array
+
+"""
+Test the array versions of the h3 math against the Point4d versions
+"""
+
+
+class TestH3Math(unittest.TestCase):
+
+    """
+    Test a batch of 4x4 transformations gives the same coordinates as transforming Point4d one by one
+    """
+
+    def test_batched_transformation(self):
+        rng = np.random.RandomState(0)
+        theta, phi, r = rng.uniform(0, 6, 50), rng.uniform(0, 3, 50), rng.uniform(0, 2, 50)
+        parent_theta, parent_phi, offset = rng.uniform(0, 6, 5), rng.uniform(0, 3, 5), rng.uniform(-1, 1, (5, 3))
+        group = rng.randint(0, 5, 50)
+        coords = apply_transformations(transformation_matrices(parent_theta, parent_phi, offset),
+                                       sph_to_cart_array(theta, phi, r), group)
+        for i in range(50):
+            coord = Point4d()
+            coord.sph_to_cart(theta[i], phi[i], r[i])
+            coord.coordinate_transformation(parent_theta[group[i]], parent_phi[group[i]])
+            coord.cart_offset(Point4d(*offset[group[i]]))
+            np.testing.assert_allclose([coord.x, coord.y, coord.z, coord.w], coords[i], atol=1e-12)
+
+    """
+    Test the translation moves the point to the origin, keeps the Minkowski metric and stays a
+    Lorentz transformation after many compositions
+    """
+
+    def test_translation_to_origin(self):
+        rng = np.random.RandomState(1)
+        coords = rng.uniform(-3, 3, (20, 3))
+        points = to_klein_array(coords)
+        np.testing.assert_allclose(coords, from_klein_array(points), atol=1e-12)
+        matrix = translation_to_origin(points[7])
+        np.testing.assert_allclose([0, 0, 0, 1], refocus_array(matrix, points)[7], atol=1e-12)
+        np.testing.assert_allclose(MINKOWSKI_METRIC, matrix.T.dot(MINKOWSKI_METRIC).dot(matrix), atol=1e-12)
+        composed = np.identity(4)
+        for i in range(1000):
+            current = refocus_array(composed, points)
+            composed = compose_transformations(composed, translation_to_origin(current[i % 20]))
+        np.testing.assert_allclose(MINKOWSKI_METRIC, composed.T.dot(MINKOWSKI_METRIC).dot(composed), atol=1e-12)
+        np.testing.assert_allclose([0, 0, 0, 1], refocus_array(composed, points)[999 % 20], atol=1e-9)
+
+    """
+    Test the array versions of the scalar functions agree with them within ARRAY_TOLERANCE in both float
+    types, and give NaN where the scalar versions divide by zero
+    """
+
+    def test_array_functions(self):
+        rng = np.random.RandomState(2)
+        area, r, rp, phi = rng.uniform(0, 50, 200), rng.uniform(0, 3, 200), rng.uniform(0.01, 6, 200), \
+            rng.uniform(0.01, 3.1, 200)
+        x, y = to_klein_array(rng.uniform(-3, 3, (200, 3))), to_klein_array(rng.uniform(-3, 3, (200, 3)))
+        points_x, points_y = [Point4d(*p) for p in x], [Point4d(*p) for p in y]
+        expected = [[compute_radius(a) for a in area], [compute_hyperbolic_area(a) for a in r],
+                    [compute_delta_theta(*a) for a in zip(r, rp, phi)], [compute_delta_phi(*a) for a in zip(r, rp)],
+                    [minkowski(*a) for a in zip(points_x, points_y)]]
+        for dtype in (np.float64, np.float32):
+            tolerance = ARRAY_TOLERANCE[np.dtype(dtype)]
+            arrays = [compute_radius_array(area, dtype), compute_hyperbolic_area_array(r, dtype),
+                      compute_delta_theta_array(r, rp, phi, dtype), compute_delta_phi_array(r, rp, dtype),
+                      minkowski_array(x, y, dtype)]
+            for array, scalar in zip(arrays, expected):
+                self.assertEqual(array.dtype, dtype)
+                np.testing.assert_allclose(array, scalar, rtol=tolerance, atol=tolerance)
+        distance = [hyperbolic_distance(*a) for a in zip(points_x, points_y)]
+        np.testing.assert_allclose(hyperbolic_distance_array(x, y), distance, rtol=ARRAY_TOLERANCE[np.dtype(np.float64)])
+        np.testing.assert_allclose(hyperbolic_distance_array(x, y, np.float32), distance, rtol=1e-3)
+        self.assertTrue(np.isnan(compute_delta_phi_array([0.5], [0.])[0]))
+        self.assertTrue(np.isnan(compute_delta_theta_array([0.5], [1.], [0.])[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import Tree
+from hypy.arraytree import ArrayTree
+from hypy.ingest import write_binary_edges
+
+"""
+Test the streaming constructors build the same tree from every kind of edge source
+"""
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.edges = [(e[1], e[0]) for e in igraph.Graph.Tree(300, 3).get_edgelist()]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameTree(self, tree):
+        expected = Tree(0, self.edges)
+        self.assertEqual(len(expected.nodes), len(tree.nodes))
+        for n in expected.nodes:
+            self.assertEqual(expected.nodes[n].parent, tree.nodes[n].parent)
+            self.assertEqual(expected.nodes[n].children, list(tree.nodes[n].children))
+        self.assertEqual(len(self.edges), tree.ingest_stats.edges)
+
+    """
+    Test reading edges from an iterator, a TSV file and a binary file in small chunks
+    """
+
+    def test_edge_sources(self):
+        tsv = os.path.join(self.directory, "edges.tsv")
+        with open(tsv, "w") as fp:
+            fp.write("child\tparent\n")
+            fp.writelines("{0}\t{1}\n".format(c, p) for c, p in self.edges)
+        binary = os.path.join(self.directory, "edges.bin")
+        edges = np.array(self.edges)
+        write_binary_edges(binary, edges[:, 0], edges[:, 1], dtype=np.int32)
+        for cls in [Tree, ArrayTree]:
+            self.assertSameTree(cls.from_iterator(0, iter(self.edges), chunk_size=64))
+            self.assertSameTree(cls.from_csv(0, tsv, delimiter="\t", chunk_size=64, skip_header=1))
+            self.assertSameTree(cls.from_binary(0, binary, dtype=np.int32, chunk_size=64))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.instrument import Instrumentation, TraceBuffer
+
+"""
+Test the instrumentation of the layout phases
+"""
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    """
+    Test every phase is timed between its hooks and both engines count the same bands
+    """
+
+    def test_phases(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(400, 3).get_edgelist()]
+        bands = []
+        for backend, engine in [("dict", "passes"), ("array", "fused")]:
+            events = []
+            instrumentation = Instrumentation(hooks=[lambda event, phase, i: events.append((event, phase))])
+            tree = get_layout(0, edges, backend=backend, engine=engine, instrumentation=instrumentation)
+            self.assertTrue(tree.instrumentation is instrumentation)
+            phases = list(instrumentation.timers)
+            self.assertEqual("construction", phases[0])
+            self.assertEqual([(event, phase) for phase in phases for event in ["start", "end"]], events)
+            self.assertEqual(0, instrumentation.counters["zero_division_fallbacks"])
+            self.assertEqual(None, instrumentation.trace)
+            bands.append(instrumentation.counters["bands_created"])
+        self.assertEqual(bands[0], bands[1])
+        self.assertTrue(bands[0] > 0)
+
+    """
+    Test the trace records every placed node once and the buffer keeps the newest records
+    """
+
+    def test_trace(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(400, 3).get_edgelist()]
+        instrumentation = Instrumentation(trace=True)
+        tree = get_layout(0, edges, instrumentation=instrumentation)
+        records = instrumentation.trace.phase_records("set_placement")
+        node_ids = instrumentation.trace.node_ids(records)
+        self.assertEqual(list(range(1, 400)), sorted(node_ids))
+        for node_id, record in zip(node_ids[:20], records[:20]):
+            self.assertEqual(tree.nodes[node_id].band, record["band"])
+            self.assertEqual(tree.nodes[node_id].theta, record["theta"])
+        trace = TraceBuffer(capacity=5)
+        trace.append("a", np.arange(3), depth=1)
+        trace.append("b", np.arange(3, 10), radius=np.arange(7) * 0.5)
+        self.assertEqual(5, len(trace))
+        self.assertEqual(5, trace.dropped)
+        self.assertEqual([5, 6, 7, 8, 9], trace.node_ids(trace.to_array()))
+        self.assertEqual(0, len(trace.phase_records("a")))
+
+    """
+    Test tracing a tree with string ids, with both backends
+    """
+
+    def test_string_ids(self):
+        edges = [("a", "r"), ("b", "r"), ("c", "a")]
+        for backend in ["dict", "array"]:
+            instrumentation = Instrumentation(trace=True)
+            tree = get_layout("r", edges, backend=backend, instrumentation=instrumentation)
+            self.assertEqual(4, len(tree.nodes))
+            trace = instrumentation.trace
+            self.assertEqual(["a", "b", "c"], sorted(trace.node_ids(trace.phase_records("set_placement"))))
+            self.assertEqual(1, instrumentation.counters["bands_created"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import unittest
+import numpy as np
+
+from hypy.tree import Tree, get_layout, InvalidArgument
+from hypy.interning import IdTable
+
+"""
+Test the interning of arbitrary node ids to dense indices
+"""
+
+
+class Colliding(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 1
+
+    def __eq__(self, other):
+        return isinstance(other, Colliding) and self.name == other.name
+
+
+class TestIdTable(unittest.TestCase):
+
+    """
+    Test a tree of URL ids is laid out as the same tree with integer ids, keyed by the dense index
+    and translated back in bulk
+    """
+
+    def test_string_ids(self):
+        rng = np.random.RandomState(0)
+        edges = [(n, int(rng.randint(n))) for n in range(1, 500)]
+        url = ["https://example.com/post/{0:x}/é".format(n * 7919) for n in range(500)]
+        expected = get_layout(0, edges, engine="fused")
+        tree = get_layout(url[0], [(url[c], url[p]) for c, p in edges], engine="fused", intern_ids=True)
+        self.assertEqual("str", tree.ids.kind)
+        self.assertEqual(0, tree.root)
+        ids, coords = tree.get_coords()
+        self.assertEqual(list(range(500)), ids.tolist())
+        names = tree.ids.external(ids)
+        self.assertEqual(sorted(url), sorted(names.tolist()))
+        np.testing.assert_array_equal(ids, tree.ids.intern(names))
+        for n, name in zip(ids.tolist(), names.tolist()):
+            node = expected.nodes[url.index(name)]
+            self.assertEqual([node.coord.x, node.coord.y, node.coord.z], coords[n].tolist())
+        self.assertLess(tree.ids.nbytes, sum(sys.getsizeof(u) for u in url))
+
+    """
+    Test the lookups of integer and colliding ids, and the ids added after the table was built, also
+    by insert_edge with the original ids
+    """
+
+    def test_lookup(self):
+        table = IdTable([10, -3, 2 ** 40])
+        self.assertEqual("int", table.kind)
+        self.assertEqual([2, 0, 1], table.intern([2 ** 40, 10, -3]).tolist())
+        self.assertEqual(3, table.add("x"))
+        self.assertEqual(3, table.add("x"))
+        self.assertEqual([3, 1], table.intern(["x", -3]).tolist())
+        for unknown in [11, "y", 2 ** 70]:
+            with self.assertRaises(KeyError):
+                table.index(unknown)
+        table = IdTable([Colliding("a"), Colliding("b"), (1, 2)])
+        self.assertEqual("object", table.kind)
+        self.assertEqual([1, 0, 2], table.intern([Colliding("b"), Colliding("a"), (1, 2)]).tolist())
+        self.assertEqual([(1, 2)], table.external([2]).tolist())
+        tree = Tree("a", [("b", "a"), ("c", "b")], intern_ids=True)
+        tree.set_layout()
+        tree.insert_edge("d", "b")
+        tree.update_layout()
+        self.assertEqual(["a", "b", "c", "d"], tree.ids.external(sorted(tree.nodes)).tolist())
+        self.assertEqual([2, 3], tree.nodes[tree.ids.index("b")].children)
+        for node_id, parent in [("e", "x"), ("d", "a")]:
+            with self.assertRaises(InvalidArgument):
+                tree.insert_edge(node_id, parent)
+        self.assertEqual(4, len(tree.ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import get_layout, InvalidArgument
+from hypy.layoutfile import load_layout
+
+"""
+Test the layout file written by export_layout and read back by load_layout
+"""
+
+
+class TestLayoutFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.edges = [(e[1], e[0]) for e in igraph.Graph.Tree(300, 3).get_edgelist()]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    """
+    Test every node reads back with its parent, depth and coordinate from both backends
+    """
+
+    def test_round_trip(self):
+        for backend in ["dict", "array"]:
+            tree = get_layout(0, self.edges, backend=backend)
+            path = os.path.join(self.tmpdir, backend + ".layout")
+            tree.export_layout(path, dtype=np.float64)
+            layout = load_layout(path)
+            self.assertEqual(300, len(layout))
+            self.assertEqual(-1, layout.parent[layout.row_of(0)])
+            for n in tree.nodes:
+                node = tree.nodes[n]
+                row = layout.row_of(n)
+                self.assertEqual(n, layout.ids[row])
+                self.assertEqual(node.depth, layout.depth[row])
+                if node.parent is not None:
+                    self.assertEqual(node.parent, layout.ids[layout.parent[row]])
+                self.assertEqual((node.coord.x, node.coord.y, node.coord.z), layout.coord(n))
+
+    """
+    Test the float32 columns are memory-mapped and an unknown id is rejected
+    """
+
+    def test_float32_columns(self):
+        tree = get_layout(0, self.edges, backend="array", engine="fused")
+        path = os.path.join(self.tmpdir, "tree.layout")
+        tree.export_layout(path)
+        layout = load_layout(path)
+        self.assertTrue(isinstance(layout.column("x"), np.memmap))
+        self.assertEqual(np.float32, layout.x.dtype)
+        np.testing.assert_allclose(tree.z, layout.column("z"), rtol=1e-6, atol=1e-6)
+        self.assertRaises(KeyError, layout.row_of, 300)
+
+    """
+    Test an interned tree exports its external ids, sorted, and applies the file back
+    """
+
+    def test_interned(self):
+        names = np.random.RandomState(0).permutation(300) * 7
+        edges = [(int(names[c]), int(names[p])) for c, p in self.edges]
+        tree = get_layout(int(names[0]), edges, intern_ids=True)
+        path = os.path.join(self.tmpdir, "tree.layout")
+        tree.export_layout(path, dtype=np.float64, attributes=True)
+        layout = load_layout(path)
+        self.assertEqual(sorted(names.tolist()), layout.ids.tolist())
+        for child, parent in edges:
+            row = layout.row_of(child)
+            self.assertEqual(parent, layout.ids[layout.parent[row]])
+            self.assertEqual(tree.nodes[tree.ids.index(child)].coord.z, layout.z[row])
+        again = get_layout(int(names[0]), edges, intern_ids=True)
+        again.apply_layout(layout)
+        for n in tree.nodes:
+            self.assertEqual(tree.nodes[n].children, again.nodes[n].children)
+            self.assertEqual(tree.nodes[n].coord.x, again.nodes[n].coord.x)
+        self.assertRaises(InvalidArgument, get_layout, int(names[0]), edges, backend="array", intern_ids=True)
+
+    """
+    Test a tree of string ids and a file which is not a layout file are rejected
+    """
+
+    def test_invalid(self):
+        tree = get_layout("r", [("a", "r"), ("b", "r")])
+        path = os.path.join(self.tmpdir, "tree.layout")
+        self.assertRaises(InvalidArgument, tree.export_layout, path)
+        with open(path, "wb") as fp:
+            fp.write(b"not a layout")
+        self.assertRaises(InvalidArgument, load_layout, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from unittest import mock
+
+import hypy.lazy
+from hypy.tree import Tree, get_layout
+from hypy.lazy import LazyLayout
+
+"""
+Test the lazy layout places only the queried nodes, at the coordinates of the fused engine
+"""
+
+
+class TestLazyLayout(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.edges = [(n, int(rng.randint(n) * rng.rand())) for n in range(1, 2000)]
+        tree = get_layout(0, self.edges, engine="fused")
+        self.depth = dict((n, node.depth) for n, node in tree.nodes.items())
+        self.coords = dict((n, [node.coord.x, node.coord.y, node.coord.z]) for n, node in tree.nodes.items())
+        self.layout = LazyLayout.from_tree(Tree(0, self.edges))
+
+    def check(self, ids, coords):
+        np.testing.assert_array_equal([self.coords[n] for n in ids.tolist()], coords)
+
+    """
+    Test a depth cap places the first generations only
+    """
+
+    def test_depth_cap(self):
+        ids, coords = self.layout.get_coords(depth_cap=2)
+        self.assertEqual(sorted(n for n, d in self.depth.items() if d <= 2), sorted(ids.tolist()))
+        self.check(ids, coords)
+        self.assertEqual(len(ids), self.layout.num_placed)
+
+    """
+    Test a subtree is placed with the sibling groups on the path to it, and later queries reuse the
+    placed groups, so the whole tree after it places the rest only, with no call for the children
+    of the root placed for the subtree
+    """
+
+    def test_subtree(self):
+        node = max(self.depth, key=lambda n: (self.depth[n] == 3, n))
+        ids, coords = self.layout.get_coords(subtree=node)
+        self.check(ids, coords)
+        parent = dict(self.edges)
+        below = [n for n in self.depth if n == node or any(a == node for a in self.ancestors(n, parent))]
+        self.assertEqual(sorted(below), sorted(ids.tolist()))
+        self.assertLess(self.layout.num_placed, len(self.depth) // 2)
+        with mock.patch.object(hypy.lazy, "place_bands", wraps=hypy.lazy.place_bands) as bands:
+            self.check(*self.layout.get_coords(subtree=node, depth_cap=1))
+            self.assertEqual(0, bands.call_count)
+            ids, coords = self.layout.get_coords()
+            self.assertEqual(len(self.depth), len(ids))
+            self.check(ids, coords)
+            self.assertEqual(max(self.depth.values()) - 1, bands.call_count)
+        with self.assertRaises(KeyError):
+            self.layout.get_coords(subtree=-1)
+
+    def ancestors(self, n, parent):
+        while n in parent:
+            n = parent[n]
+            yield n
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import igraph
+from unittest import mock
+
+import hypy.tree
+from hypy.tree import Tree
+from hypy.lod import LevelOfDetail, InvalidArgument
+
+"""
+Test the level of detail collapses the large subtrees and expands them on demand
+"""
+
+
+class TestLevelOfDetail(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [(e[1], e[0]) for e in igraph.Graph.Barabasi(n=3000, m=1).get_edgelist()]
+        self.full = self.layout(None)
+
+    def layout(self, lod_options):
+        tree = Tree(0, self.edges)
+        tree.set_node_depth()
+        tree.set_subtree_radius()
+        tree.set_subtree_size()
+        tree.sort_children_by_radius()
+        lod = LevelOfDetail(tree, **lod_options) if lod_options else None
+        if lod:
+            lod.apply()
+        tree.set_placement()
+        return (tree, lod) if lod else tree
+
+    def check(self, tree, node_ids, exact=True):
+        for n in node_ids:
+            expected, node = self.full.nodes[n], tree.nodes[n]
+            if exact:
+                self.assertEqual((expected.coord.x, expected.coord.y, expected.coord.z), (node.coord.x, node.coord.y, node.coord.z))
+            else:
+                self.assertAlmostEqual(expected.coord.x, node.coord.x)
+                self.assertAlmostEqual(expected.coord.y, node.coord.y)
+                self.assertAlmostEqual(expected.coord.z, node.coord.z)
+
+    """
+    Test the subtrees over the size threshold are collapsed into summary nodes, which keep their
+    radius, so the visible nodes are placed as in the full layout and the hidden ones not at all
+    """
+
+    def test_collapse(self):
+        tree, lod = self.layout({"max_size": 100})
+        visible = lod.visible()
+        self.assertTrue(tree.collapsed)
+        self.assertTrue(all(tree.nodes[n].tree_size > 100 and n in visible for n in tree.collapsed))
+        self.assertTrue(all(tree.nodes[n].tree_size <= 100 for n in set(visible) - tree.collapsed - {0}))
+        self.assertLess(len(visible), len(tree.nodes) // 2)
+        self.check(tree, visible)
+        hidden = set(tree.nodes) - set(visible)
+        self.assertTrue(all(tree.nodes[n].coord.x == 0 for n in hidden))
+        with self.assertRaises(InvalidArgument):
+            LevelOfDetail(tree)
+
+    """
+    Test focusing a hidden node expands the collapsed nodes on its path and places the newly visible
+    region only, at the coordinates of the full layout
+    """
+
+    def test_focus(self):
+        tree, lod = self.layout({"max_size": 100, "max_depth": 3})
+        before = set(lod.visible())
+        node = max(self.full.nodes, key=lambda n: self.full.nodes[n].depth)
+        self.assertNotIn(node, before)
+        with mock.patch.object(hypy.tree, "place_bands", wraps=hypy.tree.place_bands) as bands:
+            shown = lod.focus(node)
+        self.assertIn(node, shown)
+        self.assertEqual(set(lod.visible()), before | set(shown))
+        self.assertEqual(len(shown), sum(len(call[0][0]) for call in bands.call_args_list))
+        self.check(tree, lod.visible())
+        lod.collapse(tree.nodes[node].parent)
+        self.assertNotIn(node, lod.visible())
+        with self.assertRaises(InvalidArgument):
+            lod.expand(node)
+
+    """
+    Test updating the layout of a collapsed tree after inserting leaves places the visible nodes as
+    the full layout of all the edges and not the hidden ones, until the level of detail is cleared
+    """
+
+    def test_update_layout(self):
+        tree = Tree(0, self.edges[:2500])
+        tree.set_node_depth()
+        tree.set_subtree_radius()
+        tree.set_subtree_size()
+        tree.sort_children_by_radius()
+        lod = LevelOfDetail(tree, max_size=100)
+        lod.apply()
+        tree.set_placement()
+        for node_id, parent in self.edges[2500:]:
+            tree.insert_edge(node_id, parent)
+        tree.update_layout()
+        visible = lod.visible()
+        hidden = set(n for n, _ in self.edges[2500:]) - set(visible)
+        self.assertTrue(hidden)
+        self.check(tree, visible, exact=False)
+        self.assertTrue(all(tree.nodes[n].coord.x == 0 for n in hidden))
+        lod.clear()
+        self.assertFalse(tree.collapsed)
+        self.check(tree, tree.nodes, exact=False)
+        lod.apply()
+        tree.set_layout()
+        self.assertFalse(tree.collapsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
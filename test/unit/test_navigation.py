@@ -0,0 +1,38 @@
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.navigation import Navigator
+
+"""
+Test refocusing a laid out tree on its nodes
+"""
+
+
+class TestNavigation(unittest.TestCase):
+
+    """
+    Test the focused node moves to the center and the hyperbolic distances between nodes are kept
+    """
+
+    def test_focus(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(200, 3).get_edgelist()]
+        for backend in ["dict", "array"]:
+            navigator = Navigator.from_tree(get_layout(0, edges, backend=backend))
+            before = navigator.points.copy()
+            for node_id in [5, 17, 150, 0]:
+                navigator.focus(node_id)
+            np.testing.assert_allclose([0, 0, 0], navigator.klein_coords()[navigator.row_of(0)], atol=1e-9)
+            np.testing.assert_allclose(_distances(before), _distances(navigator.points), atol=1e-6)
+            navigator.reset()
+            np.testing.assert_allclose(before, navigator.points)
+
+
+def _distances(points):
+    inner = points[:, :3].dot(points[:, :3].T) - np.outer(points[:, 3], points[:, 3])
+    norm = np.sqrt(-np.diag(inner))
+    return np.arccosh(np.maximum(-inner / np.outer(norm, norm), 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.ingest import write_binary_edges
+from hypy.layoutfile import load_layout
+from hypy.outofcore import layout_out_of_core, InvalidArgument
+
+"""
+Test the out-of-core layout against the fused engine
+"""
+
+
+class TestOutOfCore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    """
+    Test a tree with shuffled ids and a node with more children than a chunk gets the layout of the
+    fused engine with a tiny working memory, so every sort, sweep and sibling group runs in chunks
+    """
+
+    def test_fused_layout(self):
+        rng = np.random.RandomState(0)
+        ids = rng.permutation(6000)[:2000] + 10
+        parent = (rng.rand(2000) * np.arange(2000)).astype(np.int64)
+        parent[2:][rng.rand(1998) < 0.2] = 1
+        path = os.path.join(self.tmpdir, "edges")
+        write_binary_edges(path, ids[1:], ids[parent[1:]])
+        layout = layout_out_of_core(ids[0], path, os.path.join(self.tmpdir, "layout"), memory=1 << 16,
+                                    directory=self.tmpdir, dtype=np.float64)
+        tree = get_layout(ids[0], list(zip(ids[1:].tolist(), ids[parent[1:]].tolist())), engine="fused")
+        tree.export_layout(os.path.join(self.tmpdir, "expected"), np.float64)
+        expected = load_layout(os.path.join(self.tmpdir, "expected"))
+        for name in ["id", "parent", "depth"]:
+            np.testing.assert_array_equal(expected.column(name), layout.column(name))
+        for name in ["x", "y", "z"]:
+            np.testing.assert_allclose(expected.column(name), layout.column(name), atol=1e-12)
+        self.assertEqual(["edges", "expected", "layout"], sorted(os.listdir(self.tmpdir)))
+
+    """
+    Test edges which are not a tree rooted at the root raise an InvalidArgument
+    """
+
+    def test_invalid_edges(self):
+        for edges in [[(2, 1), (3, 2), (2, 3)], [(2, 1), (1, 2)], [(2, 1), (3, 4)], [(2, 1), (4, 3), (3, 4)]]:
+            child, parent = np.array(edges).T
+            with self.assertRaises(InvalidArgument):
+                layout_out_of_core(1, [(child, parent)], os.path.join(self.tmpdir, "layout"), directory=self.tmpdir)
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.arraytree import ArrayTree
+from hypy.parallel import parallel_layout
+
+"""
+Test laying out the subtrees in worker processes gives the same layout as one process
+"""
+
+
+class TestParallelLayout(unittest.TestCase):
+
+    """
+    Test get_layout with workers gives the same layout for both backends
+    """
+
+    def test_workers(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(300, 3).get_edgelist()]
+        expected = get_layout(0, edges)
+        for backend in ["dict", "array"]:
+            tree = get_layout(0, edges, backend=backend, workers=2)
+            self.assertEqual(expected.height, tree.height)
+            for n in expected.nodes:
+                self.assertEqual(expected.nodes[n].children, list(tree.nodes[n].children))
+                self.assertEqual(expected.nodes[n].depth, tree.nodes[n].depth)
+                self.assertEqual(expected.nodes[n].band, tree.nodes[n].band)
+                self.assertAlmostEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+                self.assertAlmostEqual(expected.nodes[n].coord.y, tree.nodes[n].coord.y)
+                self.assertAlmostEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+
+    """
+    Test every frontier depth gives the same coordinates
+    """
+
+    def test_frontier_depth(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(200, 2).get_edgelist()]
+        expected = get_layout(0, edges, backend="array", engine="fused")
+        tree = ArrayTree(0, edges)
+        for frontier_depth in range(5):
+            layout = parallel_layout(tree.child_offsets, tree.child_index, tree.root_index, 2, frontier_depth)
+            np.testing.assert_allclose(np.column_stack([expected.x, expected.y, expected.z]), layout[7], atol=1e-12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+import unittest
+import numpy as np
+from unittest import mock
+
+import hypy.service
+from hypy.tree import get_layout
+from hypy.temporal import insert_edges
+from hypy.service import LayoutService, serve
+
+"""
+Test the layout service over HTTP and WebSocket
+"""
+
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write("{0} {1} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {2}\r\n\r\n"
+                 .format(method, path, len(body)).encode("latin-1") + body)
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()).strip():
+        pass
+    lines = []
+    while status != 204:
+        size = int((await reader.readline()).strip(), 16)
+        chunk = await reader.readexactly(size + 2)
+        if not size:
+            break
+        lines.append(json.loads(chunk[:-2].decode("utf-8")))
+    writer.close()
+    return status, lines
+
+
+def coords(lines):
+    ids = np.array([i for line in lines[:-1] for i in line["ids"]])
+    xyz = np.array([c for line in lines[:-1] for c in line["coords"]]).reshape(-1, 3)
+    order = np.argsort(ids)
+    return ids[order], xyz[order]
+
+
+class TestLayoutService(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.edges = [(n, int(rng.randint(n))) for n in range(1, 300)]
+
+    def run_server(self, client, chunk_nodes=50, service=None):
+        async def main():
+            server = await serve(port=0, service=service or LayoutService(chunk_nodes=chunk_nodes))
+            async with server:
+                return await client(server.sockets[0].getsockname()[1])
+        return asyncio.run(main())
+
+    """
+    Test a layout is streamed generation by generation and an insertion in chunks, and two trees are
+    served at the same time
+    """
+
+    def test_http(self):
+        async def client(port):
+            first = await asyncio.gather(request(port, "PUT", "/trees/a", {"root": 0, "edges": self.edges[:200]}),
+                                         request(port, "PUT", "/trees/b", {"root": 0, "edges": self.edges}))
+            second = await request(port, "POST", "/trees/a/edges", {"edges": self.edges[200:]})
+            current = await request(port, "GET", "/trees/a")
+            deleted = await request(port, "DELETE", "/trees/a")
+            return first, second, current, deleted, await request(port, "GET", "/trees/a")
+
+        (a, b), second, current, deleted, missing = self.run_server(client)
+        tree = get_layout(0, self.edges[:200], engine="fused")
+        self.assertEqual(200, a[0])
+        self.assertEqual(6, len(a[1]))
+        self.assertEqual({"done": True, "nodes": 201}, a[1][-1])
+        depth = [tree.nodes[i].depth for line in a[1][:-1] for i in line["ids"]]
+        self.assertEqual(sorted(depth), depth)
+        ids, xyz = coords(a[1])
+        np.testing.assert_array_equal(tree.get_coords()[0], ids)
+        np.testing.assert_array_equal(tree.get_coords()[1], xyz)
+        np.testing.assert_array_equal(get_layout(0, self.edges, engine="fused").get_coords()[1], coords(b[1])[1])
+        insert_edges(tree, self.edges[200:])
+        tree.update_layout()
+        np.testing.assert_array_equal(tree.get_coords()[1], coords(second[1])[1])
+        self.assertEqual(second, current)
+        self.assertEqual((204, []), deleted)
+        self.assertEqual(404, missing[0])
+
+    """
+    Test a tree deleted while requests wait on it keeps its lock, so a tree laid out again under its
+    name runs after them
+    """
+
+    def test_remove(self):
+        service = LayoutService()
+
+        async def laid_out(generations):
+            return [ids async for ids, _ in generations]
+
+        async def main():
+            await laid_out(service.layout("a", 0, self.edges))
+            lock = service.locks["a"]
+            await lock.acquire()
+            removed = asyncio.ensure_future(service.remove("a"))
+            layout = asyncio.ensure_future(laid_out(service.layout("a", 0, self.edges[:10])))
+            await asyncio.sleep(0)
+            lock.release()
+            await removed
+            await laid_out(service.layout("a", 0, self.edges[:20]))
+            return lock, await layout
+
+        lock, layout = asyncio.run(main())
+        self.assertIs(lock, service.locks["a"])
+        self.assertEqual(11, sum(len(ids) for ids in layout))
+        self.assertEqual(21, len(service.trees["a"].nodes))
+
+    """
+    Test invalid requests are answered with an error status and message
+    """
+
+    def test_errors(self):
+        async def client(port):
+            return [await request(port, "PUT", "/trees/a", {"root": 0, "edges": [(0, 5)]}),
+                    await request(port, "PUT", "/trees/a", {"edges": self.edges}),
+                    await request(port, "POST", "/trees/a/edges", {"edges": self.edges}),
+                    await request(port, "PATCH", "/trees/a"),
+                    await request(port, "GET", "/layouts/a")]
+
+        responses = self.run_server(client)
+        self.assertEqual([400, 400, 404, 405, 404], [status for status, _ in responses])
+        self.assertTrue(all("error" in lines[0] for _, lines in responses))
+
+    """
+    Test a WebSocket session lays out a tree and inserts edges into it, one message per chunk
+    """
+
+    def test_websocket(self):
+        async def send(writer, value):
+            payload, mask = json.dumps(value).encode("utf-8"), os.urandom(4)
+            masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            writer.write(struct.pack("!BBH", 0x81, 0x80 | 126, len(payload)) + mask + masked)
+
+        async def receive(reader):
+            messages = []
+            while not messages or "done" not in messages[-1]:
+                head = await reader.readexactly(2)
+                length = head[1] & 0x7f
+                if length == 126:
+                    length, = struct.unpack("!H", await reader.readexactly(2))
+                elif length == 127:
+                    length, = struct.unpack("!Q", await reader.readexactly(8))
+                messages.append(json.loads((await reader.readexactly(length)).decode("utf-8")))
+            return messages
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            key = base64.b64encode(os.urandom(16)).decode("ascii")
+            writer.write("GET /trees/ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         "Sec-WebSocket-Key: {0}\r\nSec-WebSocket-Version: 13\r\n\r\n".format(key).encode("latin-1"))
+            status = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            await send(writer, {"root": 0, "edges": self.edges[:200]})
+            first = await receive(reader)
+            await send(writer, {"edges": self.edges[200:]})
+            second = await receive(reader)
+            writer.write(struct.pack("!BB", 0x88, 0x80) + os.urandom(4))
+            closed = await reader.readexactly(2)
+            writer.close()
+            await writer.wait_closed()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write("GET /trees/ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         "Sec-WebSocket-Key: {0}\r\nSec-WebSocket-Version: 13\r\n\r\n".format(key).encode("latin-1"))
+            while (await reader.readline()).strip():
+                pass
+            with mock.patch.object(hypy.service, "MAX_BODY", 100):
+                await send(writer, {"root": 0, "edges": self.edges})
+                head = await reader.readexactly(2)
+                too_big = head[0], struct.unpack("!H", (await reader.readexactly(head[1] & 0x7f))[:2])[0]
+            writer.close()
+            return status, first, second, closed, too_big
+
+        status, first, second, closed, too_big = self.run_server(client, chunk_nodes=100)
+        self.assertIn(b"101", status)
+        self.assertEqual([4, 4], [len(first), len(second)])
+        np.testing.assert_array_equal(get_layout(0, self.edges[:200], engine="fused").get_coords()[1], coords(first)[1])
+        self.assertEqual(300, second[-1]["nodes"])
+        self.assertEqual(0x88, closed[0])
+        self.assertEqual((0x88, 1009), too_big)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import Tree
+from hypy.arraytree import ArrayTree
+from hypy.spanning import spanning_tree, InvalidArgument
+
+"""
+Test the spanning trees extracted from general graphs
+"""
+
+
+class TestSpanningTree(unittest.TestCase):
+
+    """
+    Test the breath-first-search tree puts every node at its distance from the root, in both
+    directions, and counts the dropped edges and unreachable nodes
+    """
+
+    def test_bfs(self):
+        graph = igraph.Graph.Barabasi(n=1000, m=3, directed=True)
+        edges = graph.get_edgelist() + [(5, 5), (1000, 1001)]
+        for cls in [Tree, ArrayTree]:
+            tree = cls.from_graph(0, edges, directed=False)
+            tree.set_node_depth()
+            distances = graph.as_undirected().distances(source=[0])[0]
+            self.assertTrue(all(tree.nodes[n].depth == distances[n] for n in range(1000)))
+            self.assertEqual(len(edges) - 999, tree.spanning_stats.dropped)
+            self.assertEqual(2, tree.spanning_stats.unreachable)
+        child, parent, stats = spanning_tree(0, np.array([1, 2, 2, 3]), np.array([0, 1, 3, 4]))
+        self.assertEqual([1, 2], child.tolist())
+        self.assertEqual([0, 1], parent.tolist())
+        self.assertEqual((2, 2), (stats.dropped, stats.unreachable))
+
+    """
+    Test Prim's tree of an undirected graph weighs as much as a minimum spanning tree from Kruskal's
+    """
+
+    def test_prim(self):
+        edges = igraph.Graph.Barabasi(n=500, m=3).get_edgelist()
+        weights = np.random.RandomState(0).rand(len(edges))
+        child, parent, stats = spanning_tree(0, [e[0] for e in edges], [e[1] for e in edges], False,
+                                             "prim", weights)
+        lightest = {}
+        for (a, b), w in zip(edges, weights.tolist()):
+            if a != b:
+                lightest[min(a, b), max(a, b)] = min(lightest.get((min(a, b), max(a, b)), 2.), w)
+        root = list(range(500))
+
+        def find(x):
+            while root[x] != x:
+                x = root[x]
+            return x
+        expected = 0.
+        for (a, b), w in sorted(lightest.items(), key=lambda item: item[1]):
+            if find(a) != find(b):
+                root[find(a)] = find(b)
+                expected += w
+        total = sum(lightest[min(c, p), max(c, p)] for c, p in zip(child.tolist(), parent.tolist()))
+        self.assertAlmostEqual(expected, total)
+        self.assertEqual(499, stats.tree_edges)
+        with self.assertRaises(InvalidArgument):
+            spanning_tree(0, [1], [0], method="kruskal")
+
+
+if __name__ == '__main__':
+    unittest.main()
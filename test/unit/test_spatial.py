@@ -0,0 +1,54 @@
+import unittest
+import igraph
+import numpy as np
+
+from hypy.tree import get_layout
+from hypy.navigation import Navigator
+from hypy.spatial import SpatialIndex
+
+"""
+Test the spatial index answers the same as a linear scan over the coordinates
+"""
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(2000, 4).get_edgelist()]
+        self.tree = get_layout(0, edges, backend="array", engine="fused")
+        self.ids, self.coords = self.tree.get_coords()
+
+    """
+    Test the box and frustum queries against a linear scan
+    """
+
+    def test_culling(self):
+        index = SpatialIndex.from_tree(self.tree, leaf_size=8)
+        lower, upper = np.array([-1., -1., 0.]), np.array([1., 0.5, 2.])
+        inside = ((self.coords >= lower) & (self.coords <= upper)).all(axis=1)
+        self.assertEqual(self.ids[inside].tolist(), index.query_box(lower, upper).tolist())
+        planes = np.random.RandomState(0).normal(size=(6, 4))
+        inside = (self.coords.dot(planes[:, :3].T) + planes[:, 3] >= 0).all(axis=1)
+        self.assertEqual(self.ids[inside].tolist(), index.query_planes(planes).tolist())
+
+    """
+    Test the nearest node and the ray pick, before and after refitting to a refocused layout
+    """
+
+    def test_picking(self):
+        index = SpatialIndex.from_tree(self.tree, leaf_size=8)
+        navigator = Navigator.from_tree(self.tree)
+        for coords in [self.coords, navigator.focus(1500)[:, :3]]:
+            index.refit(coords)
+            point = np.array([0.2, -0.1, 0.3])
+            node_id, distance = index.nearest(point)
+            self.assertEqual(self.ids[np.argmin(((coords - point) ** 2).sum(axis=1))], node_id)
+            origin, direction = np.array([-3., 0.01, 0.02]), np.array([1., 0., 0.])
+            offset = coords - origin
+            along = offset[:, 0]
+            hit = (along >= 0) & ((offset ** 2).sum(axis=1) - along ** 2 <= 0.01)
+            node_id, t = index.ray_pick(origin, direction, 0.1)
+            self.assertEqual(self.ids[hit][np.argmin(along[hit])], node_id)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import igraph
+
+from hypy.tree import get_layout
+from hypy.temporal import snapshot_layouts, InvalidArgument
+
+"""
+Test the layouts of a sequence of snapshots of a growing tree
+"""
+
+
+class TestSnapshotLayouts(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [(e[1], e[0]) for e in igraph.Graph.Barabasi(n=400, m=1).get_edgelist()]
+        self.snapshots = [self.edges[:200], self.edges[:300], self.edges]
+
+    """
+    Test every frame is the layout of its snapshot, the same as a layout from scratch of its edges
+    """
+
+    def test_frames(self):
+        for (tree, inserted), edges in zip(snapshot_layouts(0, self.snapshots, stable=False), self.snapshots):
+            expected = get_layout(0, edges)
+            for n in expected.nodes:
+                self.assertEqual(expected.nodes[n].children, tree.nodes[n].children)
+                self.assertAlmostEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+                self.assertAlmostEqual(expected.nodes[n].coord.y, tree.nodes[n].coord.y)
+                self.assertAlmostEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+        self.assertEqual(len(self.edges) - 300, len(inserted))
+        self.assertEqual(len(self.edges) + 1, len(tree.nodes))
+
+    """
+    Test the siblings keep their order from frame to frame, though every node but the root moves, and
+    the new edges alone give the same frames
+    """
+
+    def test_stable(self):
+        previous = None
+        deltas = [self.edges[:200], self.edges[200:300], sorted(self.edges[300:], key=lambda e: -e[1])]
+        for (tree, _), (delta, _) in zip(snapshot_layouts(0, self.snapshots),
+                                         snapshot_layouts(0, deltas, incremental=True)):
+            if previous is not None:
+                for n, children in previous.items():
+                    self.assertEqual(children, [c for c in tree.nodes[n].children if c in previous])
+                for n, coord in coords.items():
+                    node = tree.nodes[n]
+                    if n != 0:
+                        self.assertNotEqual(coord, (node.coord.x, node.coord.y, node.coord.z))
+            previous = dict((n, list(node.children)) for n, node in tree.nodes.items())
+            coords = dict((n, (node.coord.x, node.coord.y, node.coord.z)) for n, node in tree.nodes.items())
+            for n in tree.nodes:
+                self.assertEqual(tree.nodes[n].children, delta.nodes[n].children)
+                self.assertEqual(tree.nodes[n].coord.y, delta.nodes[n].coord.y)
+
+    """
+    Test a snapshot moving a node is laid out from scratch, and new edges out of the tree are rejected
+    """
+
+    def test_rebuild(self):
+        moved = [(c, 0) if c == self.edges[-1][0] else (c, p) for c, p in self.edges]
+        frames = [inserted for _, inserted in snapshot_layouts(0, [self.edges, moved])]
+        self.assertEqual([None, None], frames)
+        with self.assertRaises(InvalidArgument):
+            list(snapshot_layouts(0, [self.edges, [(1000, 999)]], incremental=True))
+
+    """
+    Test a snapshot which reorders the edges of the previous one is diffed against the tree
+    """
+
+    def test_reordered(self):
+        snapshots = [self.edges[:300], self.edges[::-1]]
+        frames = [inserted for _, inserted in snapshot_layouts(0, snapshots)]
+        self.assertEqual(None, frames[0])
+        self.assertEqual(sorted(c for c, _ in self.edges[300:]), sorted(frames[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
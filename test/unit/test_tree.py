@@ -3,7 +3,8 @@ import igraph
 import collections
 import json
 
-from hypy.tree import Tree
+from hypy.tree import Tree, get_layout, InvalidArgument
+from hypy.h3math import compute_radius, compute_hyperbolic_area
 
 """
 Test some properties of the tree structure
@@ -39,5 +40,120 @@ class TestTree(unittest.TestCase):
             self.assertTrue(tree.nodes[n].tree_size <= tmp_size)
             tmp_size = tree.nodes[n].tree_size
 
+    """
+    Test the hemisphere radii are aggregated from the leaves to the root, every parent reserves
+    7.2 times the hemisphere area of each child
+    """
+
+    def test_subtree_radius(self):
+        edges = [(1, 0), (2, 0), (3, 1), (4, 1), (5, 1)]
+        tree = Tree(0, edges)
+        tree.set_node_depth()
+        tree.set_subtree_radius(edges)
+        leaf_radius = compute_radius(0.0025)
+        area_1 = 3 * 7.2 * compute_hyperbolic_area(leaf_radius)
+        area_0 = 7.2 * compute_hyperbolic_area(compute_radius(area_1)) + 7.2 * compute_hyperbolic_area(leaf_radius)
+        self.assertAlmostEqual(leaf_radius, tree.nodes[5].radius)
+        self.assertAlmostEqual(area_1, tree.nodes[1].area)
+        self.assertAlmostEqual(area_0, tree.nodes[0].area)
+        self.assertAlmostEqual(compute_radius(area_0), tree.nodes[0].radius)
+
+    """
+    Test the fused engine gives the same layout as running the five passes one by one
+    """
+
+    def test_fused_layout(self):
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(500, 3).get_edgelist()]
+        expected = get_layout(0, edges)
+        tree = get_layout(0, edges, engine="fused")
+        self.assertEqual(expected.height, tree.height)
+        for n in expected.nodes:
+            self.assertEqual(expected.nodes[n].children, tree.nodes[n].children)
+            self.assertEqual(expected.nodes[n].depth, tree.nodes[n].depth)
+            self.assertEqual(expected.nodes[n].tree_size, tree.nodes[n].tree_size)
+            self.assertAlmostEqual(expected.nodes[n].radius, tree.nodes[n].radius)
+            self.assertAlmostEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+            self.assertAlmostEqual(expected.nodes[n].coord.y, tree.nodes[n].coord.y)
+            self.assertAlmostEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+
+    """
+    Test updating the layout after inserting leaves gives the same layout as a layout from scratch of
+    all the edges, also when a new leaf makes its parent tie on radius with a sibling placed before it
+    """
+
+    def test_update_layout(self):
+        barabasi = [(e[1], e[0]) for e in igraph.Graph.Barabasi(n=400, m=1).get_edgelist()]
+        for edges, start in [(barabasi, 250), ([(1, 0), (2, 0), (3, 2), (4, 1)], 3)]:
+            tree = get_layout(0, edges[:start])
+            for node_id, parent in edges[start:]:
+                tree.insert_edge(node_id, parent)
+            tree.update_layout()
+            expected = get_layout(0, edges)
+            for n in expected.nodes:
+                self.assertEqual(expected.nodes[n].children, tree.nodes[n].children)
+                self.assertEqual(expected.nodes[n].tree_size, tree.nodes[n].tree_size)
+                self.assertAlmostEqual(expected.nodes[n].radius, tree.nodes[n].radius)
+                self.assertAlmostEqual(expected.nodes[n].coord.x, tree.nodes[n].coord.x)
+                self.assertAlmostEqual(expected.nodes[n].coord.y, tree.nodes[n].coord.y)
+                self.assertAlmostEqual(expected.nodes[n].coord.z, tree.nodes[n].coord.z)
+        self.assertEqual([1, 2], tree.nodes[0].children)
+
+    """
+    Test the batched plot draws the edges in one collection per color and caps the tags, for both
+    tree backends, and other objects are rejected
+    """
+
+    def test_batched_scatter_plot(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from hypy.render_matplotlib import scatter_plot
+        edges = [(e[1], e[0]) for e in igraph.Graph.Tree(300, 3).get_edgelist()]
+        for backend in ["dict", "array"]:
+            tree = get_layout(0, edges, backend=backend, engine="fused")
+            ax = tree.scatter_plot(equators=False, max_labels=10, min_pixels=0)
+            ax.figure.canvas.draw()
+            self.assertEqual(len(ax.texts), 10)
+            self.assertLessEqual(len(ax.collections), 6)
+            self.assertEqual(sum(len(c.get_segments()) for c in ax.collections[:-1]), 299)
+            plt.close("all")
+        with self.assertRaises(InvalidArgument):
+            scatter_plot(edges)
+
+    """
+    Test the cached traversal orders match the traversals of the children lists, and are rebuilt
+    after an insertion and a sort
+    """
+
+    def test_traversal(self):
+        edges = igraph.Graph.Barabasi(n=300, m=1, directed=True).get_edgelist()
+        tree = Tree(0, edges)
+
+        def preorder(n):
+            return [n] + [m for c in tree.nodes[n].children for m in preorder(c)]
+
+        for step in range(3):
+            traversal = tree.traversal
+            self.assertIs(traversal, tree.traversal)
+            order, level_bounds = tree.get_level_order()
+            queue, bfs = collections.deque([0]), []
+            while queue:
+                bfs.append(queue.popleft())
+                queue.extend(tree.nodes[bfs[-1]].children)
+            self.assertEqual(bfs, order)
+            self.assertEqual(bfs[::-1], traversal.reverse_bfs().tolist())
+            self.assertEqual(preorder(0), traversal.dfs().tolist())
+            self.assertEqual(bfs, [n for generation in traversal.generations() for n in generation.tolist()])
+            for n in [0, 1, bfs[-1]]:
+                self.assertEqual(preorder(n), traversal.subtree(n).tolist())
+                self.assertEqual(set(preorder(n)), set(m for m in tree.nodes if traversal.contains(n, m)))
+            if step == 0:
+                tree.insert_edge(300, 1)
+            else:
+                tree.set_subtree_size()
+                tree.sort_children_by_tree_size()
+            self.assertIsNot(traversal, tree.traversal)
+        self.assertEqual(len(preorder(1)), tree.nodes[1].tree_size)
+
 if __name__ == '__main__':
     unittest.main()
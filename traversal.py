@@ -0,0 +1,136 @@
+import numpy as np
+
+
+"""
+The traversal orders of a tree as integer arrays, computed once from the children lists and kept
+by Tree.traversal until the children change. The nodes are numbered by their position in the
+breath-first-search order, the root first and every generation grouped by parent in the order of
+the children lists, so the children of a node are consecutive positions and generation d is the
+positions level_bounds[d]:level_bounds[d + 1]. The depth-first-search preorder is derived from it
+generation by generation with the subtree sizes, and the subtree of a node is the span
+pre[i]:pre[i] + size[i] of the preorder, so testing whether a node is in a subtree compares two
+integers.
+"""
+
+
+class Traversal(object):
+
+    """
+    The constructor for the traversal orders.
+
+    :param list order: the node ids in breath-first-search order
+    :param numpy.ndarray num_children: the number of children of each node, in the same order
+    :param numpy.ndarray level_bounds: the offsets of each generation in the order
+    """
+
+    def __init__(self, order, num_children, level_bounds):
+        n = len(order)
+        self.order = order
+        self.ids = np.asarray(order)
+        self.position = dict((node_id, i) for i, node_id in enumerate(order))
+        self.num_children = np.asarray(num_children, dtype=np.int64)
+        self.level_bounds = np.asarray(level_bounds, dtype=np.int64)
+        self.depth = np.repeat(np.arange(len(self.level_bounds) - 1), np.diff(self.level_bounds))
+        self.parent = np.full(n, -1, dtype=np.int64)
+        self.parent[1:] = np.repeat(np.arange(n), self.num_children)
+        first_child = np.cumsum(self.num_children) - self.num_children + 1
+        self.size = np.ones(n, dtype=np.int64)
+        for d in range(len(self.level_bounds) - 2, 0, -1):
+            above, lo, hi = self.level_bounds[d - 1:d + 2]
+            self.size[above:lo] += np.bincount(self.parent[lo:hi] - above, weights=self.size[lo:hi],
+                                               minlength=lo - above).astype(np.int64)
+        self.pre = np.zeros(n, dtype=np.int64)
+        for d in range(1, len(self.level_bounds) - 1):
+            lo, hi = self.level_bounds[d:d + 2]
+            parent = self.parent[lo:hi]
+            before = np.cumsum(self.size[lo:hi]) - self.size[lo:hi]
+            self.pre[lo:hi] = self.pre[parent] + 1 + before - before[first_child[parent] - lo]
+        self.preorder = np.empty(n, dtype=np.int64)
+        self.preorder[self.pre] = np.arange(n)
+
+    """
+    Build the traversal orders of a Tree from its children lists.
+
+    :param tree.Tree tree: the tree
+    :returns: return the Traversal
+    """
+
+    @classmethod
+    def from_tree(cls, tree):
+        order, num_children, level_bounds = [tree.root], [], [0]
+        while level_bounds[-1] < len(order):
+            start = level_bounds[-1]
+            level_bounds.append(len(order))
+            for node_id in order[start:level_bounds[-1]]:
+                children = tree.nodes[node_id].children
+                num_children.append(len(children))
+                order.extend(children)
+        return cls(order, num_children, level_bounds)
+
+    def __len__(self):
+        return len(self.order)
+
+    """
+    Get the node ids in breath-first-search order.
+    """
+
+    def bfs(self):
+        return self.ids
+
+    """
+    Get the node ids in reverse breath-first-search order, every node before its parent.
+    """
+
+    def reverse_bfs(self):
+        return self.ids[::-1]
+
+    """
+    Get the node ids in depth-first-search preorder.
+    """
+
+    def dfs(self):
+        return self.ids[self.preorder]
+
+    """
+    Iterate over the generations of the tree.
+
+    :returns: yield the node ids of every generation, from the root down
+    """
+
+    def generations(self):
+        for d in range(len(self.level_bounds) - 1):
+            yield self.ids[self.level_bounds[d]:self.level_bounds[d + 1]]
+
+    """
+    Get the span of the subtree of a node in the depth-first-search preorder.
+
+    :param node_id: the node id
+    :returns: return the pair (start, stop) of the subtree in dfs(), a KeyError is raised for an unknown id
+    """
+
+    def span(self, node_id):
+        i = self.position[node_id]
+        return int(self.pre[i]), int(self.pre[i] + self.size[i])
+
+    """
+    Get the node ids of the subtree of a node.
+
+    :param node_id: the node id of the subtree root
+    :returns: return the node ids of the subtree in depth-first-search preorder
+    """
+
+    def subtree(self, node_id):
+        start, stop = self.span(node_id)
+        return self.ids[self.preorder[start:stop]]
+
+    """
+    Test whether a node is in the subtree of another node, itself included.
+
+    :param ancestor: the node id of the subtree root
+    :param node_id: the node id
+    :returns: return True if the node is in the subtree
+    """
+
+    def contains(self, ancestor, node_id):
+        i, j = self.position[ancestor], self.position[node_id]
+        return bool(self.pre[i] <= self.pre[j] < self.pre[i] + self.size[i])
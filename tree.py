@@ -1,26 +1,16 @@
 import collections
 import logging
 import json
-import math
-from collections import deque
+import numpy as np
 from node import Node
-from operator import itemgetter
-from h3math import Point4d, compute_radius, compute_hyperbolic_area, compute_delta_phi, compute_delta_theta
-
-from mpl_toolkits.mplot3d import Axes3D
-import mpl_toolkits.mplot3d.art3d as art3d
-from matplotlib.patches import Circle, PathPatch
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-
-
-"""
-Customized exception for invalid edge input. 
-"""
-
-
-class InvalidArgument(Exception):
-    pass
+from errors import InvalidArgument
+from ingest import StreamingConstructors
+from h3math import RESERVATION, LEAF_AREA, compute_radius, compute_radius_array, compute_hyperbolic_area_array
+from kernels import reverse_sweep, forward_levels, place_bands, place_coords
+from layoutfile import write_layout
+from instrument import instrumented
+from traversal import Traversal
+from interning import IdTable
 
 
 """
@@ -28,28 +18,67 @@ The tree structure storing all nodes and edges, and also provide easy node looku
 """
 
 
-class Tree(object):
+class Tree(StreamingConstructors):
 
     """
     This is the constructor for tree class. 
 
+    With intern_ids set, the node ids may be any hashable ids, e.g. URL strings, and are interned
+    to dense int32 indices by an interning.IdTable kept in tree.ids: the nodes, the root and the
+    layout output are keyed by the dense index, and tree.ids.external(ids) translates them back in
+    bulk, e.g. for an export. 
+
     :param int root: the root id of the tree, default None
     :param (int, int) edges: a tuple for a tree edge as (child, parent), default None
+    :param bool intern_ids: whether to intern the node ids to dense indices, default False
     :type nodes: set( dict( int parent, int child) ), the lookup table for the tree
     """
 
-    def __init__(self, root=None, edges=None):
+    def __init__(self, root=None, edges=None, intern_ids=False):
         self.nodes = {}
         self.height = 0
+        self.ids = None
+        ids = None
+        if intern_ids:
+            ids, root, edges = IdTable.from_edges(root, edges if edges is not None else [])
         self.root = root
-        for e in edges:
-            self.insert_edge(e[0], e[1])
+        self.laid_out = False
+        self.dirty = set()
+        self.inserted = []
+        self.instrumentation = None
+        self._traversal = None
+        self.collapsed = set()
+        if edges is not None:
+            for e in edges:
+                self.insert_edge(e[0], e[1])
+        self.ids = ids
+
+    """
+    Build the tree from chunks of edges, used by the streaming constructors from_edge_chunks, 
+    from_iterator, from_csv and from_binary of ingest.StreamingConstructors. 
+
+    :param int root: the root id of the tree
+    :param chunks: an iterable of (child, parent) array pairs
+    :returns: return the tree
+    """
+
+    @classmethod
+    def _from_chunks(cls, root, chunks):
+        tree = cls(root)
+        for child, parent in chunks:
+            for node_id, parent_id in zip(child.tolist(), parent.tolist()):
+                tree.insert_edge(node_id, parent_id)
+        return tree
 
     """
     Insert edge(child, parent) pair into the tree. If the parent is not given, the node is the root. 
     If the parent id is given but the child node is the root, an exception is raised for cycling 
     back to the root. If the root is set already and trying to set again, an exception is raised for
     setting a duplicate root. 
+    Once the tree has been laid out, a new leaf can be inserted under a node in the tree and the 
+    path from it to the root is marked dirty for update_layout. 
+    On a tree with interned ids, the ids are the original ones, new ids are added to tree.ids, and
+    the node is keyed by its dense index. 
 
     :param int node_id: the child id
     :param int parent: the parent id
@@ -57,18 +86,38 @@ class Tree(object):
     """
 
     def insert_edge(self, node_id, parent=None):
+        if self.ids is not None:
+            if self.laid_out and (parent not in self.ids or node_id in self.ids):
+                logging.error("You attempted to insert a node which is not a new leaf of the tree \n")
+                raise InvalidArgument("You attempted to insert a node which is not a new leaf of the tree \n")
+            node_id = self.ids.add(node_id)
+            parent = None if parent is None else self.ids.add(parent)
         node = Node(node_id, parent)
+        self._traversal = None
+        if self.laid_out:
+            if parent not in self.nodes or node_id in self.nodes:
+                logging.error("You attempted to insert a node which is not a new leaf of the tree \n")
+                raise InvalidArgument("You attempted to insert a node which is not a new leaf of the tree \n")
+            node.rank = len(self.nodes[parent].children)
+            self.nodes[parent].children.append(node_id)
+            self.nodes[node_id] = node
+            self.inserted.append(node_id)
+            while node_id is not None and node_id not in self.dirty:
+                self.dirty.add(node_id)
+                node_id = self.nodes[node_id].parent
+            return node
         if parent is not None:
             if parent not in self.nodes:
                 if node_id == self.root:
                     logging.error("You attempted to introduce a cycle back to the root \n")
                     raise InvalidArgument("You attempted to introduce a cycle back to the root \n")
                 self.nodes[parent] = Node(node_id)
-            self.nodes[parent].children.append(node_id)
             if node_id in self.nodes:
                 self.nodes[node_id].parent = parent
             else:
                 self.nodes[node_id] = node
+            self.nodes[node_id].rank = len(self.nodes[parent].children)
+            self.nodes[parent].children.append(node_id)
         else:
             if self.root is not None:
                 logging.error("You attempted to introduce a duplicate root \n")
@@ -80,15 +129,44 @@ class Tree(object):
     """
     Get all the leaf nodes in a set. 
 
-    :param set[ dict( int child, int parent) ] edges: the edge list for all edges of the tree
+    :param set[ dict( int child, int parent) ] edges: the edge list for all edges of the tree, default
+                                                      None for the nodes without children
     :returns: the set of all leaf nodes
     """
 
-    def get_leaf_nodes(self, edges):
+    def get_leaf_nodes(self, edges=None):
+        if edges is None:
+            return set(n for n, node in self.nodes.items() if not node.children)
         children = set(e[0] for e in edges)
         parents = set(e[1] for e in edges)
         return children - parents
 
+    """
+    Get the traversal orders of the tree, see traversal.Traversal: the breath-first-search order,
+    its reverse, the depth-first-search preorder with the subtree spans and the offsets of every
+    generation. They are computed on the first call and cached until the children lists change, by
+    insert_edge, the sorts of the children or a layout, so the passes over the tree never traverse
+    it again.
+
+    :returns: return the Traversal of the tree
+    """
+
+    @property
+    def traversal(self):
+        if self._traversal is None:
+            self._traversal = Traversal.from_tree(self)
+        return self._traversal
+
+    """
+    Get all the nodes in breath-first-search order, grouped by generation, from the cached traversal.
+
+    :returns: the pair (order, level_bounds), the list of node ids in BFS order and the offsets of
+              each generation in it, so generation d is order[level_bounds[d]:level_bounds[d + 1]]
+    """
+
+    def get_level_order(self):
+        return self.traversal.order, self.traversal.level_bounds
+
     """
     Print the tree sorted by depth to log, including the following parameters. 
     The tree is traversed in a breath-first-search. 
@@ -103,24 +181,12 @@ class Tree(object):
     """
 
     def print_tree(self):
-        current_generation = deque([self.root])
-        next_generation = True
-        while next_generation:
-            next_generation = deque()
-            while current_generation:
-                node_id = current_generation.popleft()
-                logging.info(
-                    "{0}, parent: {1}, depth: {2}, #children: {3}, size: {4}, radius: {5}, area: {6}"
-                    .format(node_id,
-                            self.nodes[node_id].parent,
-                            self.nodes[node_id].depth,
-                            len(self.nodes[node_id].children),
-                            self.nodes[node_id].tree_size,
-                            self.nodes[node_id].radius,
-                            self.nodes[node_id].area))
-                for child in self.nodes[node_id].children:
-                    next_generation.append(child)
-            current_generation = next_generation
+        for node_id in self.traversal.order:
+            node = self.nodes[node_id]
+            logging.info(
+                "{0}, parent: {1}, depth: {2}, #children: {3}, size: {4}, radius: {5}, area: {6}"
+                .format(node_id, node.parent, node.depth, len(node.children), node.tree_size, node.radius,
+                        node.area))
 
     """
     Set the depth in the tree for each node. 
@@ -128,19 +194,14 @@ class Tree(object):
     :param int depth: the initial depth value for the root, default 0
     """
 
+    @instrumented
     def set_node_depth(self, depth=0):
-        current_generation = deque([self.root])
-        next_generation = True
-        while next_generation:
-            next_generation = deque()
-            while current_generation:
-                node_id = current_generation.popleft()
-                self.nodes[node_id].depth = depth
-                for child in self.nodes[node_id].children:
-                    next_generation.append(child)
-            depth += 1
-            current_generation = next_generation
-        self.height = depth - 1
+        traversal = self.traversal
+        for node_id, d in zip(traversal.order, (depth + traversal.depth).tolist()):
+            self.nodes[node_id].depth = d
+        self.height = depth + len(traversal.level_bounds) - 2
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.nodes))
 
     """
     Set the node's hemisphere radius and also its distance from its children. The radius is calculated
@@ -150,94 +211,45 @@ class Tree(object):
     have been calculated before their parent's radius is calcualted. As the hemisphere sizes are tightly 
     calculated but placing them loosely to the parent hemisphere, the space reservation is 7.2 times of 
     the actual size of a child hemisphere. 
+    The nodes are grouped by generation once, and each generation is computed in bulk by
+    kernels.reverse_sweep, the edges are not needed any more. 
+
+    :param set[ dict( int child, int parent) ] edges: not needed, kept for compatibility, default None
+    """
 
-    :param set[ dict( int child, int parent) ] edges: the edge list for all edges of the tree
-    """
-
-    def set_subtree_radius(self, edges):
-        alpha = 10.2
-        leaf_nodes = self.get_leaf_nodes(edges)
-        outermost_non_leaf = set()
-        for n in leaf_nodes:
-            N = len(self.nodes[self.nodes[n].parent].children)
-            self.nodes[n].radius = compute_radius(0.0025)  # this is walrus way, H3Viewer (N / alpha)
-            logging.info("leaf node {0}, parent {1}, radius {2}"
-                         .format(n, self.nodes[n].parent, self.nodes[n].radius))
-            outermost_non_leaf.add(self.nodes[n].parent)
-        depth = self.height - 1
-        current_generation = deque(list(set(n for n in outermost_non_leaf
-                                            if self.nodes[n].parent is not None
-                                            if self.nodes[self.nodes[n].parent].depth == depth)))
-        previous_generation = True
-        while previous_generation:
-            previous_generation = deque()
-            while current_generation:
-                n = current_generation.popleft()
-                if self.nodes[n].area == 0:  # avoid duplicate parents
-                    if self.nodes[n].parent is not None:
-                        previous_generation.append(self.nodes[n].parent)
-                    for child in self.nodes[n].children:
-                        self.nodes[n].area += 7.2 * compute_hyperbolic_area(self.nodes[child].radius)
-                        logging.info("node {0}, child {1}, child_area+ {2}, radius {3}, area {4}"
-                                     .format(n, child, compute_hyperbolic_area(self.nodes[child].radius),
-                                             self.nodes[child].radius, self.nodes[child].area))
-                    self.nodes[n].radius = compute_radius(self.nodes[n].area)
-                    logging.info("---> node {0}, radius {1}, area {2}"
-                                 .format(n, self.nodes[n].radius, self.nodes[n].area))
-            for n in outermost_non_leaf:
-                if n is not None:
-                    if self.nodes[n].depth == depth:
-                        previous_generation.append(n)
-            depth -= 1
-            current_generation = deque(list(set(previous_generation)))
-
-    """
-    Set the subtree size by the number of nodes in its subtree.
-    :param set[ dict( int child, int parent) ] edges: the edge list for all edges of the tree
-    """
-
-    def set_subtree_size(self, edges):
-        leaf_nodes = self.get_leaf_nodes(edges)
-        depth = self.height
-        current_generation = deque(list(n for n in leaf_nodes
-                                        if self.nodes[n].depth == depth))
-        previous_generation = True
-        while previous_generation:
-            depth -= 1
-            previous_generation = deque()
-            while current_generation:
-                n = current_generation.popleft()
-                if self.nodes[n].parent is not None:
-                    previous_generation.append(self.nodes[n].parent)
-                    self.nodes[self.nodes[n].parent].tree_size += \
-                        self.nodes[n].tree_size
-            for n in leaf_nodes:
-                if self.nodes[n].depth == depth:
-                    previous_generation.append(n)
-            current_generation = deque(list(set(previous_generation)))
+    @instrumented
+    def set_subtree_radius(self, edges=None):
+        order, level_bounds = self.get_level_order()
+        num_children = np.array([len(self.nodes[n].children) for n in order])
+        _, radius, area = reverse_sweep(num_children, level_bounds)
+        for n, r, a in zip(order, radius.tolist(), area.tolist()):
+            self.nodes[n].radius = r
+            self.nodes[n].area = a
+        if self.instrumentation is not None:
+            self.instrumentation.observe(order, radius=radius,
+                                         depth=np.repeat(np.arange(len(level_bounds) - 1), np.diff(level_bounds)))
+
+    """
+    Set the subtree size by the number of nodes in its subtree, from the cached traversal. 
+
+    :param set[ dict( int child, int parent) ] edges: not needed, kept for compatibility, default None
+    """
+
+    @instrumented
+    def set_subtree_size(self, edges=None):
+        traversal = self.traversal
+        for node_id, size in zip(traversal.order, traversal.size.tolist()):
+            self.nodes[node_id].tree_size = size
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.nodes))
 
     """
     Sort the nodes in decreasing order in the same depth by their radii, in place sort is used. 
-    The tree is traversed in a breath-first-search. 
     """
 
+    @instrumented
     def sort_children_by_radius(self):
-        depth = 0
-        current_generation = deque([self.root])
-        next_generation = True
-        while next_generation:
-            next_generation = deque()
-            while current_generation:
-                node_id = current_generation.popleft()
-                for child in self.nodes[node_id].children:
-                    next_generation.append(child)
-                child_size_pair = [[child, self.nodes[child].radius]
-                                   for child in self.nodes[node_id].children]
-                child_size_pair.sort(key=itemgetter(1), reverse=True)
-                if child_size_pair:
-                    self.nodes[node_id].children = list(zip(*child_size_pair)[0])
-            depth += 1
-            current_generation = next_generation
+        self._sort_children(lambda node: node.radius)
 
     """
     Sort the nodes in decreasing order in the same depth by their number of nodes in subtree, 
@@ -246,23 +258,17 @@ class Tree(object):
     so the nodes with many sibilings can have a larger radius and nodes with a lot of children. 
     """
 
+    @instrumented
     def sort_children_by_tree_size(self):
-        depth = 0
-        current_generation = deque([self.root])
-        next_generation = True
-        while next_generation:
-            next_generation = deque()
-            while current_generation:
-                node_id = current_generation.popleft()
-                for child in self.nodes[node_id].children:
-                    next_generation.append(child)
-                child_size_pair = [[child, self.nodes[child].tree_size]
-                                   for child in self.nodes[node_id].children]
-                child_size_pair.sort(key=itemgetter(1), reverse=True)
-                if child_size_pair:
-                    self.nodes[node_id].children = list(zip(*child_size_pair)[0])
-            depth += 1
-            current_generation = next_generation
+        self._sort_children(lambda node: node.tree_size)
+
+    def _sort_children(self, key):
+        for node_id in self.traversal.order:
+            node = self.nodes[node_id]
+            node.children.sort(key=lambda c: (-key(self.nodes[c]), self.nodes[c].rank))
+        self._traversal = None
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.nodes))
 
     """
     Placing the hemispheres on the root hemisphere. Start from the pole, placing the largest child
@@ -277,149 +283,437 @@ class Tree(object):
         - Each subtree is independent from each other, so if the new node has a different parent node 
           than the previous parent node, we know this node is in a different subtree and initialize 
           phi, theta, dealta_theta and band and placing nodes all over again. 
+        - The bands are placed by kernels.place_bands, then the coordinates of a whole generation are
+          computed at once by kernels.place_coords, one 4x4 rotation and translation per parent and
+          one batched matrix product for all the children. 
+        - The subtrees below the collapsed nodes in tree.collapsed are not placed, the collapsed nodes
+          keep the hemisphere radius of their subtree, see lod.LevelOfDetail. 
     """
 
+    @instrumented
     def set_placement(self):
-        depth = 0
-        current_generation = deque(self.nodes[self.root].children)
-        next_generation = True
-        last_parent = self.root
-        while next_generation:
-            next_generation = deque()
-            phi, theta, delta_theta, band = 0.000001, 0., 0., 1
-            last_max_phi = 0  # span phi before jumping to the next band
-            while current_generation:
-                node = current_generation.popleft()
-                if self.nodes[node].parent != last_parent:  # same gen, diff parent
-                    last_parent = self.nodes[node].parent
-                    phi, theta, delta_theta, band = 0.000001, 0., 0., 1
-                rp = self.nodes[self.nodes[node].parent].radius
-                try:
-                    if phi == 0.000001:  # first child of root
-                        phi += compute_delta_phi(self.nodes[node].radius, rp)
-                        self.nodes[node].band = 0
-                    else:
-                        delta_theta = compute_delta_theta(self.nodes[node].radius, rp, phi)
-                        if (theta + delta_theta) <= 2 * math.pi:
-                            theta += delta_theta
-                            if last_max_phi:
-                                last_max_phi = compute_delta_phi(self.nodes[node].radius, rp)
-                                phi += compute_delta_phi(self.nodes[node].radius, rp)
-                        else:
-                            band += 1
-                            theta = delta_theta
-                            phi += last_max_phi + compute_delta_phi(self.nodes[node].radius, rp)
-                            last_max_phi = 0
-                        self.nodes[node].band = band
-                        self.nodes[node].theta = theta
-                        self.nodes[node].phi = phi
-                except ZeroDivisionError as e:
-                    logging.error("{0}\n node {1}, radius={2}, rp={3}, phi={4}, parent={5}"
-                                  .format(e, node, self.nodes[node].radius, rp, phi,
-                                          self.nodes[node].parent))
-                self.nodes[node].coord.sph_to_cart(self.nodes[node].theta,
-                                                   self.nodes[node].phi,
-                                                   self.nodes[self.nodes[node].parent].radius)
-                if self.nodes[node].parent != self.root:
-                    self.nodes[node].coord.coordinate_transformation(
-                        self.nodes[self.nodes[node].parent].theta,
-                        self.nodes[self.nodes[node].parent].phi)
-                    self.nodes[node].coord.cart_offset(self.nodes[self.nodes[node].parent].coord)
-                logging.info("node {0}, radius {1},  band {2}, theta {3}, phi {4}"
-                             .format(node, self.nodes[node].radius, self.nodes[node].band,
-                                     self.nodes[node].theta, self.nodes[node].phi))
-                logging.info("node {0}, x {1}, y {2}, z {3}, w {4}"
-                             .format(node, self.nodes[node].coord.x, self.nodes[node].coord.y,
-                                     self.nodes[node].coord.z, self.nodes[node].coord.w))
-                theta += delta_theta    # reserve space for the other half sphere
-                for child in self.nodes[node].children:
-                    next_generation.append(child)
-            depth += 1
-            current_generation = next_generation
-
-    """
-    Plot the tree with nodes and edges, optionally equators and tagging nodes with node numbers. 
-    The tree is traversed in a breath-first-search. 
-    Note: 
-        - To distinct each generations, a color plate of ["blue", "red", "yellow", "green", "black"] 
-          is used repeatedly. 
-        - The X, Y, Z axises have been labelled. 
-        - When the number of nodes is large and the tree is bushy, it's advised disabling tagging for
-          better user experience.
+        self._place_generations([self.root], 1)
+        self.laid_out = True
+        self.dirty, self.inserted = set(), []
+
+    """
+    Place the children of some nodes of one generation and the generations below them, one batched
+    call per generation, skipping the children of the collapsed nodes, see lod.LevelOfDetail. 
+
+    :param list parent_ids: the node ids of the placed parents, all at the same depth
+    :param int depth: the depth of their children
+    """
+
+    def _place_generations(self, parent_ids, depth):
+        at_root = parent_ids == [self.root]
+        while True:
+            if self.collapsed:
+                parent_ids = [p for p in parent_ids if p not in self.collapsed]
+            parents = [self.nodes[n] for n in parent_ids]
+            node_ids = [c for p in parents for c in p.children]
+            if not node_ids:
+                return
+            nodes = [self.nodes[n] for n in node_ids]
+            group = np.repeat(np.arange(len(parents)), [len(p.children) for p in parents])
+            parent_radius = np.array([p.radius for p in parents])
+            band, theta, phi = place_bands(np.array([n.radius for n in nodes]), parent_radius[group], group)
+            coords = place_coords(theta, phi, group, parent_radius,
+                                  np.array([p.theta for p in parents]),
+                                  np.array([p.phi for p in parents]),
+                                  np.array([[p.coord.x, p.coord.y, p.coord.z] for p in parents]), at_root)
+            for node, b, t, p, (x, y, z) in zip(nodes, band.tolist(), theta.tolist(), phi.tolist(),
+                                                 coords.tolist()):
+                node.band, node.theta, node.phi = b, t, p
+                node.coord.x, node.coord.y, node.coord.z = x, y, z
+            if self.instrumentation is not None:
+                self.instrumentation.observe(node_ids, parent=group, depth=depth, band=band,
+                                             radius=[n.radius for n in nodes], theta=theta, phi=phi)
+            parent_ids, depth, at_root = node_ids, depth + 1, False
+
+    """
+    Run the whole layout on one breath-first-search order instead of the five passes of get_layout.
+    The depth, subtree size and hemisphere radius are set in one sweep from the last generation to
+    the root, then the children are sorted by radius and placed in one sweep from the root. The 
+    leaves are known from the children lists, so neither the edges nor get_leaf_nodes are needed. 
+    The whole tree is placed, so the collapsed nodes of a level of detail are cleared. 
+
+    :param int workers: the number of worker processes laying out the subtrees in parallel, see
+                        parallel.parallel_layout(), default None to run in this process
+    """
+
+    @instrumented
+    def set_layout(self, workers=None):
+        if workers is not None and workers > 1:
+            self._set_parallel_layout(workers)
+            return
+        for _ in self.iter_layout():
+            pass
+
+    """
+    Run set_layout one generation at a time, e.g. to stream the coordinates while the generations
+    below are placed. The depth, subtree size and radius are computed in the sweep over the whole
+    tree first, then every generation is placed by kernels.forward_levels and handed on, and the
+    attributes of the nodes are set once the last one is placed.
+
+    :returns: yield the pair (ids, coords) of every generation, the root first, the list of the
+              node ids in placing order and their N x 3 coordinates
+    """
+
+    def iter_layout(self):
+        order, level_bounds = self.get_level_order()
+        num_children = np.array([len(self.nodes[n].children) for n in order])
+        tree_size, radius, area = reverse_sweep(num_children, level_bounds)
+        for placed, sweep in forward_levels(num_children, level_bounds, radius, radius):
+            yield [order[i] for i in placed.tolist()], sweep[4][placed]
+        child_order, band, theta, phi, coords = sweep
+        depth = np.repeat(np.arange(len(level_bounds) - 1), np.diff(level_bounds))
+        first_child = np.cumsum(num_children) - num_children + 1
+        child_order = child_order.tolist()
+        for n, first, k, d, size, r, a, b, t, p, (x, y, z) in zip(
+                order, first_child.tolist(), num_children.tolist(), depth.tolist(), tree_size.tolist(),
+                radius.tolist(), area.tolist(), band.tolist(), theta.tolist(), phi.tolist(), coords.tolist()):
+            node = self.nodes[n]
+            node.depth, node.tree_size, node.radius, node.area = d, size, r, a
+            node.band, node.theta, node.phi = b, t, p
+            node.coord.x, node.coord.y, node.coord.z = x, y, z
+            node.children = [order[c] for c in child_order[first:first + k]]
+        self.height = len(level_bounds) - 2
+        self._traversal = None
+        self.collapsed = set()
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited")
+            self.instrumentation.observe(order[1:], parent=np.repeat(np.arange(len(order)), num_children),
+                                         depth=depth[1:], band=band[1:], radius=radius[1:], theta=theta[1:], phi=phi[1:])
+        self.laid_out = True
+        self.dirty, self.inserted = set(), []
+
+    def _set_parallel_layout(self, workers):
+        from parallel import parallel_layout
+        ids = list(self.nodes)
+        index = dict((n, i) for i, n in enumerate(ids))
+        child_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(self.nodes[n].children) for n in ids], out=child_offsets[1:])
+        child_index = np.array([index[c] for n in ids for c in self.nodes[n].children], dtype=np.int64)
+        depth, tree_size, radius, area, band, theta, phi, coords, rank = \
+            parallel_layout(child_offsets, child_index, index[self.root], workers)
+        self._assign_layout(ids, depth, tree_size, radius, area, band, theta, phi, coords, rank)
+        if self.instrumentation is not None:
+            parent = np.full(len(ids), -1, dtype=np.int64)
+            parent[child_index] = np.repeat(np.arange(len(ids)), np.diff(child_offsets))
+            nonroot = parent >= 0
+            self.instrumentation.count("nodes_visited")
+            self.instrumentation.observe(np.asarray(ids)[nonroot], parent=parent[nonroot], depth=depth[nonroot],
+                                         band=band[nonroot], radius=radius[nonroot], theta=theta[nonroot],
+                                         phi=phi[nonroot])
+
+    def _assign_layout(self, ids, depth, tree_size, radius, area, band, theta, phi, coords, rank):
+        rank = dict(zip(ids, rank.tolist()))
+        for n, d, size, r, a, b, t, p, (x, y, z) in zip(
+                ids, depth.tolist(), tree_size.tolist(), radius.tolist(), area.tolist(), band.tolist(),
+                theta.tolist(), phi.tolist(), coords.tolist()):
+            node = self.nodes[n]
+            node.depth, node.tree_size, node.radius, node.area = d, size, r, a
+            node.band, node.theta, node.phi = b, t, p
+            node.coord.x, node.coord.y, node.coord.z = x, y, z
+            node.children.sort(key=rank.get)
+        self.height = int(depth.max())
+        self._traversal = None
+        self.collapsed = set()
+        self.laid_out = True
+        self.dirty, self.inserted = set(), []
+
+    """
+    Restore a layout exported with export_layout(path, attributes=True), e.g. by cache.LayoutCache,
+    instead of computing it: the attributes of every node and the sorted order of the siblings. On
+    a tree with interned ids, the external ids of the file are interned by tree.ids.
+
+    :param layoutfile.LayoutFile layout: the layout file of a tree with the same nodes
+    """
+
+    @instrumented
+    def apply_layout(self, layout):
+        ids = layout.ids.tolist()
+        if self.ids is not None:
+            try:
+                ids = self.ids.intern(layout.ids).tolist()
+            except KeyError:
+                ids = []
+        if len(ids) != len(self.nodes) or not all(n in self.nodes for n in ids):
+            logging.error("You attempted to apply the layout of another tree \n")
+            raise InvalidArgument("You attempted to apply the layout of another tree \n")
+        self._assign_layout(ids, layout.depth, layout.column("tree_size"), layout.column("radius"),
+                            layout.column("area"), layout.column("band"), layout.column("theta"),
+                            layout.column("phi"), np.column_stack([layout.x, layout.y, layout.z]),
+                            layout.column("rank"))
+
+    """
+    Build a laid out tree straight from the layout file of its edges written by
+    export_layout(path, attributes=True), e.g. a hit of cache.LayoutCache, instead of inserting the
+    edges and applying the layout: a Node is created per row with its attributes, the children in
+    the order of their rank and the rank of insertion of every node as the edges would give it.
+
+    :param int root: the root id of the tree, None for the only node without a parent
+    :param (int, int) edges: the integer (child, parent) edges the layout was computed for
+    :param layoutfile.LayoutFile layout: the layout file
+    :param bool intern_ids: whether to intern the node ids to dense indices, see Tree, default False
+    :returns: return the Tree
+    """
+
+    @classmethod
+    def from_layout(cls, root, edges, layout, intern_ids=False):
+        tree = cls()
+        keys = layout.ids.tolist()
+        if intern_ids:
+            tree.ids = IdTable.from_edges(root, edges)[0]
+            keys = tree.ids.intern(layout.ids).tolist()
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        by_parent = np.argsort(edges[:, 1], kind="mergesort")
+        first = np.flatnonzero(np.diff(edges[by_parent, 1], prepend=-1) != 0) if len(edges) else by_parent
+        insertion = np.zeros(len(keys), dtype=np.int64)
+        insertion[np.searchsorted(layout.ids, edges[by_parent, 0])] = \
+            np.arange(len(edges)) - np.repeat(first, np.diff(np.append(first, len(edges))))
+        parent = np.asarray(layout.parent, dtype=np.int64)
+        nonroot = np.flatnonzero(parent >= 0)
+        nonroot = nonroot[np.lexsort((layout.column("rank")[nonroot], parent[nonroot]))]
+        bounds = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent[nonroot], minlength=len(keys)), out=bounds[1:])
+        children, bounds = [keys[i] for i in nonroot.tolist()], bounds.tolist()
+        for i, (n, p, d, size, r, a, b, t, phi, x, y, z, rank) in enumerate(zip(
+                keys, parent.tolist(), layout.depth.tolist(), layout.column("tree_size").tolist(),
+                layout.column("radius").tolist(), layout.column("area").tolist(), layout.column("band").tolist(),
+                layout.column("theta").tolist(), layout.column("phi").tolist(), layout.x.tolist(),
+                layout.y.tolist(), layout.z.tolist(), insertion.tolist())):
+            node = Node(n, keys[p] if p >= 0 else None, d, size, r, a)
+            node.band, node.theta, node.phi, node.rank = b, t, phi, rank
+            node.coord.x, node.coord.y, node.coord.z = x, y, z
+            node.children = children[bounds[i]:bounds[i + 1]]
+            tree.nodes[n] = node
+        tree.root = keys[int(np.flatnonzero(parent < 0)[0])]
+        tree.height = int(layout.depth.max())
+        tree.laid_out = True
+        return tree
+
+    """
+    Update the layout after new leaves were inserted by insert_edge, with the same result as running
+    set_node_depth, set_subtree_radius, set_subtree_size, sort_children_by_radius and set_placement
+    on the tree again. 
+        - The depth, subtree size, area and radius are recomputed only for the dirty nodes, the new 
+          nodes and their ancestors, from the deepest one up. 
+        - Only the children of the dirty nodes are sorted and placed on new bands again, the other 
+          sibling groups keep their band, theta and phi. The siblings of equal radius keep the
+          order of their insertion, Node.rank, as in a layout from scratch, not their previous order. 
+        - The coordinates are recomputed, one batched transform per generation, only for the 
+          children of the dirty nodes and of the nodes which moved: the walk down a subtree stops 
+          where the coordinate, theta and phi of its root come out unchanged. As the coordinates are 
+          absolute and every insertion grows the root hemisphere, the whole tree still moves in 
+          practice, so a refresh costs O(V) however few nodes were inserted. 
+        - The subtrees below the collapsed nodes in tree.collapsed are not placed, as by
+          set_placement, their sizes and radii are updated, and they are placed when expanded,
+          see lod.LevelOfDetail. 
+    With stable set, the children of a dirty node which were laid out before keep their order and
+    the new children follow them, sorted by radius, so an animation of a growing tree does not swap
+    siblings whose radii overtake each other. The result then differs from a layout from scratch. 
+
+    :param bool stable: whether to keep the order of the siblings laid out before, default False
+    """
+
+    @instrumented
+    def update_layout(self, stable=False):
+        if not self.laid_out:
+            self.set_layout()
+            return
+        if not self.dirty:
+            return
+        for n in self.inserted:
+            self.nodes[n].depth = self.nodes[self.nodes[n].parent].depth + 1
+            self.height = max(self.height, self.nodes[n].depth)
+        leaf_radius = compute_radius(LEAF_AREA)
+        inserted = set(self.inserted)
+        for n in sorted(self.dirty, key=lambda n: self.nodes[n].depth, reverse=True):
+            node = self.nodes[n]
+            if not node.children:
+                node.tree_size, node.radius, node.area = 1, leaf_radius, 0
+                continue
+            children = [self.nodes[c] for c in node.children]
+            node.tree_size = 1 + sum(c.tree_size for c in children)
+            child_area = RESERVATION * compute_hyperbolic_area_array([c.radius for c in children])
+            node.area = float(np.add.reduceat(child_area, [0])[0])  # the same sum as reverse_sweep
+            node.radius = float(compute_radius_array(node.area))
+            if stable:
+                node.children.sort(key=lambda c: (c in inserted, -self.nodes[c].radius if c in inserted else 0))
+            else:
+                node.children.sort(key=lambda c: (-self.nodes[c].radius, self.nodes[c].rank))
+        parent_ids = [p for p in [self.root] if p not in self.collapsed]
+        for d in range(1, self.height + 1):
+            if not parent_ids:
+                break
+            parents = [self.nodes[p] for p in parent_ids]
+            node_ids = [c for p in parents for c in p.children]
+            nodes = [self.nodes[c] for c in node_ids]
+            group = np.repeat(np.arange(len(parents)), [len(p.children) for p in parents])
+            parent_radius = np.array([p.radius for p in parents])
+            theta = np.array([n.theta for n in nodes], dtype=np.float64)
+            phi = np.array([n.phi for n in nodes], dtype=np.float64)
+            replaced = np.array([p in self.dirty for p in parent_ids])[group]
+            if replaced.any():
+                moved = [n for n, r in zip(nodes, replaced.tolist()) if r]
+                band, theta[replaced], phi[replaced] = place_bands(
+                    np.array([n.radius for n in moved]), parent_radius[group[replaced]], group[replaced])
+                for node, b in zip(moved, band.tolist()):
+                    node.band = b
+                if self.instrumentation is not None:
+                    self.instrumentation.observe([c for c, r in zip(node_ids, replaced.tolist()) if r],
+                                                 parent=group[replaced], depth=d, band=band,
+                                                 radius=[n.radius for n in moved], theta=theta[replaced],
+                                                 phi=phi[replaced])
+            if self.instrumentation is not None:
+                self.instrumentation.count("nodes_visited", len(nodes) - np.count_nonzero(replaced))
+            coords = place_coords(theta, phi, group, parent_radius,
+                                  np.array([p.theta for p in parents]),
+                                  np.array([p.phi for p in parents]),
+                                  np.array([[p.coord.x, p.coord.y, p.coord.z] for p in parents]), d == 1)
+            moved = []
+            for node, t, p, (x, y, z) in zip(nodes, theta.tolist(), phi.tolist(), coords.tolist()):
+                moved.append((node.theta, node.phi, node.coord.x, node.coord.y, node.coord.z) != (t, p, x, y, z))
+                node.theta, node.phi = t, p
+                node.coord.x, node.coord.y, node.coord.z = x, y, z
+            parent_ids = [c for c, n, m in zip(node_ids, nodes, moved)
+                          if n.children and c not in self.collapsed and (m or c in self.dirty)]
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(self.dirty))
+        self.dirty, self.inserted = set(), []
+        self._traversal = None
+
+    """
+    Get the coordinates of all nodes as arrays, sorted by node id.
+
+    :returns: return the pair (ids, coords), the node ids and the N x 3 coordinates
+    """
+
+    def get_coords(self):
+        ids = sorted(self.nodes)
+        coords = np.array([[self.nodes[n].coord.x, self.nodes[n].coord.y, self.nodes[n].coord.z] for n in ids])
+        return np.array(ids), coords.reshape(-1, 3)
+
+    """
+    Export the layout as a columnar binary file, see layoutfile.write_layout() for the format. The
+    file is read back with layoutfile.load_layout(), which memory-maps the columns. Only a tree of
+    integer node ids can be exported, InvalidArgument is raised for any other id. On a tree with
+    interned ids, the file holds the external ids, translated by tree.ids.
+
+    :param str path: the path of the layout file
+    :param dtype: the float type of the coordinates, numpy.float32 or numpy.float64, default numpy.float32
+    :param bool attributes: whether to write the layout attributes too, see layoutfile.ATTRIBUTES, default False
+    """
+
+    @instrumented
+    def export_layout(self, path, dtype=np.float32, attributes=False):
+        ids = sorted(self.nodes)
+        external = ids
+        if self.ids is not None:
+            external = self.ids.external(ids)
+            if external.dtype.kind == "i":
+                order = np.argsort(external, kind="mergesort")
+                ids, external = [ids[i] for i in order.tolist()], external[order]
+        row = dict((n, i) for i, n in enumerate(ids))
+        nodes = [self.nodes[n] for n in ids]
+        extra = None
+        if attributes:
+            rank = dict((c, i) for n in nodes for i, c in enumerate(n.children))
+            extra = [("tree_size", np.array([n.tree_size for n in nodes], dtype=np.int64)),
+                     ("radius", np.array([n.radius for n in nodes], dtype=np.float64)),
+                     ("area", np.array([n.area for n in nodes], dtype=np.float64)),
+                     ("band", np.array([n.band for n in nodes], dtype=np.int32)),
+                     ("theta", np.array([n.theta for n in nodes], dtype=np.float64)),
+                     ("phi", np.array([n.phi for n in nodes], dtype=np.float64)),
+                     ("rank", np.array([rank.get(n, 0) for n in ids], dtype=np.int32))]
+        write_layout(path, external, [row[n.parent] if n.parent is not None else -1 for n in nodes],
+                     [n.depth for n in nodes], [n.coord.x for n in nodes], [n.coord.y for n in nodes],
+                     [n.coord.z for n in nodes], dtype, extra)
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes_visited", len(ids))
+
+    """
+    Plot the tree with a plotting backend, see render.get_backend(). The backend module, and the
+    plotting library behind it, is only imported by the first plot, so the layout itself never
+    loads it. 
 
     :param bool equators: whether to draw the 3D equators, default True
     :param bool tagging: whether to tag nodes with node numbers, default True
     :param int depth_cap: a filter for rendering the first N generations, default tree height
+    :param str backend: the name of the plotting backend, default "matplotlib"
+    :param options: the options of the backend, e.g. batched, min_pixels and max_labels of
+                    render_matplotlib.scatter_plot()
+    :returns: return what the backend returns, the 3D axes for matplotlib
     """
 
-    def scatter_plot(self, equators=True, tagging=True, depth_cap=None):
-        if depth_cap is None:
-            depth_cap = self.height
-        fig = plt.figure(figsize=(12, 10))
-        ax = fig.add_subplot(111, projection="3d")
-        plt.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=0, hspace=0)
-        xs = [self.nodes[self.root].coord.x]
-        ys = [self.nodes[self.root].coord.y]
-        zs = [self.nodes[self.root].coord.z]
-        plot_color_board = ["blue", "red", "yellow", "green", "black"]
-        font0 = FontProperties()
-        font0.set_size(8)
-        current_generation = deque([self.root])
-        next_generation = True
-        while next_generation:
-            next_generation = deque()
-            while current_generation:
-                n = current_generation.popleft()
-                if self.nodes[n].depth <= depth_cap:
-                    xs.append(self.nodes[n].coord.x)
-                    ys.append(self.nodes[n].coord.y)
-                    zs.append(self.nodes[n].coord.z)
-                    if tagging:
-                        ax.text(self.nodes[n].coord.x + 0.01,
-                                self.nodes[n].coord.y + 0.01,
-                                self.nodes[n].coord.z + 0.01,
-                                ("n{0}".format(n)), fontproperties=font0)
-                for child in self.nodes[n].children:
-                    next_generation.append(child)
-                    if self.nodes[n].depth <= depth_cap:
-                        xe = [self.nodes[n].coord.x, self.nodes[child].coord.x]
-                        ye = [self.nodes[n].coord.y, self.nodes[child].coord.y]
-                        ze = [self.nodes[n].coord.z, self.nodes[child].coord.z]
-                        ax.plot(xe, ye, ze, plot_color_board[self.nodes[n].depth % 5])
-            current_generation = next_generation
-        ax.scatter(xs, ys, zs, c="r", marker="o")
-        global_radius = self.nodes[self.root].radius * 1.12
-        if equators:
-            for axis in ["x", "y", "z"]:
-                circle = Circle((0, 0), global_radius * 1.1)
-                circle.set_clip_box(ax.bbox)
-                circle.set_edgecolor("gray")
-                circle.set_alpha(0.3)
-                circle.set_facecolor("none")  # "none" not None
-                ax.add_patch(circle)
-                art3d.pathpatch_2d_to_3d(circle, z=0, zdir=axis)
-        ax.set_xlim([-1.2 * global_radius, 1.2 * global_radius])
-        ax.set_ylim([-1.2 * global_radius, 1.2 * global_radius])
-        ax.set_zlim([-1.2 * global_radius, 1.2 * global_radius])
-        ax.set_xlabel("X Label")
-        ax.set_ylabel("Y Label")
-        ax.set_zlabel("Z Label")
-        plt.show()
+    def scatter_plot(self, equators=True, tagging=True, depth_cap=None, backend="matplotlib", **options):
+        from render import get_backend
+        return get_backend(backend).scatter_plot(self, equators, tagging, depth_cap, **options)
 
 """
 A wrapper for all function calls to get the layout. 
 
 :param (int, int) edges: a tuple for a tree edge as (child, parent), default None
 :param int root: the root id of the tree, default None
+:param str backend: the tree storage, "dict" for Tree with a Node object per node, or "array" for
+                    arraytree.ArrayTree with NumPy arrays for the node attributes, default "dict"
+:param str engine: "passes" to run set_node_depth, set_subtree_radius, set_subtree_size, 
+                   sort_children_by_radius and set_placement one after another, or "fused" to run
+                   them as two sweeps over one breath-first-search order by set_layout, default "passes"
+:param int workers: the number of worker processes for set_layout(workers) to lay out the subtrees in
+                    parallel, with either engine, default None to run in this process
+:param instrument.Instrumentation instrumentation: the timers, counters, hooks and trace buffer to
+                    attach to the tree, the construction is timed as a phase too, default None
+:param cache.LayoutCache cache: the layout cache to look the layout up in, and to store it in when
+                    it is computed, only for integer edges, which is checked with the engine and
+                    the root before the tree is built. On a hit the tree is built straight from the
+                    cached layout, see Tree.from_layout() and ArrayTree.from_layout(), default None
+:param bool intern_ids: whether to intern the node ids to dense indices, see Tree, only for the
+                    dict backend, default False
 :return: returns a Tree structure with layout information
 """
 
 
-def get_layout(root, edges):
-    tree = Tree(root, edges)
-    tree.set_node_depth()
-    tree.set_subtree_radius(edges)
-    tree.set_subtree_size(edges)
-    tree.sort_children_by_radius()
-    tree.set_placement()
+def get_layout(root, edges, backend="dict", engine="passes", workers=None, instrumentation=None, cache=None,
+               intern_ids=False):
+    if backend not in ("dict", "array"):
+        logging.error("Unknown tree backend {0} \n".format(backend))
+        raise InvalidArgument("Unknown tree backend {0} \n".format(backend))
+    if engine not in ("passes", "fused"):
+        logging.error("Unknown layout engine {0} \n".format(engine))
+        raise InvalidArgument("Unknown layout engine {0} \n".format(engine))
+    if intern_ids and backend != "dict":
+        logging.error("Only the dict backend interns the node ids \n")
+        raise InvalidArgument("Only the dict backend interns the node ids \n")
+    try:
+        hash(root)
+    except TypeError:
+        logging.error("The root {0!r} is not a valid node id \n".format(root))
+        raise InvalidArgument("The root {0!r} is not a valid node id \n".format(root))
+    key = cache.key(root, edges, backend, intern_ids) if cache is not None else None
+    layout = cache.get(key) if cache is not None else None
+    if instrumentation is not None:
+        instrumentation.start("construction")
+    if backend == "dict":
+        tree = Tree(root, edges, intern_ids) if layout is None else Tree.from_layout(root, edges, layout, intern_ids)
+    else:
+        from arraytree import ArrayTree
+        tree = ArrayTree(root, edges) if layout is None else ArrayTree.from_layout(layout)
+    if instrumentation is not None:
+        instrumentation.stop()
+        instrumentation.count("nodes_visited", len(tree.nodes))
+        tree.instrumentation = instrumentation
+    if layout is not None:
+        return tree
+    if engine == "fused" or (workers is not None and workers > 1):
+        tree.set_layout(workers)
+    else:
+        tree.set_node_depth()
+        tree.set_subtree_radius(edges)
+        tree.set_subtree_size(edges)
+        tree.sort_children_by_radius()
+        tree.set_placement()
+    if cache is not None:
+        cache.put(key, tree)
     return tree